@@ -72,12 +72,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so every log line of the request carries its id.
+    "inventory.logs.RequestIdMiddleware",
     "django.middleware.security.SecurityMiddleware",
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Early, so its timings include the session/auth middleware and their queries.
+    "inventory.perf.PerformanceMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # After auth, so it can tell whether a profiling request came from staff.
+    "inventory.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     'django.middleware.security.SecurityMiddleware',
@@ -90,7 +96,8 @@ ROOT_URLCONF = "Stocker.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates with render timing for the Server-Timing header.
+        "BACKEND": "inventory.perf.TimedDjangoTemplates",
         'DIRS': [BASE_DIR / 'templates'],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -194,16 +201,76 @@ ssl_context = ssl.create_default_context(cafile=certifi.where())
 EMAIL_SSL_CONTEXT = ssl_context
 
 
+# Cache backend: "locmem" (default, per process), "file" (shared on one host) or
+# "redis" (any Redis-compatible server at CACHE_LOCATION, needs the redis package).
+# Invalidation bumps a version key in the cache, so with more than one process
+# (several gunicorn workers, or the job worker) use a shared backend; with locmem
+# the others keep serving their entries until CACHE_TIMEOUT runs out.
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "stocker"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", os.path.join(BASE_DIR, ".cache")),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1"),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.environ.get("CACHE_BACKEND", "locmem")]
+
+CACHES = {
+    "default": {
+        "BACKEND": _cache_backend,
+        "LOCATION": os.environ.get("CACHE_LOCATION", _cache_location),
+        "KEY_PREFIX": "stocker",
+    }
+}
+
+
+# Background jobs are processed by `python manage.py run_jobs`. Until a worker is
+# declared with JOBS_RUN_INLINE=False (start.sh does), they run synchronously in
+# the request that queues them, so alerts and PDFs work without one.
+JOBS_RUN_INLINE = os.environ.get("JOBS_RUN_INLINE", "True") == "True"
+
+# Rendered PDF reports, reused until the underlying data changes.
+REPORTS_CACHE_DIR = os.environ.get("REPORTS_CACHE_DIR", os.path.join(BASE_DIR, "report_cache"))
+
+# Bearer token Prometheus sends to /metrics/. Without one, only staff sessions can read it.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Sampled request profiles (see inventory/profiling.py). Staff can ask for one with
+# an "X-Profile: 1" header or ?_profile=1; PROFILE_SLOW_MS > 0 also profiles every
+# request still running after that many milliseconds.
+PROFILES_DIR = os.environ.get("PROFILES_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_SLOW_MS = int(os.environ.get("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = int(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
 
+# Statements slower than this many milliseconds are written to SLOW_QUERY_LOG with
+# their EXPLAIN plan (0 turns it off); `python manage.py slow_queries` summarizes them.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "250"))
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG", os.path.join(BASE_DIR, "slow_queries.log"))
+
+
+
+
+# Application log: JSON lines, written off the request threads and rotated by size.
+LOG_FILE = os.environ.get("LOG_FILE", os.path.join(BASE_DIR, "stocker.log"))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
 
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
         'file': {
-            'level': 'ERROR',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'errors.log'),
+            '()': 'inventory.logs.queue_handler',
+            'filename': LOG_FILE,
+            'max_bytes': LOG_MAX_BYTES,
+            'backup_count': LOG_BACKUP_COUNT,
+        },
+        'slow_queries': {
+            '()': 'inventory.logs.queue_handler',
+            'filename': SLOW_QUERY_LOG,
+            'max_bytes': LOG_MAX_BYTES,
+            'backup_count': LOG_BACKUP_COUNT,
+            'structured': False,
         },
     },
     'loggers': {
@@ -214,7 +281,13 @@ LOGGING = {
         },
         'inventory': {
             'handlers': ['file'],
-            'level': 'ERROR',
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # One JSON object per line, read back by the slow_queries command.
+        'inventory.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
             'propagate': False,
         },
     },
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Supplier, Product, SupplierProduct
+from .models import Category, Supplier, Product, SupplierProduct, Job
 
 
 class SupplierProductInline(admin.TabularInline):
@@ -27,4 +27,10 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'quantity_in_stock', 'expiry_date', 'created_at')
     search_fields = ('name', 'description')
     list_filter = ('category', 'expiry_date')
-    inlines = [SupplierProductInline] 
+    inlines = [SupplierProductInline]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'name')
@@ -1,6 +1,44 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, post_save, post_delete, m2m_changed
 
 
 class InventoryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "inventory"
+
+    def ready(self):
+        from .search import ensure_search_index_after_migrate
+        post_migrate.connect(ensure_search_index_after_migrate, sender=self)
+
+        from .cache import invalidate_inventory, invalidate_catalog
+        from .models import Product, SupplierProduct, StockMovement, Category, Supplier
+        for model in (Product, SupplierProduct, StockMovement):
+            post_save.connect(invalidate_inventory, sender=model, dispatch_uid=f"cache_{model.__name__}_save")
+            post_delete.connect(invalidate_inventory, sender=model, dispatch_uid=f"cache_{model.__name__}_delete")
+        for model in (Category, Supplier):
+            post_save.connect(invalidate_catalog, sender=model, dispatch_uid=f"cache_{model.__name__}_save")
+            post_delete.connect(invalidate_catalog, sender=model, dispatch_uid=f"cache_{model.__name__}_delete")
+        # The product form sets suppliers through the M2M manager, which doesn't send post_save.
+        m2m_changed.connect(invalidate_inventory, sender=Product.suppliers.through, dispatch_uid="cache_product_suppliers")
+
+        from .sync import record_deleted_product
+        post_delete.connect(record_deleted_product, sender=Product, dispatch_uid="sync_product_tombstone")
+
+        from .notifications import notification_changed
+        from .models import Notification
+        post_save.connect(notification_changed, sender=Notification, dispatch_uid="unread_count_save")
+        post_delete.connect(notification_changed, sender=Notification, dispatch_uid="unread_count_delete")
+
+        from .counters import alert_state_deleted, product_deleted
+        from .models import ProductAlertState
+        post_delete.connect(product_deleted, sender=Product, dispatch_uid="counters_product_delete")
+        post_delete.connect(alert_state_deleted, sender=ProductAlertState, dispatch_uid="counters_alert_state_delete")
+
+        from .metrics import count_connection
+        connection_created.connect(count_connection, dispatch_uid="metrics_db_connections")
+
+        from . import checks  # noqa: F401 (registers the system checks)
+
+        from .slowlog import install as install_slow_query_log
+        connection_created.connect(install_slow_query_log, dispatch_uid="slow_query_log")
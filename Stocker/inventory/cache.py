@@ -0,0 +1,130 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .perf import record_cache
+
+
+CACHE_TIMEOUT = 300
+# How long one request may hold the recompute lock, and how long others wait for it.
+LOCK_TIMEOUT = 30
+LOCK_WAIT_SECONDS = 5
+LOCK_POLL_SECONDS = 0.05
+
+# "inventory" covers anything derived from products and stock (stats, reports,
+# dashboard charts); "catalog" covers the category/supplier dropdown lists.
+INVENTORY = "inventory"
+CATALOG = "catalog"
+
+_MISSING = object()
+
+# Backends that keep entries in one process's memory: what the job worker or
+# another gunicorn worker writes to them is never seen by this process.
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+
+def is_shared():
+    """True when every process reads and writes the same cache (file, Redis, ...)."""
+    return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+
+def get_version(namespace):
+    key = f"version:{namespace}"
+    version = cache.get(key)
+    if version is None:
+        # A lost version (evicted, cache cleared, process restarted) restarts
+        # from the clock rather than 1, so it never repeats one that cached
+        # data or report files were stored under.
+        cache.add(key, _new_version(), None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def bump_version(namespace):
+    """Move ``namespace`` to a new key version; entries under the old one simply expire."""
+    key = f"version:{namespace}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def invalidate(*namespaces):
+    """Bump the namespaces once the current transaction commits, so readers can't re-cache old rows."""
+    def bump():
+        for namespace in namespaces:
+            bump_version(namespace)
+    transaction.on_commit(bump)
+
+
+
+def _entry_name(name, parts):
+    if not parts:
+        return name
+    return f"{name}:{hashlib.md5(repr(parts).encode()).hexdigest()}"
+
+
+def make_key(namespace, name, *parts):
+    return f"{namespace}:{get_version(namespace)}:{_entry_name(name, parts)}"
+
+
+
+def cached(namespace, name, compute, *parts, timeout=CACHE_TIMEOUT):
+    """
+    Return the cached value for ``name`` (and ``parts``, e.g. report filters),
+    computing it on a miss.
+
+    Misses are single-flight: the first request takes a lock key with
+    cache.add() and recomputes while the others serve the previous version's
+    value if there is one, or wait briefly for the new value.
+    """
+    key = make_key(namespace, name, *parts)
+    value = cache.get(key, _MISSING)
+    record_cache(value is not _MISSING)
+    if value is not _MISSING:
+        return value
+
+    stale_key = f"{namespace}:stale:{_entry_name(name, parts)}"
+    lock_key = f"lock:{key}"
+
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        stale = cache.get(stale_key, _MISSING)
+        if stale is not _MISSING:
+            return stale
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        # The holder is slow or gone; compute without caching rather than block the page.
+        return compute()
+
+    try:
+        value = compute()
+        cache.set(key, value, timeout)
+        cache.set(stale_key, value, timeout * 2)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+
+def invalidate_inventory(sender, **kwargs):
+    invalidate(INVENTORY)
+
+
+def invalidate_catalog(sender, **kwargs):
+    invalidate(INVENTORY, CATALOG)
@@ -0,0 +1,16 @@
+from django.core.checks import Tags, Warning, register
+
+from .cache import is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Cache invalidation is a version bump in the cache itself, so it only reaches processes sharing it."""
+    if is_shared():
+        return []
+    return [Warning(
+        "The default cache is local to each process.",
+        hint="Changes saved by one gunicorn worker or the job worker are not seen by the others until "
+             "their entries expire. Set CACHE_BACKEND=file (one host) or redis.",
+        id="inventory.W001",
+    )]
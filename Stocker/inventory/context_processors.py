@@ -1,8 +1,5 @@
-from .models import Notification
+from .notifications import unread_count
 
 def unread_notifications_count(request):
-    if request.user.is_authenticated:
-        return {
-            'notifications_unread_count': Notification.objects.filter(user=request.user, is_read=False).count()
-        }
-    return {'notifications_unread_count': 0}
+    # Templates call the function only if they show the badge.
+    return {'notifications_unread_count': lambda: unread_count(request.user)}
@@ -0,0 +1,100 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+
+from .models import Job, Product, ProductAlertState, StatCounter
+
+
+# Counter names; the metrics exporter reads them all in one query.
+STOCK_COUNTERS = {"ok": None, "low": "low_stock", "out": "out_of_stock"}
+EXPIRY_COUNTERS = {"ok": None, "near_expiry": "near_expiry", "expired": "expired"}
+JOB_COUNTERS = {"pending": "jobs_pending", "running": "jobs_running"}
+
+
+
+def stock_deltas(previous, current):
+    """Counter changes for a product whose stock goes from ``previous`` to ``current`` (None: no product)."""
+    from .utils import stock_status_for
+
+    deltas = Counter()
+    for quantity, sign in ((previous, -1), (current, 1)):
+        if quantity is None:
+            continue
+        deltas["products"] += sign
+        name = STOCK_COUNTERS[stock_status_for(quantity)]
+        if name:
+            deltas[name] += sign
+    return deltas
+
+
+def status_deltas(names, previous, current):
+    """Counter changes for a status moving from ``previous`` to ``current`` (None: no row)."""
+    deltas = Counter()
+    if previous in names and names[previous]:
+        deltas[names[previous]] -= 1
+    if current in names and names[current]:
+        deltas[names[current]] += 1
+    return deltas
+
+
+
+def product_deleted(sender, instance, **kwargs):
+    """post_delete receiver for products."""
+    add(stock_deltas(instance.quantity_in_stock, None))
+
+
+def alert_state_deleted(sender, instance, **kwargs):
+    """post_delete receiver for alert states (deleted with their product)."""
+    add(status_deltas(EXPIRY_COUNTERS, instance.expiry_status, None))
+
+
+
+def add(deltas):
+    """Apply counter changes in the caller's transaction. Rows are updated in name order to avoid deadlocks."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for name in sorted(deltas):
+            counters = StatCounter.objects.filter(name=name)
+            if not counters.update(value=F("value") + deltas[name]):
+                StatCounter.objects.bulk_create([StatCounter(name=name)], ignore_conflicts=True)
+                counters.update(value=F("value") + deltas[name])
+
+
+def values():
+    return dict(StatCounter.objects.values_list("name", "value"))
+
+
+
+def recount():
+    """
+    Recompute every counter from the tables, e.g. after bulk writes that skip
+    the model (seeding) or to repair drift. The counter rows are locked first,
+    so a write committing meanwhile either is counted here or adds its change
+    after this commits.
+    """
+    from .utils import LOW_STOCK_THRESHOLD
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            list(StatCounter.objects.select_for_update())
+        totals = Product.objects.aggregate(
+            products=Count("id"),
+            low_stock=Count("id", filter=Q(quantity_in_stock__gt=0, quantity_in_stock__lt=LOW_STOCK_THRESHOLD)),
+            out_of_stock=Count("id", filter=Q(quantity_in_stock=0)),
+        )
+        totals.update(ProductAlertState.objects.aggregate(
+            expired=Count("pk", filter=Q(expiry_status="expired")),
+            near_expiry=Count("pk", filter=Q(expiry_status="near_expiry")),
+        ))
+        totals.update(Job.objects.aggregate(
+            jobs_pending=Count("id", filter=Q(status="pending")),
+            jobs_running=Count("id", filter=Q(status="running")),
+        ))
+        StatCounter.objects.bulk_create(
+            [StatCounter(name=name, value=value) for name, value in totals.items()],
+            update_conflicts=True, unique_fields=["name"], update_fields=["value"],
+        )
+    return totals
@@ -41,4 +41,6 @@ class SupplierProductForm(forms.ModelForm):
 class StockUpdateForm(forms.Form):
     movement_type = forms.ChoiceField(choices=StockMovement.MOVEMENT_TYPES)
     quantity = forms.IntegerField(min_value=0)
-    reason = forms.CharField(required=False)
\ No newline at end of file
+    reason = forms.CharField(required=False)
+    # The stock the form was rendered with; the update is refused if it has changed since.
+    expected_quantity = forms.IntegerField(min_value=0, widget=forms.HiddenInput)
\ No newline at end of file
@@ -0,0 +1,307 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .cache import invalidate, INVENTORY, CATALOG
+from .ledger import StockUpdateError, change_stock
+from .models import Product, Category, Supplier, SupplierProduct
+from .sync import number_changes_on_commit
+
+
+IMPORT_BATCH_SIZE = 1000
+
+# Header names accepted for each column (lower-cased). The export CSV uses the
+# long names, so an exported file can be edited and imported back.
+COLUMN_ALIASES = {
+    "sku": ("sku",),
+    "name": ("name",),
+    "category": ("category",),
+    "suppliers": ("suppliers", "supplier"),
+    "quantity": ("quantity", "quantity in stock", "quantity_in_stock"),
+    "expiry_date": ("expiry date", "expiry_date"),
+    "batch_number": ("batch number", "batch_number"),
+    "dosage_form": ("dosage form", "dosage_form"),
+    "strength": ("strength",),
+    "price": ("price",),
+}
+
+# Column order of the original import format, used when the header isn't recognised.
+LEGACY_COLUMNS = [
+    "name", "category", "suppliers", "quantity", "expiry_date",
+    "batch_number", "dosage_form", "strength", "price",
+]
+
+# Product fields a row can set, in the order of _parse_row's keys. A column
+# missing from the file leaves the field alone on existing products.
+PRODUCT_FIELDS = [
+    "category", "quantity_in_stock", "expiry_date", "batch_number",
+    "dosage_form", "strength", "price",
+]
+COLUMN_FIELDS = {"quantity": "quantity_in_stock"}
+
+
+
+def _column_positions(header):
+    positions = {}
+    normalized = [h.strip().lower() for h in header]
+    for field, aliases in COLUMN_ALIASES.items():
+        for i, h in enumerate(normalized):
+            if h in aliases:
+                positions[field] = i
+                break
+
+    if "name" not in positions:
+        return {field: i for i, field in enumerate(LEGACY_COLUMNS)}
+    return positions
+
+
+def _dosage_form_lookup():
+    lookup = {}
+    for code, label in Product.DOSAGE_FORMS:
+        lookup[code.lower()] = code
+        lookup[label.lower()] = code
+    return lookup
+
+
+def _parse_row(row, positions, dosage_forms):
+    """Turn one CSV row into a dict of cleaned values; raises ValueError with a readable message."""
+    def cell(field):
+        i = positions.get(field)
+        if i is None or i >= len(row):
+            return ""
+        return row[i].strip()
+
+    name = cell("name")
+    if not name:
+        raise ValueError("Name is required.")
+
+    quantity = cell("quantity")
+    try:
+        quantity = int(quantity) if quantity else 0
+    except ValueError:
+        raise ValueError(f"Invalid quantity '{quantity}'.")
+    if quantity < 0:
+        raise ValueError("Quantity cannot be negative.")
+
+    expiry_date = cell("expiry_date")
+    if expiry_date:
+        parsed = parse_date(expiry_date)
+        if parsed is None:
+            raise ValueError(f"Invalid expiry date '{expiry_date}', expected YYYY-MM-DD.")
+        expiry_date = parsed
+
+    price = cell("price")
+    if price:
+        try:
+            price = Decimal(price)
+        except InvalidOperation:
+            raise ValueError(f"Invalid price '{price}'.")
+
+    dosage_form = cell("dosage_form")
+    if dosage_form:
+        if dosage_form.lower() not in dosage_forms:
+            raise ValueError(f"Unknown dosage form '{dosage_form}'.")
+        dosage_form = dosage_forms[dosage_form.lower()]
+
+    return {
+        "sku": cell("sku") or None,
+        "name": name,
+        "category": cell("category") or None,
+        "suppliers": [s.strip() for s in cell("suppliers").split(",") if s.strip()],
+        "quantity_in_stock": quantity,
+        "expiry_date": expiry_date or None,
+        "batch_number": cell("batch_number") or None,
+        "dosage_form": dosage_form or None,
+        "strength": cell("strength") or None,
+        "price": price if price != "" else None,
+    }
+
+
+
+class ProductImporter:
+    """
+    Streams a products CSV and writes it in batches.
+
+    Categories and suppliers are resolved through in-memory name maps, rows
+    matching an existing product by SKU or by name + batch number are updated
+    when ``update_existing`` is set, and each batch is written with
+    bulk_create/bulk_update inside its own transaction. Updates only touch the
+    columns present in the file, and a changed quantity goes through
+    ledger.change_stock so it is locked, checked against the quantity read for
+    the batch and recorded as an ADJUST movement. Invalid rows are skipped and
+    reported with their line number.
+    """
+
+    def __init__(self, update_existing=True, batch_size=IMPORT_BATCH_SIZE, user=None):
+        self.update_existing = update_existing
+        self.batch_size = batch_size
+        self.user = user
+        self.update_fields = PRODUCT_FIELDS
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.product_ids = []
+        self.categories = dict(Category.objects.values_list("name", "id"))
+        self.suppliers = {}
+        for supplier_id, name in Supplier.objects.order_by("-id").values_list("id", "name"):
+            self.suppliers[name] = supplier_id
+
+    def run(self, uploaded_file):
+        text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+        reader = csv.reader(text, delimiter=',', quotechar='"')
+
+        header = next(reader, None)
+        if header is None:
+            return self.report()
+
+        positions = _column_positions(header)
+        columns = {COLUMN_FIELDS.get(column, column) for column in positions}
+        self.update_fields = [field for field in PRODUCT_FIELDS if field in columns]
+        dosage_forms = _dosage_form_lookup()
+
+        batch = []
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            try:
+                batch.append((reader.line_num, _parse_row(row, positions, dosage_forms)))
+            except ValueError as e:
+                self.errors.append((reader.line_num, str(e)))
+
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+
+        if batch:
+            self._write_batch(batch)
+        # Bulk writes don't send model signals, so cached stats and lists are invalidated here.
+        invalidate(INVENTORY, CATALOG)
+        return self.report()
+
+    def report(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "errors": self.errors,
+            "product_ids": self.product_ids,
+        }
+
+    def _write_batch(self, batch):
+        categories, suppliers = dict(self.categories), dict(self.suppliers)
+        try:
+            with transaction.atomic():
+                self._resolve_names(batch)
+                self._save_products(batch)
+        except Exception as e:
+            # The rows written for this batch were rolled back, so forget the names it added too.
+            self.categories, self.suppliers = categories, suppliers
+            for line, _ in batch:
+                self.errors.append((line, f"Batch could not be saved: {str(e)}"))
+
+    def _resolve_names(self, batch):
+        new_categories = {r["category"] for _, r in batch if r["category"]} - self.categories.keys()
+        if new_categories:
+            Category.objects.bulk_create([Category(name=n) for n in new_categories], ignore_conflicts=True)
+            self.categories.update(Category.objects.filter(name__in=new_categories).values_list("name", "id"))
+
+        new_suppliers = {n for _, r in batch for n in r["suppliers"]} - self.suppliers.keys()
+        if new_suppliers:
+            Supplier.objects.bulk_create([Supplier(name=n) for n in new_suppliers])
+            for supplier_id, name in (Supplier.objects.filter(name__in=new_suppliers)
+                                      .order_by("-id").values_list("id", "name")):
+                self.suppliers[name] = supplier_id
+
+    def _find_existing(self, batch):
+        # SKUs are looked up even when not updating, so a taken one is reported instead of failing the batch.
+        skus = {r["sku"] for _, r in batch if r["sku"]}
+        by_sku = {p.sku: p for p in Product.objects.filter(sku__in=skus)} if skus else {}
+        if not self.update_existing:
+            return by_sku, {}
+
+        names = {r["name"] for _, r in batch}
+        by_name_batch = {
+            (p.name, p.batch_number): p
+            for p in Product.objects.filter(name__in=names).order_by("id")
+        }
+        return by_sku, by_name_batch
+
+    def _set_fields(self, product, r, fields):
+        for field in fields:
+            if field == "category":
+                product.category_id = self.categories.get(r["category"]) if r["category"] else None
+            else:
+                setattr(product, field, r[field])
+
+    def _save_products(self, batch):
+        by_sku, by_name_batch = self._find_existing(batch)
+        existing = set(map(id, by_sku.values())) | set(map(id, by_name_batch.values()))
+        # Quantities are set through the ledger below, not by bulk_update().
+        update_fields = [field for field in self.update_fields if field != "quantity_in_stock"]
+
+        to_create = []
+        pending = {}
+        supplier_links = {}
+        stock_changes = {}
+        for line, r in batch:
+            product = by_sku.get(r["sku"]) if r["sku"] else None
+            if product is not None and id(product) in existing and not self.update_existing:
+                self.errors.append((line, f"SKU '{r['sku']}' already exists."))
+                continue
+            if product is None:
+                product = by_name_batch.get((r["name"], r["batch_number"]))
+
+            if product is None:
+                product = Product(name=r["name"], sku=r["sku"])
+                to_create.append(product)
+                if r["sku"]:
+                    by_sku[r["sku"]] = product
+                if self.update_existing:
+                    by_name_batch[(r["name"], r["batch_number"])] = product
+            # Several rows for the same product: the last one wins.
+            pending[id(product)] = product
+            supplier_links.setdefault(id(product), set()).update(r["suppliers"])
+
+            if id(product) not in existing:
+                self._set_fields(product, r, PRODUCT_FIELDS)
+                continue
+            self._set_fields(product, r, update_fields)
+            if "quantity_in_stock" in self.update_fields:
+                stock_changes[id(product)] = (line, r["quantity_in_stock"])
+            # bulk_update() skips auto_now and save().
+            product.updated_at = timezone.now()
+            product.change_seq = None
+
+        for key, (line, quantity) in stock_changes.items():
+            product = pending[key]
+            if quantity == product.quantity_in_stock:
+                continue
+            try:
+                change_stock(product, "ADJUST", new_quantity=quantity, reason="CSV import", user=self.user,
+                             expected_quantity=product.quantity_in_stock)
+            except StockUpdateError as e:
+                self.errors.append((line, str(e)))
+                del pending[key]
+
+        to_update = [product for key, product in pending.items() if key in existing]
+        Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+        Product.objects.bulk_update(to_update, update_fields + ["updated_at", "change_seq"],
+                                    batch_size=self.batch_size)
+        number_changes_on_commit()
+
+        SupplierProduct.objects.bulk_create(
+            [
+                SupplierProduct(supplier_id=self.suppliers[name], product=product)
+                for key, product in pending.items()
+                for name in supplier_links[key]
+            ],
+            ignore_conflicts=True,
+            batch_size=self.batch_size,
+        )
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        self.product_ids.extend(p.pk for p in pending.values())
@@ -0,0 +1,162 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import counters
+from .logs import current_request_id, request_id_context
+from .metrics import JOB_SECONDS
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+
+JOB_HANDLERS = {
+    "inventory_alerts": "inventory.utils.check_and_send_inventory_alerts",
+    "render_report": "inventory.reports.render_report",
+}
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 60
+
+
+
+def enqueue(name, payload=None, dedupe_key=None, delay=0):
+    """
+    Queue a job for the ``run_jobs`` worker. While a job with the same
+    ``dedupe_key`` is still pending, further calls are no-ops, so a burst of
+    enqueues within ``delay`` seconds collapses into a single run.
+    """
+    payload = payload or {}
+
+    if getattr(settings, "JOBS_RUN_INLINE", False):
+        # Like a queued job, a failure is logged and never reaches the caller,
+        # whose own write has already been made.
+        try:
+            import_string(JOB_HANDLERS[name])(**payload)
+        except Exception as e:
+            logger.error(f"Inline job {name} failed: {str(e)}", exc_info=True)
+        return None
+
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                name=name,
+                payload=payload,
+                dedupe_key=dedupe_key,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                request_id=current_request_id(),
+            )
+            _moved(None, "pending")
+            return job
+    except IntegrityError:
+        return None
+
+
+
+def _moved(previous, status):
+    """Keep the job counters read by the metrics exporter in step with a status change."""
+    counters.add(counters.status_deltas(counters.JOB_COUNTERS, previous, status))
+
+
+
+def claim_next_job():
+    now = timezone.now()
+    candidates = Job.objects.filter(status="pending", run_after__lte=now).order_by("run_after", "id")
+
+    for job in candidates[:10]:
+        # The conditional update is the claim: only one worker can move a job out of pending.
+        with transaction.atomic():
+            claimed = Job.objects.filter(pk=job.pk, status="pending").update(
+                status="running", attempts=F("attempts") + 1, updated_at=now
+            )
+            if claimed:
+                _moved("pending", "running")
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+
+def run_job(job):
+    # Log under the id of the request that queued the job.
+    with request_id_context(job.request_id or f"job-{job.pk}"):
+        return _run_job(job)
+
+
+def _run_job(job):
+    start = time.perf_counter()
+    try:
+        import_string(JOB_HANDLERS[job.name])(**job.payload)
+    except Exception as e:
+        JOB_SECONDS.observe(time.perf_counter() - start, job=job.name, outcome="error")
+        logger.error(f"Job {job.pk} ({job.name}) failed on attempt {job.attempts}: {str(e)}", exc_info=True)
+        job.last_error = traceback.format_exc()
+
+        if job.attempts < MAX_ATTEMPTS:
+            job.status = "pending"
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY_SECONDS * job.attempts)
+            try:
+                with transaction.atomic():
+                    job.save(update_fields=["status", "run_after", "last_error", "updated_at"])
+                    _moved("running", "pending")
+                return False
+            except IntegrityError:
+                # A newer pending job with the same key will redo the work.
+                pass
+
+        job.status = "failed"
+        with transaction.atomic():
+            job.save(update_fields=["status", "last_error", "updated_at"])
+            _moved("running", "failed")
+        return False
+
+    JOB_SECONDS.observe(time.perf_counter() - start, job=job.name, outcome="done")
+    logger.info(f"Job {job.pk} ({job.name}) done in {time.perf_counter() - start:.2f}s on attempt {job.attempts}")
+    job.status = "done"
+    job.last_error = None
+    with transaction.atomic():
+        job.save(update_fields=["status", "last_error", "updated_at"])
+        _moved("running", "done")
+    return True
+
+
+
+def requeue_stale_jobs(older_than_seconds):
+    """Put jobs whose worker died mid-run back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    requeued = 0
+    for job in Job.objects.filter(status="running", updated_at__lt=cutoff):
+        job.status = "pending"
+        try:
+            with transaction.atomic():
+                job.save(update_fields=["status", "updated_at"])
+                _moved("running", "pending")
+            requeued += 1
+        except IntegrityError:
+            job.status = "failed"
+            job.last_error = "Superseded by a newer pending job after the worker stopped."
+            with transaction.atomic():
+                job.save(update_fields=["status", "last_error", "updated_at"])
+                _moved("running", "failed")
+    return requeued
+
+
+
+def run_pending_jobs(limit=None):
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,201 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .counters import add, stock_deltas
+from .models import Product, StockMovement, StockDailyRollup
+
+
+HISTORY_DAYS = 90
+STOCK_UPDATE_RETRIES = 5
+
+
+
+class StockUpdateError(Exception):
+    pass
+
+
+class StaleStockError(StockUpdateError):
+    """The stock changed after the caller read it (see ``expected_quantity``)."""
+
+    def __init__(self, product, expected, current):
+        self.expected = expected
+        self.current = current
+        super().__init__(
+            f"Stock for {product.name} changed from {expected} to {current} while you were editing it. "
+            f"Check the new quantity and submit again."
+        )
+
+
+
+def _rollup_deltas(movement):
+    """Column increments for one movement. OUT is stored as units removed; IN and ADJUST as the signed change."""
+    if movement.movement_type == "IN":
+        return {"in_quantity": movement.quantity_change}
+    if movement.movement_type == "OUT":
+        return {"out_quantity": -movement.quantity_change}
+    return {"adjust_quantity": movement.quantity_change}
+
+
+
+def update_daily_rollup(movement):
+    day = timezone.localdate(movement.created_at)
+    deltas = _rollup_deltas(movement)
+
+    def bump():
+        return StockDailyRollup.objects.filter(product_id=movement.product_id, date=day).update(
+            closing_quantity=movement.new_quantity,
+            movement_count=F("movement_count") + 1,
+            **{field: F(field) + value for field, value in deltas.items()},
+        )
+
+    if bump():
+        return
+    try:
+        with transaction.atomic():
+            StockDailyRollup.objects.create(
+                product_id=movement.product_id,
+                date=day,
+                opening_quantity=movement.previous_quantity,
+                closing_quantity=movement.new_quantity,
+                movement_count=1,
+                **deltas,
+            )
+    except IntegrityError:
+        # Another request created today's row first.
+        bump()
+
+
+
+def record_stock_movement(product, movement_type, previous_quantity, new_quantity, reason=None, user=None,
+                          client_key=None):
+    """Write a ledger entry and fold it into the product's daily rollup in the same transaction."""
+    with transaction.atomic():
+        movement = StockMovement.objects.create(
+            product=product,
+            movement_type=movement_type,
+            previous_quantity=previous_quantity,
+            new_quantity=new_quantity,
+            quantity_change=new_quantity - previous_quantity,
+            reason=reason,
+            user=user,
+            client_key=client_key,
+        )
+        update_daily_rollup(movement)
+    return movement
+
+
+
+def lock_product(product_id):
+    """
+    Take the write lock on a product row for the rest of the transaction.
+    SQLite ignores SELECT ... FOR UPDATE, so a no-op UPDATE grabs its write
+    lock instead; starting with a write makes concurrent writers queue on the
+    busy timeout rather than fail when upgrading a read lock.
+    """
+    products = Product.objects.filter(pk=product_id)
+    if connection.features.has_select_for_update:
+        return products.select_for_update().values_list("quantity_in_stock", flat=True).get()
+    products.update(quantity_in_stock=F("quantity_in_stock"))
+    return products.values_list("quantity_in_stock", flat=True).get()
+
+
+
+def change_stock(product, movement_type, new_quantity=None, delta=None, reason=None, user=None,
+                 client_key=None, expected_quantity=None, retries=STOCK_UPDATE_RETRIES):
+    """
+    Set (``new_quantity``) or shift (``delta``) a product's stock without lost updates.
+
+    The product row is locked before its quantity is read, so the ledger's
+    previous_quantity is always the value that was replaced, and the quantity
+    update and its ledger entry commit together. A lock can't tell that an
+    absolute ``new_quantity`` was decided from an outdated reading, so callers
+    setting one pass the quantity they saw as ``expected_quantity``; if the
+    stock has moved since, StaleStockError is raised and nothing is written.
+    """
+    from .sync import number_changes_on_commit
+
+    if (new_quantity is None) == (delta is None):
+        raise ValueError("Pass exactly one of new_quantity or delta.")
+
+    for _ in range(retries):
+        try:
+            with transaction.atomic():
+                current = lock_product(product.pk)
+                if expected_quantity is not None and current != expected_quantity:
+                    raise StaleStockError(product, expected_quantity, current)
+                target = new_quantity if new_quantity is not None else current + delta
+                if target < 0:
+                    raise StockUpdateError(f"Stock for {product.name} cannot go below zero.")
+
+                Product.objects.filter(pk=product.pk).update(quantity_in_stock=target, updated_at=timezone.now(),
+                                                             change_seq=None)
+                add(stock_deltas(current, target))
+                number_changes_on_commit()
+                movement = record_stock_movement(
+                    product, movement_type, current, target, reason, user, client_key=client_key
+                )
+        except OperationalError as e:
+            # SQLite gives up with "database is locked" after its busy timeout; try again.
+            if "locked" not in str(e):
+                raise
+            continue
+
+        product.quantity_in_stock = target
+        return movement
+
+    raise StockUpdateError(f"Stock for {product.name} is being updated by someone else, please try again.")
+
+
+
+def product_history(product, days=HISTORY_DAYS):
+    since = timezone.localdate() - timedelta(days=days)
+    return list(product.daily_rollups.filter(date__gte=since).order_by("date"))
+
+
+def daily_totals(days=HISTORY_DAYS):
+    """Movement totals across all products per day, read from the rollups."""
+    since = timezone.localdate() - timedelta(days=days)
+    return list(
+        StockDailyRollup.objects.filter(date__gte=since)
+        .values("date")
+        .annotate(
+            in_quantity=Sum("in_quantity"),
+            out_quantity=Sum("out_quantity"),
+            adjust_quantity=Sum("adjust_quantity"),
+            movement_count=Sum("movement_count"),
+        )
+        .order_by("date")
+    )
+
+
+
+def rebuild_daily_rollups(since=None, batch_size=2000):
+    """Recompute rollups from the raw ledger (used to backfill or repair them)."""
+    movements = StockMovement.objects.order_by("product_id", "created_at", "id").only(
+        "product_id", "movement_type", "previous_quantity", "new_quantity", "quantity_change", "created_at"
+    )
+    rollups = StockDailyRollup.objects.all()
+    if since:
+        movements = movements.filter(created_at__date__gte=since)
+        rollups = rollups.filter(date__gte=since)
+
+    rows = {}
+    for movement in movements.iterator(chunk_size=batch_size):
+        key = (movement.product_id, timezone.localdate(movement.created_at))
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = StockDailyRollup(
+                product_id=movement.product_id, date=key[1], opening_quantity=movement.previous_quantity
+            )
+        for field, value in _rollup_deltas(movement).items():
+            setattr(row, field, getattr(row, field) + value)
+        row.closing_quantity = movement.new_quantity
+        row.movement_count += 1
+
+    with transaction.atomic():
+        rollups.delete()
+        StockDailyRollup.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,131 @@
+import atexit
+import copy
+import json
+import logging
+import re
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+
+
+# Log records are put on an in-memory queue by the thread that logs and written
+# to a size-rotated file by one listener thread per process, so request threads
+# never wait on disk. Every record carries the id of the request (or job) it
+# belongs to; jobs inherit the id of the request that queued them.
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+_request_id = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra={...}.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def request_id_context(request_id):
+    """Log everything inside the block under ``request_id``, e.g. while a job runs."""
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+
+class RequestIdMiddleware:
+    """
+    Give each request an id: the proxy's X-Request-ID when it sends a sane one,
+    otherwise a new one. It is on every log record for the request, on jobs it
+    queues, and sent back in the response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        request_id = incoming if _REQUEST_ID_RE.match(incoming) else new_request_id()
+        request.request_id = request_id
+        with request_id_context(request_id):
+            response = self.get_response(request)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any ``extra={...}`` fields included."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Resolve the message and traceback in the logging thread, but leave
+        # the record's fields alone: the listener's formatter does the output.
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def queue_handler(filename, max_bytes=10 * 1024 * 1024, backup_count=5, structured=True):
+    """
+    LOGGING handler factory (``"()": "inventory.logs.queue_handler"``): a
+    QueueHandler feeding a RotatingFileHandler through a QueueListener thread.
+    ``structured=False`` writes the bare message, for logs that already are JSON.
+    """
+    target = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                 encoding="utf-8", delay=True)
+    target.setFormatter(JsonFormatter() if structured else logging.Formatter("%(message)s"))
+
+    queue = SimpleQueue()
+    listener = QueueListener(queue, target, respect_handler_level=True)
+    listener.start()
+    # Flush what's still queued when the process exits.
+    atexit.register(listener.stop)
+
+    handler = _StructuredQueueHandler(queue)
+    handler.addFilter(RequestIdFilter())
+    return handler
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.cache import invalidate, INVENTORY
+from inventory.models import Product
+from inventory.sku import assign_skus
+from inventory.sync import number_changes_on_commit
+
+
+class Command(BaseCommand):
+    help = "Assign SKUs to products that don't have one (e.g. rows bulk-created before SKU allocation)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+
+        while True:
+            with transaction.atomic():
+                products = list(Product.objects.filter(sku__isnull=True).order_by("id").only("id", "sku")[:batch_size])
+                if not products:
+                    break
+                assign_skus(products)
+                for product in products:
+                    # Put them back in the sync feed with their new SKU.
+                    product.change_seq = None
+                Product.objects.bulk_update(products, ["sku", "change_seq"])
+                invalidate(INVENTORY)
+                number_changes_on_commit()
+            total += len(products)
+
+        self.stdout.write(self.style.SUCCESS(f"Assigned SKUs to {total} products."))
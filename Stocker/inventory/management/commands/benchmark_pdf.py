@@ -0,0 +1,53 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import Category, Product
+from inventory.reports import write_table_pdf
+
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Time the table PDF renderer on a large inventory report."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        filters = {"category": "", "status": "", "search": ""}
+
+        # Seeded inside a transaction that is rolled back afterwards.
+        with transaction.atomic():
+            category = Category.objects.create(name="Benchmark category")
+            for offset in range(0, rows, BATCH_SIZE):
+                Product.objects.bulk_create([
+                    Product(name=f"Benchmark product {i}", category=category, quantity_in_stock=1 + i % 99)
+                    for i in range(offset, min(offset + BATCH_SIZE, rows))
+                ])
+
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as output:
+                start = time.perf_counter()
+                write_table_pdf("inventory", filters, output)
+                elapsed = time.perf_counter() - start
+            size = os.path.getsize(output.name)
+
+            # Second pass for memory only: tracemalloc slows the render down a lot.
+            with open(output.name, "wb") as output_again:
+                tracemalloc.start()
+                write_table_pdf("inventory", filters, output_again)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            os.unlink(output.name)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Rows: {rows}")
+        self.stdout.write(f"Render time: {elapsed:.2f}s")
+        self.stdout.write(f"Peak Python memory: {peak / 1024 / 1024:.1f} MB")
+        self.stdout.write(f"File size: {size / 1024 / 1024:.1f} MB")
@@ -0,0 +1,82 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from inventory.models import Product
+from inventory.search import search_products
+
+
+BATCH_SIZE = 5000
+WORDS = [
+    "paracetamol", "ibuprofen", "amoxicillin", "cetirizine", "omeprazole", "metformin",
+    "atorvastatin", "salbutamol", "loratadine", "diclofenac", "azithromycin", "insulin",
+    "vitamin", "zinc", "syrup", "tablet", "capsule", "cream", "drops", "forte", "extra",
+]
+
+
+def icontains_search(text):
+    return Product.objects.filter(Q(name__icontains=text) | Q(description__icontains=text))
+
+
+def indexed_search(text):
+    return search_products(Product.objects.all(), text)
+
+
+class Command(BaseCommand):
+    help = "Compare the full-text product search against the old icontains filter."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000",
+                            help="Comma separated product counts to benchmark.")
+        parser.add_argument("--queries", default="paracetamol,zinc syrup,ibupro",
+                            help="Comma separated search strings.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        queries = [q.strip() for q in options["queries"].split(",") if q.strip()]
+        rng = random.Random(options["seed"])
+
+        self.stdout.write(f"Database: {connection.vendor}")
+        self.stdout.write(f"{'products':>10} {'query':<16} {'icontains ms':>13} {'rows':>7} {'indexed ms':>11} {'rows':>7}")
+        for size in sizes:
+            # Seeded inside a transaction that is rolled back afterwards.
+            with transaction.atomic():
+                self._seed(size, rng)
+                for text in queries:
+                    old_ms, old_rows = self._measure(icontains_search, text, options["repeat"])
+                    new_ms, new_rows = self._measure(indexed_search, text, options["repeat"])
+                    self.stdout.write(
+                        f"{size:>10} {text:<16} {old_ms:>13.2f} {old_rows:>7} {new_ms:>11.2f} {new_rows:>7}"
+                    )
+                transaction.set_rollback(True)
+
+    def _measure(self, search, text, repeat):
+        # Fetch the first page the way products_list_view does.
+        rows = len(list(search(text)[:8].values_list("id", flat=True)))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(search(text)[:8].values_list("id", flat=True))
+            search(text).count()
+        return (time.perf_counter() - start) * 1000 / repeat, rows
+
+    def _seed(self, size, rng):
+        # A large synthetic vocabulary keeps the real drug names selective, as in a real catalog.
+        syllables = ["ba", "co", "di", "fe", "ga", "li", "mo", "nu", "pa", "ri", "so", "ta", "vi", "xo", "ze"]
+        vocabulary = ["".join(rng.choices(syllables, k=4)) for _ in range(5000)]
+
+        def word():
+            return rng.choice(WORDS) if rng.random() < 0.02 else rng.choice(vocabulary)
+
+        for offset in range(0, size, BATCH_SIZE):
+            Product.objects.bulk_create([
+                Product(
+                    name=f"{word()} {word()}".title(),
+                    description=" ".join(word() for _ in range(12)),
+                )
+                for _ in range(min(BATCH_SIZE, size - offset))
+            ])
@@ -0,0 +1,110 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventory.models import Product, Supplier, SupplierProduct
+from inventory.utils import (
+    compute_stock_stats, compute_supplier_stats, LOW_STOCK_THRESHOLD, NEAR_EXPIRY_DAYS,
+)
+
+
+BATCH_SIZE = 5000
+
+
+def legacy_stock_stats():
+    today = timezone.localdate()
+    return {
+        "total_products": Product.objects.count(),
+        "out_of_stock": Product.objects.filter(quantity_in_stock=0).count(),
+        "low_stock": Product.objects.filter(
+            quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0
+        ).count(),
+        "expired": Product.objects.filter(expiry_date__isnull=False, expiry_date__lt=today).count(),
+        "near_expiry": Product.objects.filter(
+            expiry_date__isnull=False,
+            expiry_date__gte=today,
+            expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS),
+        ).count(),
+    }
+
+
+def legacy_supplier_stats():
+    today = timezone.localdate()
+    suppliers = Supplier.objects.all()
+    return {
+        "total_suppliers": suppliers.count(),
+        "total_supplied_products": Product.objects.filter(suppliers__isnull=False).distinct().count(),
+        "suppliers_with_low_stock": suppliers.filter(
+            products__quantity_in_stock__lt=LOW_STOCK_THRESHOLD, products__quantity_in_stock__gt=0
+        ).distinct().count(),
+        "suppliers_with_expired": suppliers.filter(
+            products__expiry_date__isnull=False, products__expiry_date__lt=today
+        ).distinct().count(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare query count and latency of the stock/supplier stats against the legacy per-bucket queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000",
+                            help="Comma separated product counts to benchmark.")
+        parser.add_argument("--suppliers", type=int, default=300)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        rng = random.Random(options["seed"])
+
+        self.stdout.write(f"{'products':>10} {'function':<24} {'queries':>8} {'avg ms':>10}")
+        for size in sizes:
+            # Everything is seeded inside a transaction that is rolled back,
+            # so the benchmark never leaves data behind.
+            with transaction.atomic():
+                self._seed(size, options["suppliers"], rng)
+                for label, func in (
+                    ("legacy stock stats", legacy_stock_stats),
+                    ("compute_stock_stats", compute_stock_stats),
+                    ("legacy supplier stats", legacy_supplier_stats),
+                    ("compute_supplier_stats", compute_supplier_stats),
+                ):
+                    queries, elapsed = self._measure(func, options["repeat"])
+                    self.stdout.write(f"{size:>10} {label:<24} {queries:>8} {elapsed:>10.2f}")
+                transaction.set_rollback(True)
+
+    def _measure(self, func, repeat):
+        func()  # warm up
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        queries = len(ctx.captured_queries)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return queries, (time.perf_counter() - start) * 1000 / repeat
+
+    def _seed(self, size, supplier_count, rng):
+        today = timezone.localdate()
+        suppliers = Supplier.objects.bulk_create(
+            [Supplier(name=f"Bench Supplier {i}") for i in range(supplier_count)]
+        )
+
+        for offset in range(0, size, BATCH_SIZE):
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f"Bench Product {offset + i}",
+                    quantity_in_stock=rng.choice((0, rng.randint(1, LOW_STOCK_THRESHOLD * 3))),
+                    expiry_date=today + timedelta(days=rng.randint(-60, 365)) if rng.random() < 0.8 else None,
+                )
+                for i in range(min(BATCH_SIZE, size - offset))
+            ])
+            SupplierProduct.objects.bulk_create([
+                SupplierProduct(supplier=rng.choice(suppliers), product=product)
+                for product in products
+            ])
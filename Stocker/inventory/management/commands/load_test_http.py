@@ -0,0 +1,124 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+
+# (label, URL name, query string) driven by default; override with --path.
+ENDPOINTS = [
+    ("dashboard", "inventory:dashboard_view", ""),
+    ("dashboard api", "inventory:dashboard_data_view", ""),
+    ("products", "inventory:products_list_view", ""),
+    ("product search", "inventory:products_list_view", "?search=paracetamol"),
+    ("global search", "inventory:global_search", "?search=zinc"),
+    ("stock status", "inventory:stock_status_view", ""),
+    ("movements", "inventory:stock_movements_view", ""),
+    ("suppliers", "inventory:supplier_list_view", ""),
+    ("categories", "inventory:category_list", ""),
+    ("notifications", "inventory:notifications_list_view", ""),
+    ("inventory report", "inventory:inventory_reports_view", ""),
+    ("supplier report", "inventory:supplier_reports_view", ""),
+    ("sync pull", "inventory:sync_pull_view", "?limit=200"),
+]
+
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def login_session(username):
+    """Create a session for ``username`` directly, so the run doesn't depend on the login form."""
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        raise CommandError(f"User '{username}' does not exist.")
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return session
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main pages concurrently against a running server (e.g. runserver or gunicorn) "
+        "and report latency percentiles and throughput per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--user", required=True, help="Existing user to make the requests as.")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per endpoint first.")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="Load this path instead of the default endpoints (repeatable).")
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["requests"] < 1:
+            raise CommandError("--concurrency and --requests must be at least 1.")
+
+        base_url = options["base_url"].rstrip("/")
+        if options["paths"]:
+            endpoints = [(path, path) for path in options["paths"]]
+        else:
+            endpoints = [(label, reverse(name) + query) for label, name, query in ENDPOINTS]
+
+        session = login_session(options["user"])
+        cookies = {settings.SESSION_COOKIE_NAME: session.session_key}
+        local = threading.local()
+
+        def fetch(url):
+            # One keep-alive connection per worker thread.
+            if not hasattr(local, "http"):
+                local.http = requests.Session()
+                local.http.cookies.update(cookies)
+            start = time.perf_counter()
+            try:
+                response = local.http.get(url, timeout=options["timeout"], allow_redirects=False)
+                response.content
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        self.stdout.write(f"Target: {base_url}, concurrency: {options['concurrency']}, "
+                          f"requests per endpoint: {options['requests']}")
+        self.stdout.write(f"{'endpoint':<20} {'reqs':>6} {'errors':>6} {'req/s':>8} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                for label, path in endpoints:
+                    url = base_url + path
+                    list(pool.map(fetch, [url] * options["warmup"]))
+
+                    start = time.perf_counter()
+                    results = list(pool.map(fetch, [url] * options["requests"]))
+                    elapsed = time.perf_counter() - start
+
+                    latencies = sorted(seconds * 1000 for seconds, _ in results)
+                    errors = sum(1 for _, ok in results if not ok)
+                    self.stdout.write(
+                        f"{label[:20]:<20} {len(results):>6} {errors:>6} {len(results) / elapsed:>8.1f} "
+                        f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+                        f"{percentile(latencies, 99):>8.1f} {latencies[-1]:>8.1f}"
+                    )
+        finally:
+            session.delete()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventory.ledger import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily stock rollups from the stock movement ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days on or after this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_date(options["since"])
+            if since is None:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+
+        count = rebuild_daily_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily rollups."))
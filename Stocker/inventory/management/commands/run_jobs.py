@@ -0,0 +1,77 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.counters import recount
+from inventory.jobs import run_pending_jobs, requeue_stale_jobs
+from inventory.metrics import start_metrics_server
+from inventory.models import Job
+from inventory.notifications import recount_unread
+from inventory.reports import prune_report_files
+from inventory.snapshots import has_snapshot, take_snapshot
+from inventory.sync import number_changes
+from inventory.utils import enqueue_expiry_sweep
+
+
+class Command(BaseCommand):
+    help = "Run the background job worker (inventory alerts and other queued work)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Process whatever is due and exit instead of polling.")
+        parser.add_argument("--sleep", type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument("--stale-after", type=int, default=600,
+                            help="Requeue running jobs not updated for this many seconds.")
+        parser.add_argument("--keep-days", type=int, default=7,
+                            help="Delete finished jobs older than this many days.")
+        parser.add_argument("--report-max-age", type=int, default=86400,
+                            help="Delete cached PDF reports older than this many seconds.")
+        parser.add_argument("--metrics-port", type=int,
+                            help="Serve Prometheus metrics for this worker on this port.")
+        parser.add_argument("--metrics-address", default="127.0.0.1",
+                            help="Address for --metrics-port. Anything but loopback needs METRICS_TOKEN.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Job worker started.")
+        if options["metrics_port"]:
+            try:
+                start_metrics_server(options["metrics_port"], options["metrics_address"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"Serving metrics on {options['metrics_address']}:{options['metrics_port']}.")
+        last_maintenance = last_recount = None
+
+        while True:
+            now = timezone.now()
+            if last_maintenance is None or now - last_maintenance > timedelta(minutes=5):
+                requeue_stale_jobs(options["stale_after"])
+                # Writers number their own changes at commit; this picks up
+                # any whose process stopped in between.
+                number_changes()
+                enqueue_expiry_sweep()
+                Job.objects.filter(
+                    status="done", updated_at__lt=now - timedelta(days=options["keep_days"])
+                ).delete()
+                prune_report_files(options["report_max_age"])
+                # Covers deployments without a daily cron for snapshot_inventory.
+                if not has_snapshot():
+                    take_snapshot()
+                # The metrics and unread counters follow every write made through
+                # the app; a daily recount also catches bulk updates and raw SQL.
+                if last_recount != timezone.localdate():
+                    recount()
+                    recount_unread()
+                    last_recount = timezone.localdate()
+                last_maintenance = now
+
+            processed = run_pending_jobs()
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s).")
+
+            if options["once"]:
+                break
+            if not processed:
+                time.sleep(options["sleep"])
@@ -0,0 +1,218 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventory.cache import invalidate, INVENTORY, CATALOG
+from inventory.counters import recount
+from inventory.ledger import rebuild_daily_rollups
+from inventory.models import Category, Notification, Product, StockMovement, Supplier, SupplierProduct
+from inventory.notifications import recount_unread
+
+
+BATCH_SIZE = 2000
+
+CATEGORIES = [
+    "Analgesics", "Antibiotics", "Antihistamines", "Antacids", "Antidiabetics", "Antihypertensives",
+    "Cardiovascular", "Dermatology", "Respiratory", "Vitamins & Supplements", "Ophthalmic", "Vaccines",
+    "Antifungals", "Antivirals", "Gastrointestinal", "Hormones", "Neurology", "Oncology", "Pediatrics",
+    "First Aid",
+]
+DRUGS = [
+    "Paracetamol", "Ibuprofen", "Amoxicillin", "Cetirizine", "Omeprazole", "Metformin", "Atorvastatin",
+    "Salbutamol", "Loratadine", "Diclofenac", "Azithromycin", "Insulin", "Vitamin C", "Zinc", "Amlodipine",
+    "Losartan", "Ciprofloxacin", "Fluconazole", "Acyclovir", "Prednisolone", "Ranitidine", "Aspirin",
+    "Clopidogrel", "Levothyroxine", "Montelukast", "Hydrocortisone", "Doxycycline", "Ferrous Sulfate",
+]
+SUPPLIER_WORDS = ["Nova", "Gulf", "Medi", "Vita", "Care", "Al Noor", "Pharma", "Bio", "Health", "Prime"]
+SUPPLIER_SUFFIXES = ["Pharma", "Medical Supplies", "Trading", "Distribution", "Healthcare", "Labs"]
+STRENGTHS = ["5mg", "10mg", "20mg", "50mg", "100mg", "250mg", "500mg", "1g", "5ml", "100ml"]
+DOSAGE_FORMS = [value for value, _ in Product.DOSAGE_FORMS]
+REASONS = {
+    "IN": ["Purchase order received", "Supplier delivery", "Returned by customer"],
+    "OUT": ["Dispensed", "Sold", "Transferred to branch", "Damaged"],
+    "ADJUST": ["Stock count correction", "Cycle count"],
+}
+
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible synthetic inventory (same --seed, same data) for load and sizing tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=len(CATEGORIES))
+        parser.add_argument("--suppliers", type=int, default=50)
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--suppliers-per-product", type=int, default=2)
+        parser.add_argument("--movements-per-product", type=int, default=5, help="Average ledger entries per product.")
+        parser.add_argument("--notifications", type=int, default=1000)
+        parser.add_argument("--days", type=int, default=90, help="Spread movements over this many past days.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        for name in ("categories", "suppliers", "products", "days"):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        if options["suppliers_per_product"] > options["suppliers"]:
+            raise CommandError("--suppliers-per-product can't exceed --suppliers.")
+
+        self.rng = random.Random(options["seed"])
+        self.now = timezone.now()
+        self.users = list(User.objects.order_by("id"))
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            categories = self._categories(options["categories"])
+            suppliers = self._suppliers(options["suppliers"])
+            products = self._products(options["products"], categories,
+                                      options["movements_per_product"], options["days"])
+            links = self._links(products, suppliers, options["suppliers_per_product"])
+            movements = self._movements()
+            notifications = self._notifications(options["notifications"])
+            rollups = rebuild_daily_rollups(since=timezone.localdate(self.now - timedelta(days=options["days"])))
+            # bulk_create skips the model signals that normally do this.
+            invalidate(INVENTORY, CATALOG)
+            recount_unread([user.pk for user in self.users])
+            recount()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(categories)} categories, {len(suppliers)} suppliers, {len(products)} products, "
+            f"{links} supplier links, {movements} stock movements ({rollups} daily rollups) and "
+            f"{notifications} notifications in {time.perf_counter() - start:.1f}s."
+        ))
+
+    def _categories(self, count):
+        names = [CATEGORIES[i % len(CATEGORIES)] + (f" {i // len(CATEGORIES) + 1}" if i >= len(CATEGORIES) else "")
+                 for i in range(count)]
+        existing = {c.name: c for c in Category.objects.filter(name__in=names)}
+        Category.objects.bulk_create([Category(name=name) for name in names if name not in existing])
+        return list(Category.objects.filter(name__in=names).order_by("id"))
+
+    def _suppliers(self, count):
+        rng = self.rng
+        suppliers = []
+        for i in range(count):
+            name = f"{rng.choice(SUPPLIER_WORDS)} {rng.choice(SUPPLIER_SUFFIXES)} {i + 1}"
+            slug = name.lower().replace(" ", "")
+            suppliers.append(Supplier(
+                name=name,
+                email=f"orders@{slug}.example.com",
+                phone=f"+966 5{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+                website=f"https://{slug}.example.com",
+            ))
+        return Supplier.objects.bulk_create(suppliers, batch_size=BATCH_SIZE)
+
+    def _expiry_date(self):
+        # Roughly 10% without expiry, 5% expired, 10% near expiry and the rest months away.
+        today, roll = timezone.localdate(), self.rng.random()
+        if roll < 0.10:
+            return None
+        if roll < 0.15:
+            return today - timedelta(days=self.rng.randint(1, 180))
+        if roll < 0.25:
+            return today + timedelta(days=self.rng.randint(0, 30))
+        return today + timedelta(days=self.rng.randint(31, 1080))
+
+    def _products(self, count, categories, movements_per_product, days):
+        """Build the products with their ledgers, so each starts at its final quantity."""
+        rng = self.rng
+        products, self.ledgers = [], []
+        for i in range(count):
+            drug, strength = rng.choice(DRUGS), rng.choice(STRENGTHS)
+            form = rng.choice(DOSAGE_FORMS)
+            products.append(Product(
+                name=f"{drug} {strength} {form.title()} #{i + 1}",
+                description=f"{drug} {strength} {form}, batch controlled stock item.",
+                category=rng.choice(categories),
+                expiry_date=self._expiry_date(),
+                batch_number=f"B{rng.randint(2023, 2026)}-{rng.randint(0, 99999):05d}",
+                dosage_form=form,
+                strength=strength,
+                price=Decimal(rng.randint(50, 50000)) / 100,
+            ))
+            movements, products[-1].quantity_in_stock = self._ledger(
+                products[-1], rng.randint(0, 2 * movements_per_product), days
+            )
+            self.ledgers.append(movements)
+        return Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+
+    def _links(self, products, suppliers, per_product):
+        rng, created = self.rng, 0
+        for offset in range(0, len(products), BATCH_SIZE):
+            links = [
+                SupplierProduct(
+                    supplier=supplier,
+                    product=product,
+                    unit_cost=(product.price * Decimal(rng.uniform(0.4, 0.8))).quantize(Decimal("0.01")),
+                    lead_time_days=rng.randint(1, 30),
+                    last_supplied=timezone.localdate() - timedelta(days=rng.randint(0, 120)),
+                    is_active=rng.random() > 0.1,
+                    min_order_qty=rng.choice([1, 10, 50, 100]),
+                )
+                for product in products[offset:offset + BATCH_SIZE]
+                for supplier in rng.sample(suppliers, per_product)
+            ]
+            SupplierProduct.objects.bulk_create(links)
+            created += len(links)
+        return created
+
+    def _ledger(self, product, count, days):
+        """A consistent chain of movements for one product; returns (movements, final quantity)."""
+        rng, quantity, movements = self.rng, 0, []
+        times = sorted(self.now - timedelta(seconds=rng.randint(0, days * 86400)) for _ in range(count))
+        for i, created_at in enumerate(times):
+            roll = rng.random()
+            if i == 0 or roll < 0.35:
+                movement_type, new_quantity = "IN", quantity + rng.randint(20, 400)
+            elif roll < 0.9:
+                movement_type, new_quantity = "OUT", quantity - rng.randint(0, quantity)
+            else:
+                movement_type, new_quantity = "ADJUST", max(quantity + rng.randint(-5, 5), 0)
+            movements.append(StockMovement(
+                product=product,
+                movement_type=movement_type,
+                previous_quantity=quantity,
+                new_quantity=new_quantity,
+                quantity_change=new_quantity - quantity,
+                reason=rng.choice(REASONS[movement_type]),
+                user=rng.choice(self.users) if self.users else None,
+                created_at=created_at,
+            ))
+            quantity = new_quantity
+        return movements, quantity
+
+    def _movements(self):
+        created = 0
+        for offset in range(0, len(self.ledgers), BATCH_SIZE // 5):
+            movements = [m for ledger in self.ledgers[offset:offset + BATCH_SIZE // 5] for m in ledger]
+            created_at = [movement.created_at for movement in movements]
+            movements = StockMovement.objects.bulk_create(movements)
+            # auto_now_add stamps every row with now; put the generated history
+            # back. bulk_update()'s CASE expressions are far slower than this.
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"UPDATE {StockMovement._meta.db_table} SET created_at = %s WHERE id = %s",
+                    [(connection.ops.adapt_datetimefield_value(value), movement.pk)
+                     for movement, value in zip(movements, created_at)],
+                )
+            created += len(movements)
+        return created
+
+    def _notifications(self, count):
+        rng, types = self.rng, [value for value, _ in Notification.NOTIFICATION_TYPES]
+        notifications = [
+            Notification(
+                title=f"Seeded notification {i + 1}",
+                message="Generated by seed_inventory.",
+                type=rng.choice(types),
+                is_read=rng.random() < 0.7,
+                user=rng.choice(self.users) if self.users else None,
+            )
+            for i in range(count)
+        ]
+        return len(Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE))
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory.slowlog import read_log, summarize
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow query log: the statements that cost the most total time, with their EXPLAIN plans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=settings.SLOW_QUERY_LOG, help="Slow query log to read.")
+        parser.add_argument("--top", type=int, default=10, help="How many statements to show.")
+        parser.add_argument("--hours", type=float, help="Only queries logged in the last N hours.")
+        parser.add_argument("--view", help="Only queries run by this URL name, e.g. inventory:products_list_view.")
+        parser.add_argument("--no-plans", action="store_true", help="Leave out the EXPLAIN plans.")
+
+    def handle(self, *args, **options):
+        try:
+            records = list(read_log(options["log"]))
+        except FileNotFoundError:
+            raise CommandError(f"No slow query log at {options['log']}.")
+
+        if options["hours"]:
+            cutoff = timezone.now() - timedelta(hours=options["hours"])
+            records = [r for r in records if (parse_datetime(r["time"]) or cutoff) >= cutoff]
+        if options["view"]:
+            records = [r for r in records if r.get("view") == options["view"]]
+        if not records:
+            self.stdout.write("No slow queries logged.")
+            return
+
+        groups = summarize(records)
+        total_ms = sum(group["total_ms"] for group in groups)
+        self.stdout.write(f"{len(records)} slow queries, {len(groups)} distinct statements, "
+                          f"{total_ms / 1000:.1f} s in total.\n")
+
+        for rank, group in enumerate(groups[:options["top"]], start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"#{rank} {group['fingerprint']}  total {group['total_ms']:.0f} ms "
+                f"({group['total_ms'] * 100 / total_ms:.0f}%), {group['count']} calls, "
+                f"avg {group['total_ms'] / group['count']:.1f} ms, max {group['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"  last seen: {group['last_seen']}")
+            views = sorted(group["views"].items(), key=lambda item: item[1], reverse=True)
+            self.stdout.write("  views: " + ", ".join(f"{view} ({count})" for view, count in views))
+            for call_site, count in sorted(group["call_sites"].items(), key=lambda item: item[1], reverse=True)[:3]:
+                self.stdout.write(f"  from: {call_site} ({count})")
+            self.stdout.write(f"  sql: {group['sql']}")
+            if group["plan"] and not options["no_plans"]:
+                self.stdout.write("  plan:")
+                for line in group["plan"].splitlines():
+                    self.stdout.write(f"    {line}")
+            self.stdout.write("")
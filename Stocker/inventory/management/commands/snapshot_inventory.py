@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Store today's per-category inventory counts for the trend charts. Run once a day."
+
+    def handle(self, *args, **options):
+        snapshots = take_snapshot()
+        total = sum(s.total_products for s in snapshots)
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {len(snapshots)} category snapshot(s) covering {total} products."
+        ))
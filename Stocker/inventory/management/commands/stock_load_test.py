@@ -0,0 +1,90 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import Sum
+
+from inventory.ledger import change_stock, record_stock_movement
+from inventory.models import Product, ProductTombstone
+
+
+def legacy_update(product_id, delta):
+    """The old stock_update_view flow: read, compute in Python, save back."""
+    product = Product.objects.get(pk=product_id)
+    previous_quantity = product.quantity_in_stock
+    product.quantity_in_stock = previous_quantity + delta
+    product.save()
+    record_stock_movement(product, "IN", previous_quantity, product.quantity_in_stock)
+
+
+def service_update(product_id, delta):
+    product = Product.objects.only("id", "name").get(pk=product_id)
+    change_stock(product, "IN", delta=delta)
+
+
+class Command(BaseCommand):
+    help = "Hammer one product with parallel stock updates and check the totals and the ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=50)
+        parser.add_argument("--updates", type=int, default=20, help="Updates per writer.")
+        parser.add_argument("--legacy", action="store_true",
+                            help="Use the old read-modify-save flow to show lost updates.")
+        parser.add_argument("--keep", action="store_true", help="Keep the test product afterwards.")
+
+    def handle(self, *args, **options):
+        writers, updates = options["writers"], options["updates"]
+        update = legacy_update if options["legacy"] else service_update
+        product = Product.objects.create(name="Load test product", quantity_in_stock=0)
+
+        errors = []
+        barrier = threading.Barrier(writers)
+
+        def writer():
+            try:
+                barrier.wait()
+                for _ in range(updates):
+                    try:
+                        update(product.pk, 1)
+                    except Exception as e:
+                        errors.append(str(e))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db()
+        movements = list(product.stock_movements.order_by("id").values_list("previous_quantity", "new_quantity"))
+        applied = len(movements)
+        chain_ok = all(prev == (movements[i - 1][1] if i else 0) for i, (prev, _) in enumerate(movements))
+        rollup_in = product.daily_rollups.aggregate(total=Sum("in_quantity"))["total"] or 0
+
+        self.stdout.write(f"Database: {connection.vendor}, flow: {'legacy' if options['legacy'] else 'change_stock'}")
+        self.stdout.write(f"Writers: {writers}, attempted updates: {writers * updates}, failed: {len(errors)}")
+        self.stdout.write(f"Ledger entries: {applied}, final quantity: {product.quantity_in_stock}, "
+                          f"rollup IN total: {rollup_in}")
+        self.stdout.write(f"Throughput: {applied / elapsed:.1f} updates/s over {elapsed:.2f}s")
+        for message in sorted(set(errors))[:5]:
+            self.stdout.write(f"  error: {message}")
+
+        consistent = product.quantity_in_stock == applied == rollup_in and chain_ok
+        if consistent:
+            self.stdout.write(self.style.SUCCESS("Totals match the ledger."))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"Inconsistent: quantity {product.quantity_in_stock}, ledger entries {applied}, "
+                f"ledger chain {'ok' if chain_ok else 'broken'}."
+            ))
+
+        if not options["keep"]:
+            product_id = product.pk
+            product.delete()
+            # A test product is no news for sync clients.
+            ProductTombstone.objects.filter(pk=product_id).delete()
@@ -0,0 +1,248 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+
+from .perf import LATENCY_BUCKETS_MS, registry
+
+
+# Prometheus text exposition without the client library. Counters and
+# histograms live in process memory and are only incremented on the hot path;
+# scrapes just format them. The web server exposes them at /metrics and the
+# run_jobs worker on its own port (--metrics-port), since jobs run there.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = []
+_collectors = []
+
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def lines(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        return histogram_lines(self.name, self.labelnames, self.buckets, series)
+
+
+def histogram_lines(name, labelnames, buckets, series):
+    """``series`` maps label values to (cumulative bucket counts, sum, count)."""
+    lines = []
+    for key, (counts, total, count) in sorted(series.items()):
+        for bound, bucket_count in zip(buckets, counts):
+            lines.append(f"{name}_bucket{_labels(labelnames, key, [('le', _number(float(bound)))])} {bucket_count}")
+        lines.append(f"{name}_bucket{_labels(labelnames, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_labels(labelnames, key)} {_number(float(total))}")
+        lines.append(f"{name}_count{_labels(labelnames, key)} {count}")
+    return lines
+
+
+
+def collector(func):
+    """Register ``func`` to produce extra lines (header included) at scrape time."""
+    _collectors.append(func)
+    return func
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.header())
+        lines.extend(metric.lines())
+    for func in _collectors:
+        lines.extend(func())
+    return "\n".join(lines) + "\n"
+
+
+
+DB_CONNECTIONS = Counter("stocker_db_connections_opened_total", "Database connections opened.", ["alias"])
+EMAIL_SEND_SECONDS = Histogram("stocker_email_send_seconds", "Time to send an alert email.", ["kind"])
+PDF_RENDER_SECONDS = Histogram("stocker_pdf_render_seconds", "Time to render a PDF report.", ["kind", "renderer"])
+JOB_SECONDS = Histogram("stocker_job_duration_seconds", "Background job run time.", ["job", "outcome"])
+
+
+def count_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS.inc(alias=connection.alias)
+
+
+
+@collector
+def request_metrics():
+    """Request latency, status and query totals per URL name, from the PerformanceMiddleware registry."""
+    stats = registry.snapshot()
+    buckets = [bound / 1000 for bound in LATENCY_BUCKETS_MS]
+    series = {}
+    for view, view_stats in stats.items():
+        cumulative, running = [], 0
+        for count in view_stats.buckets[:-1]:
+            running += count
+            cumulative.append(running)
+        series[(view,)] = (cumulative, view_stats.total_ms / 1000, view_stats.count)
+
+    lines = [
+        "# HELP stocker_http_request_duration_seconds Request latency by URL name.",
+        "# TYPE stocker_http_request_duration_seconds histogram",
+    ]
+    lines.extend(histogram_lines("stocker_http_request_duration_seconds", ["view"], buckets, series))
+
+    lines += ["# HELP stocker_http_responses_total Responses by URL name and status code.",
+              "# TYPE stocker_http_responses_total counter"]
+    for view, view_stats in sorted(stats.items()):
+        for status, count in sorted(view_stats.statuses.items()):
+            lines.append(f"stocker_http_responses_total{_labels(['view', 'status'], [view, status])} {count}")
+
+    for name, field, help_text, scale in (
+        ("stocker_db_queries_total", "queries", "SQL queries run while handling requests.", 1),
+        ("stocker_db_query_seconds_total", "db_ms", "Time spent in SQL while handling requests.", 1000),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for view, view_stats in sorted(stats.items()):
+            value = getattr(view_stats, field)
+            value = value / scale if scale != 1 else value
+            lines.append(f"{name}{_labels(['view'], [view])} {_number(value)}")
+    return lines
+
+
+@collector
+def counter_gauges():
+    """
+    Product and job gauges from the StatCounter rows, which the writes keep up
+    to date: one small query per scrape, never an aggregate over products.
+    Expiry states follow the alert job, so they lag a save by its delay.
+    """
+    from .counters import values
+
+    counts = values()
+    lines = ["# HELP stocker_products Products by stock or expiry state.", "# TYPE stocker_products gauge"]
+    for state, name in (("total", "products"), ("low_stock", "low_stock"), ("out_of_stock", "out_of_stock"),
+                        ("expired", "expired"), ("near_expiry", "near_expiry")):
+        lines.append(f"stocker_products{_labels(['state'], [state])} {counts.get(name, 0)}")
+
+    lines += ["# HELP stocker_jobs Background jobs waiting or running.", "# TYPE stocker_jobs gauge"]
+    for status in ("pending", "running"):
+        lines.append(f"stocker_jobs{_labels(['status'], [status])} {counts.get(f'jobs_{status}', 0)}")
+    return lines
+
+
+
+def bearer_token_ok(authorization):
+    """Whether an Authorization header carries METRICS_TOKEN (never, when no token is set)."""
+    return bool(settings.METRICS_TOKEN) and constant_time_compare(authorization or "", f"Bearer {settings.METRICS_TOKEN}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # With a token set, scrapes must send it; without one the server only
+        # listens on loopback (see start_metrics_server).
+        if settings.METRICS_TOKEN and not bearer_token_ok(self.headers.get("Authorization")):
+            self.send_response(401)
+            self.send_header("WWW-Authenticate", "Bearer")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        try:
+            body = render().encode()
+        finally:
+            # Each scrape runs in a fresh thread; don't leave its DB connection behind.
+            connections.close_all()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, address="127.0.0.1"):
+    """
+    Serve render() on ``port`` from a daemon thread, for processes without
+    Django's HTTP stack. Other addresses than loopback need METRICS_TOKEN.
+    """
+    if address not in ("127.0.0.1", "::1", "localhost") and not settings.METRICS_TOKEN:
+        raise ValueError(f"Set METRICS_TOKEN before serving metrics on {address}.")
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:18
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_alert_states(apps, schema_editor):
+    """
+    Record the current status of every existing product as already alerted,
+    so switching to transition-based alerts doesn't re-send old alerts.
+    Thresholds mirror LOW_STOCK_THRESHOLD / NEAR_EXPIRY_DAYS at the time of writing.
+    """
+    Product = apps.get_model("inventory", "Product")
+    ProductAlertState = apps.get_model("inventory", "ProductAlertState")
+    today = timezone.localdate()
+
+    states = []
+    for product_id, quantity, expiry_date in Product.objects.values_list(
+        "id", "quantity_in_stock", "expiry_date"
+    ).iterator():
+        if quantity == 0:
+            stock_status = "out"
+        elif quantity < 100:
+            stock_status = "low"
+        else:
+            stock_status = "ok"
+
+        if expiry_date and expiry_date < today:
+            expiry_status = "expired"
+        elif expiry_date and expiry_date <= today + timedelta(days=30):
+            expiry_status = "near_expiry"
+        else:
+            expiry_status = "ok"
+
+        states.append(
+            ProductAlertState(
+                product_id=product_id,
+                stock_status=stock_status,
+                expiry_status=expiry_status,
+                needs_check=False,
+            )
+        )
+    ProductAlertState.objects.bulk_create(states, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0010_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductAlertState",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="alert_state",
+                        serialize=False,
+                        to="inventory.product",
+                    ),
+                ),
+                (
+                    "stock_status",
+                    models.CharField(
+                        choices=[
+                            ("ok", "OK"),
+                            ("low", "Low Stock"),
+                            ("out", "Out of Stock"),
+                        ],
+                        default="ok",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "expiry_status",
+                    models.CharField(
+                        choices=[
+                            ("ok", "OK"),
+                            ("near_expiry", "Near Expiry"),
+                            ("expired", "Expired"),
+                        ],
+                        default="ok",
+                        max_length=15,
+                    ),
+                ),
+                ("needs_check", models.BooleanField(db_index=True, default=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_alert_states, migrations.RunPython.noop),
+    ]
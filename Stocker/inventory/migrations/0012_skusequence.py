@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+def highest_sku_number(Product):
+    highest = Product.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    for sku in Product.objects.filter(sku__startswith="MED-").values_list(
+        "sku", flat=True
+    ):
+        suffix = sku[4:]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def create_sku_sequence(apps, schema_editor):
+    """Start SKU allocation after every SKU handed out so far."""
+    Product = apps.get_model("inventory", "Product")
+    SkuSequence = apps.get_model("inventory", "SkuSequence")
+    start = highest_sku_number(Product) + 1
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE SEQUENCE IF NOT EXISTS inventory_product_sku_seq START WITH {int(start)}"
+        )
+    else:
+        SkuSequence.objects.update_or_create(
+            name="product", defaults={"last_value": start - 1}
+        )
+
+
+def drop_sku_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP SEQUENCE IF EXISTS inventory_product_sku_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0011_productalertstate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SkuSequence",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("last_value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_sku_sequence, drop_sku_sequence),
+    ]
@@ -0,0 +1,146 @@
+from django.db import migrations
+
+
+# The DDL is written out here rather than imported from inventory.search, so
+# this migration keeps doing the same thing whatever that module becomes.
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE inventory_product ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX inventory_product_search_idx ON inventory_product USING GIN (search_vector)",
+    "CREATE INDEX inventory_product_name_trgm_idx ON inventory_product USING GIN (name gin_trgm_ops)",
+    """
+    ALTER TABLE inventory_supplier ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(email, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(phone, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX inventory_supplier_search_idx ON inventory_supplier USING GIN (search_vector)",
+    "CREATE INDEX inventory_supplier_name_trgm_idx ON inventory_supplier USING GIN (name gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "ALTER TABLE inventory_product DROP COLUMN IF EXISTS search_vector",
+    "DROP INDEX IF EXISTS inventory_product_name_trgm_idx",
+    "ALTER TABLE inventory_supplier DROP COLUMN IF EXISTS search_vector",
+    "DROP INDEX IF EXISTS inventory_supplier_name_trgm_idx",
+]
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS inventory_product_fts USING fts5(
+        name, description,
+        content='inventory_product', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_product_fts_ai AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(rowid, name, description)
+        VALUES (new.id, coalesce(new.name, ''), coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_product_fts_ad AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, coalesce(old.name, ''), coalesce(old.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_product_fts_au AFTER UPDATE OF name, description ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, coalesce(old.name, ''), coalesce(old.description, ''));
+        INSERT INTO inventory_product_fts(rowid, name, description)
+        VALUES (new.id, coalesce(new.name, ''), coalesce(new.description, ''));
+    END
+    """,
+    "INSERT INTO inventory_product_fts(inventory_product_fts) VALUES ('rebuild')",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS inventory_supplier_fts USING fts5(
+        name, email, phone,
+        content='inventory_supplier', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_supplier_fts_ai AFTER INSERT ON inventory_supplier BEGIN
+        INSERT INTO inventory_supplier_fts(rowid, name, email, phone)
+        VALUES (new.id, coalesce(new.name, ''), coalesce(new.email, ''), coalesce(new.phone, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_supplier_fts_ad AFTER DELETE ON inventory_supplier BEGIN
+        INSERT INTO inventory_supplier_fts(inventory_supplier_fts, rowid, name, email, phone)
+        VALUES ('delete', old.id, coalesce(old.name, ''), coalesce(old.email, ''), coalesce(old.phone, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS inventory_supplier_fts_au AFTER UPDATE OF name, email, phone ON inventory_supplier BEGIN
+        INSERT INTO inventory_supplier_fts(inventory_supplier_fts, rowid, name, email, phone)
+        VALUES ('delete', old.id, coalesce(old.name, ''), coalesce(old.email, ''), coalesce(old.phone, ''));
+        INSERT INTO inventory_supplier_fts(rowid, name, email, phone)
+        VALUES (new.id, coalesce(new.name, ''), coalesce(new.email, ''), coalesce(new.phone, ''));
+    END
+    """,
+    "INSERT INTO inventory_supplier_fts(inventory_supplier_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS inventory_product_fts_ai",
+    "DROP TRIGGER IF EXISTS inventory_product_fts_ad",
+    "DROP TRIGGER IF EXISTS inventory_product_fts_au",
+    "DROP TABLE IF EXISTS inventory_product_fts",
+    "DROP TRIGGER IF EXISTS inventory_supplier_fts_ai",
+    "DROP TRIGGER IF EXISTS inventory_supplier_fts_ad",
+    "DROP TRIGGER IF EXISTS inventory_supplier_fts_au",
+    "DROP TABLE IF EXISTS inventory_supplier_fts",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = POSTGRES_FORWARD
+    elif vendor == "sqlite" and _sqlite_has_fts5(schema_editor.connection):
+        statements = SQLITE_FORWARD
+    else:
+        # Other databases (or SQLite without FTS5) fall back to icontains search.
+        statements = []
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = POSTGRES_BACKWARD
+    elif vendor == "sqlite":
+        statements = SQLITE_BACKWARD
+    else:
+        statements = []
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0012_skusequence"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    """Fold the existing ledger into daily rollups (same rules as inventory.ledger)."""
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    StockDailyRollup = apps.get_model("inventory", "StockDailyRollup")
+    field_for_type = {"IN": "in_quantity", "OUT": "out_quantity"}
+
+    rows = {}
+    for movement in StockMovement.objects.order_by(
+        "product_id", "created_at", "id"
+    ).iterator():
+        key = (movement.product_id, timezone.localdate(movement.created_at))
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = StockDailyRollup(
+                product_id=movement.product_id,
+                date=key[1],
+                opening_quantity=movement.previous_quantity,
+            )
+        field = field_for_type.get(movement.movement_type, "adjust_quantity")
+        change = movement.quantity_change
+        setattr(
+            row,
+            field,
+            getattr(row, field) + (-change if field == "out_quantity" else change),
+        )
+        row.closing_quantity = movement.new_quantity
+        row.movement_count += 1
+
+    StockDailyRollup.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0014_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("opening_quantity", models.IntegerField(default=0)),
+                ("closing_quantity", models.IntegerField(default=0)),
+                ("in_quantity", models.IntegerField(default=0)),
+                ("out_quantity", models.IntegerField(default=0)),
+                ("adjust_quantity", models.IntegerField(default=0)),
+                ("movement_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["product", "created_at", "id"],
+                name="movement_product_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["created_at", "id"], name="movement_created_id_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="stockdailyrollup",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="daily_rollups",
+                to="inventory.product",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockdailyrollup",
+            index=models.Index(fields=["date"], name="inventory_s_date_9b9aad_idx"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="stockdailyrollup",
+            unique_together={("product", "date")},
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0016_sync_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventorySnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("category_name", models.CharField(blank=True, max_length=100)),
+                ("total_products", models.PositiveIntegerField(default=0)),
+                ("out_of_stock", models.PositiveIntegerField(default=0)),
+                ("low_stock", models.PositiveIntegerField(default=0)),
+                ("expired", models.PositiveIntegerField(default=0)),
+                ("near_expiry", models.PositiveIntegerField(default=0)),
+                ("total_units", models.BigIntegerField(default=0)),
+                (
+                    "stock_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=16),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="snapshots",
+                        to="inventory.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["date"], name="snapshot_date_idx")],
+            },
+        ),
+    ]
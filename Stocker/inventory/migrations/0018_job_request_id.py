@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0017_inventorysnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="request_id",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_unread(apps, schema_editor):
+    Notification = apps.get_model("inventory", "Notification")
+    UnreadNotificationCount = apps.get_model("inventory", "UnreadNotificationCount")
+    counts = (
+        Notification.objects.filter(user__isnull=False, is_read=False)
+        .values_list("user_id")
+        .annotate(unread=Count("id"))
+        .order_by()
+    )
+    UnreadNotificationCount.objects.bulk_create(
+        [UnreadNotificationCount(user_id=user_id, unread=unread) for user_id, unread in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("inventory", "0018_job_request_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnreadNotificationCount",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="unread_notification_count",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("unread", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:22
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_snapshots(apps, schema_editor):
+    """Keep the newest row of each (date, category) pair taken twice before the constraint."""
+    InventorySnapshot = apps.get_model("inventory", "InventorySnapshot")
+    keep = (
+        InventorySnapshot.objects.values("date", "category_id")
+        .annotate(newest=Max("id"))
+        .values_list("newest", flat=True)
+        .order_by()
+    )
+    InventorySnapshot.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0019_unread_notification_count"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_snapshots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="inventorysnapshot",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("category__isnull", False)),
+                fields=("date", "category"),
+                name="snapshot_date_category_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="inventorysnapshot",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("category__isnull", True)),
+                fields=("date",),
+                name="snapshot_date_uncategorized_uniq",
+            ),
+        ),
+    ]
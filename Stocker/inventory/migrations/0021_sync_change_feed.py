@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0020_snapshot_unique_per_day"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductTombstone",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("sku", models.CharField(blank=True, max_length=64, null=True)),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "change_seq",
+                    models.BigIntegerField(blank=True, editable=False, null=True),
+                ),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_updated_id_idx",
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="change_seq",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["change_seq", "id"], name="product_change_seq_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="producttombstone",
+            index=models.Index(
+                fields=["change_seq", "id"], name="tombstone_change_seq_idx"
+            ),
+        ),
+    ]
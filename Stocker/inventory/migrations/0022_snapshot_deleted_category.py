@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0021_sync_change_feed"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="inventorysnapshot",
+            name="snapshot_date_uncategorized_uniq",
+        ),
+        migrations.AddConstraint(
+            model_name="inventorysnapshot",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("category__isnull", True), ("category_name", "")),
+                fields=("date",),
+                name="snapshot_date_uncategorized_uniq",
+            ),
+        ),
+    ]
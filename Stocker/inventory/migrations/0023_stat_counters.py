@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:41
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+# inventory.utils.LOW_STOCK_THRESHOLD when this migration was written.
+LOW_STOCK_THRESHOLD = 100
+
+
+def count_totals(apps, schema_editor):
+    Product = apps.get_model("inventory", "Product")
+    ProductAlertState = apps.get_model("inventory", "ProductAlertState")
+    Job = apps.get_model("inventory", "Job")
+    StatCounter = apps.get_model("inventory", "StatCounter")
+
+    totals = Product.objects.aggregate(
+        products=Count("id"),
+        low_stock=Count("id", filter=Q(quantity_in_stock__gt=0, quantity_in_stock__lt=LOW_STOCK_THRESHOLD)),
+        out_of_stock=Count("id", filter=Q(quantity_in_stock=0)),
+    )
+    totals.update(ProductAlertState.objects.aggregate(
+        expired=Count("pk", filter=Q(expiry_status="expired")),
+        near_expiry=Count("pk", filter=Q(expiry_status="near_expiry")),
+    ))
+    totals.update(Job.objects.aggregate(
+        jobs_pending=Count("id", filter=Q(status="pending")),
+        jobs_running=Count("id", filter=Q(status="running")),
+    ))
+    StatCounter.objects.bulk_create([StatCounter(name=name, value=value) for name, value in totals.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0022_snapshot_deleted_category"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatCounter",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:12
+
+from django.db import migrations
+
+
+def add_missing_states(apps, schema_editor):
+    """
+    Products bulk-created before the bulk path made their alert state (import,
+    seed_inventory) never reached the alert sweep; flag them for the next one.
+    """
+    Product = apps.get_model("inventory", "Product")
+    ProductAlertState = apps.get_model("inventory", "ProductAlertState")
+
+    missing = Product.objects.filter(alert_state__isnull=True).values_list("id", flat=True)
+    ProductAlertState.objects.bulk_create(
+        (ProductAlertState(product_id=product_id, needs_check=True) for product_id in missing.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0023_stat_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_missing_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:40
+
+from django.db import migrations
+
+
+# Search matches text anywhere in the searched columns on every backend. The
+# word indexes from 0013 can't find text inside words, so PostgreSQL gets
+# trigram indexes on the remaining searched columns and SQLite's FTS5 tables
+# move to the trigram tokenizer. The triggers from 0013 keep working as is.
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX inventory_product_description_trgm_idx ON inventory_product USING GIN (description gin_trgm_ops)",
+    "CREATE INDEX inventory_supplier_email_trgm_idx ON inventory_supplier USING GIN (email gin_trgm_ops)",
+    "CREATE INDEX inventory_supplier_phone_trgm_idx ON inventory_supplier USING GIN (phone gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS inventory_product_description_trgm_idx",
+    "DROP INDEX IF EXISTS inventory_supplier_email_trgm_idx",
+    "DROP INDEX IF EXISTS inventory_supplier_phone_trgm_idx",
+]
+
+SQLITE_TABLES = {
+    "inventory_product": "name, description",
+    "inventory_supplier": "name, email, phone",
+}
+
+
+def _sqlite_fts_tables(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s", ["%_fts"])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _rebuild_sqlite_tables(schema_editor, tokenize):
+    existing = _sqlite_fts_tables(schema_editor.connection)
+    for table, columns in SQLITE_TABLES.items():
+        fts = f"{table}_fts"
+        if fts not in existing:
+            continue
+        schema_editor.execute(f"DROP TABLE {fts}")
+        if tokenize is None:
+            # No trigram tokenizer: search falls back to icontains, so drop the triggers too.
+            for suffix in ("ai", "ad", "au"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            continue
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', "
+            f"content_rowid='id', tokenize='{tokenize}')"
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def use_trigram_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+    elif connection.vendor == "sqlite":
+        # The trigram tokenizer needs SQLite 3.34.
+        trigram = connection.Database.sqlite_version_info >= (3, 34)
+        _rebuild_sqlite_tables(schema_editor, "trigram" if trigram else None)
+
+
+def use_word_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        for sql in POSTGRES_BACKWARD:
+            schema_editor.execute(sql)
+    elif connection.vendor == "sqlite":
+        _rebuild_sqlite_tables(schema_editor, "unicode61 remove_diacritics 2")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0024_missing_alert_states"),
+    ]
+
+    operations = [
+        migrations.RunPython(use_trigram_indexes, use_word_indexes),
+    ]
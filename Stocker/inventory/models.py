@@ -1,6 +1,10 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
 from cloudinary.models import CloudinaryField
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .sku import assign_skus
 
 
        
@@ -24,6 +28,31 @@ class Supplier(models.Model):
     
     
 
+class ProductQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        from .counters import add, stock_deltas
+        from .sync import number_changes_on_commit
+
+        objs = list(objs)
+        with transaction.atomic():
+            assign_skus(objs)
+            created = super().bulk_create(objs, *args, **kwargs)
+            deltas = Counter()
+            for product in created:
+                deltas.update(stock_deltas(None, product.quantity_in_stock))
+            add(deltas)
+            # Product.save leaves this to enqueue_inventory_alerts; bulk paths
+            # flag their products here so the next alerts job evaluates them.
+            ProductAlertState.objects.bulk_create(
+                [ProductAlertState(product_id=product.pk) for product in created if product.pk],
+                ignore_conflicts=True,
+                batch_size=1000,
+            )
+            number_changes_on_commit()
+        return created
+
+
+
 class Product(models.Model):
     name = models.CharField(max_length=100)
     image = CloudinaryField('image', folder='Stocker/products', blank=True, null=True)
@@ -59,17 +88,78 @@ class Product(models.Model):
     strength = models.CharField(max_length=50, blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Position in the sync change feed. Every write clears it and the rows are
+    # numbered when the write commits (see inventory.sync.number_changes).
+    change_seq = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            # Keyset pagination keys for the product list and stock status pages.
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['change_seq', 'id'], name='product_change_seq_idx'),
+        ]
+
    
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        if is_new and not self.sku:
-            self.sku = f"MED-{self.pk:04d}"
-            super().save(update_fields=["sku"])
+        from .counters import add, stock_deltas
+        from .ledger import lock_product
+        from .sync import number_changes_on_commit
+
+        if self.pk is None and not self.sku:
+            assign_skus([self])
+        self.change_seq = None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "change_seq"}
+
+        with transaction.atomic():
+            number_changes_on_commit()
+            # The stock counters need the quantity being replaced, read under the row lock.
+            previous = None
+            if not self._state.adding:
+                if update_fields is not None and "quantity_in_stock" not in update_fields:
+                    return super().save(*args, **kwargs)
+                try:
+                    previous = lock_product(self.pk)
+                except Product.DoesNotExist:
+                    pass
+            super().save(*args, **kwargs)
+            add(stock_deltas(previous, self.quantity_in_stock))
+
+
+
+
+class SkuSequence(models.Model):
+    """Named counters: SKUs on databases without native sequences, and the sync change feed."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
+
+
+class ProductTombstone(models.Model):
+    """A deleted product, kept so sync clients pulling changes learn about the delete."""
+    # The deleted product's id; ids are never reused.
+    id = models.BigIntegerField(primary_key=True)
+    sku = models.CharField(max_length=64, blank=True, null=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    change_seq = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return f"{self.id} ({self.sku}) deleted {self.deleted_at:%Y-%m-%d}"
+
+    class Meta:
+        indexes = [models.Index(fields=['change_seq', 'id'], name='tombstone_change_seq_idx')]
 
 
 
@@ -102,10 +192,96 @@ class StockMovement(models.Model):
     reason = models.TextField(blank=True, null=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Idempotency key sent by offline clients, so a retried sync can't apply a movement twice.
+    client_key = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
 
     def __str__(self):
         return f"{self.get_movement_type_display()} - {self.product.name} ({self.quantity_change})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id'], name='movement_product_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='movement_created_id_idx'),
+        ]
+
+
+
+
+class StockDailyRollup(models.Model):
+    """Per-product, per-day movement totals, kept up to date as movements are recorded."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_rollups")
+    date = models.DateField()
+    opening_quantity = models.IntegerField(default=0)
+    closing_quantity = models.IntegerField(default=0)
+    in_quantity = models.IntegerField(default=0)
+    out_quantity = models.IntegerField(default=0)
+    adjust_quantity = models.IntegerField(default=0)
+    movement_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.date}: {self.closing_quantity}"
+
+    class Meta:
+        unique_together = ('product', 'date')
+        indexes = [models.Index(fields=['date'])]
     
+
+
+
+
+class InventorySnapshot(models.Model):
+    """End-of-day stock counts per category, written by the snapshot_inventory command."""
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="snapshots")
+    # Kept so history still reads correctly after a category is renamed or deleted.
+    category_name = models.CharField(max_length=100, blank=True)
+    total_products = models.PositiveIntegerField(default=0)
+    out_of_stock = models.PositiveIntegerField(default=0)
+    low_stock = models.PositiveIntegerField(default=0)
+    expired = models.PositiveIntegerField(default=0)
+    near_expiry = models.PositiveIntegerField(default=0)
+    total_units = models.BigIntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date} - {self.category_name or 'Uncategorized'}"
+
+    class Meta:
+        indexes = [models.Index(fields=["date"], name="snapshot_date_idx")]
+        # One row per category per day. NULLs never clash in a unique index,
+        # so the uncategorized row needs its own. Rows of a deleted category
+        # also end up with a NULL category but keep their name, so the
+        # uncategorized row is the one without a name.
+        constraints = [
+            models.UniqueConstraint(fields=["date", "category"], condition=models.Q(category__isnull=False),
+                                    name="snapshot_date_category_uniq"),
+            models.UniqueConstraint(fields=["date"], condition=models.Q(category__isnull=True, category_name=""),
+                                    name="snapshot_date_uncategorized_uniq"),
+        ]
+
+
+
+
+class ProductAlertState(models.Model):
+    STOCK_STATUSES = [
+        ('ok', 'OK'),
+        ('low', 'Low Stock'),
+        ('out', 'Out of Stock'),
+    ]
+    EXPIRY_STATUSES = [
+        ('ok', 'OK'),
+        ('near_expiry', 'Near Expiry'),
+        ('expired', 'Expired'),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="alert_state")
+    stock_status = models.CharField(max_length=10, choices=STOCK_STATUSES, default='ok')
+    expiry_status = models.CharField(max_length=15, choices=EXPIRY_STATUSES, default='ok')
+    needs_check = models.BooleanField(default=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.stock_status}/{self.expiry_status}"
     
     
     
@@ -126,5 +302,76 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.get_type_display()} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # So moving a notification to another user recounts the old one too.
+        instance._loaded_user_id = instance.__dict__.get("user_id")
+        return instance
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', 'created_at', 'id'], name='notification_user_created_idx')]
+
+
+
+
+class UnreadNotificationCount(models.Model):
+    """Each user's number of unread notifications, updated in the same transaction as the notifications."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="unread_notification_count")
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread}"
+
+
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=255, blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    # Id of the request that queued the job, so its log lines can be matched up.
+    request_id = models.CharField(max_length=64, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        constraints = [
+            # At most one pending job per dedupe key, so bursts of enqueues coalesce.
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_job_dedupe_key',
+            ),
+        ]
+
+
+
+
+class StatCounter(models.Model):
+    """
+    Running totals read by the metrics exporter: products by stock and expiry
+    state and jobs by status. Each is adjusted in the transaction of the write
+    that changes it (see inventory.counters).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
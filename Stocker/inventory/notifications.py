@@ -0,0 +1,115 @@
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from .cache import is_shared
+from .models import Notification, UnreadNotificationCount
+from .perf import record_cache
+
+
+# The count lives in UnreadNotificationCount, written in the same transaction as
+# the notifications, so every process reads the same number with one primary key
+# lookup. A shared cache (file, Redis) saves even that: writers drop the cached
+# value after commit, and the timeout bounds a reader that re-caches a value it
+# read just before the commit. A per-process cache (locmem) is never used for it:
+# the job worker's writes would not reach the web processes.
+UNREAD_COUNT_TIMEOUT = 60
+
+
+
+def _unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _forget_cached(user_ids):
+    if is_shared():
+        keys = [_unread_key(user_id) for user_id in user_ids]
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def unread_count(user):
+    if not user.is_authenticated:
+        return 0
+    shared = is_shared()
+    if shared:
+        count = cache.get(_unread_key(user.pk))
+        record_cache(count is not None)
+        if count is not None:
+            return count
+    count = UnreadNotificationCount.objects.filter(user=user).values_list("unread", flat=True).first() or 0
+    if shared:
+        cache.add(_unread_key(user.pk), count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+
+def notify_users(users, title, message, type="info"):
+    """Create one notification per user and add them to their unread counts."""
+    with transaction.atomic():
+        notifications = Notification.objects.bulk_create([
+            Notification(title=title, message=message, type=type, user=user)
+            for user in users
+        ])
+        added = Counter(notification.user_id for notification in notifications if notification.user_id)
+        UnreadNotificationCount.objects.bulk_create(
+            [UnreadNotificationCount(user_id=user_id) for user_id in added], ignore_conflicts=True
+        )
+        # One UPDATE per distinct increment, usually just one.
+        by_increment = defaultdict(list)
+        for user_id, increment in added.items():
+            by_increment[increment].append(user_id)
+        for increment, user_ids in by_increment.items():
+            UnreadNotificationCount.objects.filter(user_id__in=user_ids).update(unread=F("unread") + increment)
+        _forget_cached(added)
+    return notifications
+
+
+
+def mark_all_read(user):
+    with transaction.atomic():
+        # Lock the count first: a notify_users() committing meanwhile either
+        # waits for us, or finishes first and has its notification marked too.
+        counter, _ = UnreadNotificationCount.objects.select_for_update().get_or_create(user=user)
+        updated = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        counter.unread = 0
+        counter.save(update_fields=["unread"])
+        _forget_cached([user.pk])
+    return updated
+
+
+
+def recount_unread(user_ids=None):
+    """
+    Recount from the notifications, after writes that bypass notify_users
+    (seeding, notifications saved or deleted elsewhere, bulk updates).
+    ``None`` recounts every user; the job worker does that daily.
+    """
+    unread = Notification.objects.filter(is_read=False, user__isnull=False)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        unread = unread.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        counts = dict(unread.values_list("user_id").annotate(unread=Count("id")).order_by())
+        if user_ids is None:
+            user_ids = [*counts, *UnreadNotificationCount.objects.exclude(unread=0)
+                        .exclude(user_id__in=list(counts)).values_list("user_id", flat=True)]
+        UnreadNotificationCount.objects.bulk_create(
+            [UnreadNotificationCount(user_id=user_id, unread=counts.get(user_id, 0)) for user_id in user_ids],
+            update_conflicts=True, unique_fields=["user"], update_fields=["unread"],
+        )
+        _forget_cached(user_ids)
+
+
+
+def notification_changed(sender, instance, **kwargs):
+    """
+    post_save/post_delete receiver: a notification saved or deleted one by one
+    (admin, shell) rather than through this module. Bulk writes send no
+    signals; the daily recount catches those.
+    """
+    user_ids = {instance.user_id, getattr(instance, "_loaded_user_id", None)} - {None}
+    if user_ids:
+        recount_unread(user_ids)
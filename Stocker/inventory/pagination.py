@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.db.models import Q
+
+
+ESTIMATE_CAP = 10000
+
+
+
+def plan_rows(plan):
+    """
+    "Plan Rows" of the top node of EXPLAIN (FORMAT JSON) output. Drivers hand
+    it back as text or already parsed, as a one-element list or the bare object.
+    """
+    if isinstance(plan, (str, bytes)):
+        plan = json.loads(plan)
+    if isinstance(plan, list):
+        plan = plan[0]
+    return int(plan["Plan"]["Plan Rows"])
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count for display. PostgreSQL returns the planner's estimate;
+    other databases count at most ESTIMATE_CAP + 1 rows, so callers can show "10000+".
+    """
+    db = connections[queryset.db]
+    if db.vendor == "postgresql":
+        sql, params = queryset.order_by().query.sql_with_params()
+        with db.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            return plan_rows(cursor.fetchone()[0])
+    return queryset.order_by()[:ESTIMATE_CAP + 1].count()
+
+
+
+class CursorPage:
+    def __init__(self, object_list, has_next, has_previous, next_query, previous_query,
+                 estimated_count=None, count_capped=False):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_query = next_query
+        self.previous_query = previous_query
+        self.estimated_count = estimated_count
+        self.count_capped = count_capped
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+
+class CursorPaginator:
+    """
+    Keyset pagination: each page continues from the sort key of the last row
+    of the previous one (``WHERE (created_at, id) < (...)``) instead of using
+    OFFSET, so every page costs the same as the first. ``ordering`` must end
+    with a unique field such as ``id``.
+    """
+
+    def __init__(self, queryset, ordering, per_page, with_count=False):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.with_count = with_count
+        self.fields = [o.lstrip("-") for o in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field) for field in self.fields]
+        # isoformat() keeps microseconds; DjangoJSONEncoder would round them and skip rows.
+        raw = json.dumps(values, default=lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v)).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.fields):
+                return None
+            model_fields = [self.queryset.model._meta.get_field(f) for f in self.fields]
+            return [field.to_python(value) for field, value in zip(model_fields, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def _after(self, values, reverse=False):
+        """Rows strictly after ``values`` in the page ordering (or before it when ``reverse``)."""
+        condition = Q()
+        for i, ordering in enumerate(self.ordering):
+            descending = ordering.startswith("-") != reverse
+            lookup = f"{self.fields[i]}__{'lt' if descending else 'gt'}"
+            equal = {self.fields[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{lookup: values[i]})
+        return condition
+
+    def get_page(self, params):
+        after = self.decode_cursor(params.get("after", ""))
+        before = self.decode_cursor(params.get("before", "")) if after is None else None
+
+        if before is not None:
+            reversed_ordering = [o[1:] if o.startswith("-") else f"-{o}" for o in self.ordering]
+            rows = list(self.queryset.filter(self._after(before, reverse=True))
+                        .order_by(*reversed_ordering)[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if after is not None:
+                queryset = queryset.filter(self._after(after))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = after is not None
+
+        next_query = self._querystring(params, "after", rows[-1]) if has_next and rows else ""
+        previous_query = self._querystring(params, "before", rows[0]) if has_previous and rows else ""
+        estimated_count = estimate_count(self.queryset) if self.with_count else None
+        count_capped = (estimated_count is not None and estimated_count > ESTIMATE_CAP
+                        and connection.vendor != "postgresql")
+
+        return CursorPage(rows, has_next, has_previous, next_query, previous_query, estimated_count, count_capped)
+
+    def _querystring(self, params, key, obj):
+        query = params.copy()
+        query.pop("after", None)
+        query.pop("before", None)
+        query[key] = self.encode_cursor(obj)
+        return query.urlencode()
+
+
+
+class OffsetPaginator:
+    """
+    ``?page=N`` pagination for querysets ordered by something a keyset can't
+    resume from, such as search relevance. Search results are short, so the
+    OFFSET stays cheap. Pages are CursorPage objects, so templates don't care
+    which paginator made them.
+    """
+
+    def __init__(self, queryset, per_page, with_count=False, default_ordering=("-pk",)):
+        self.queryset = queryset if queryset.ordered else queryset.order_by(*default_ordering)
+        self.per_page = per_page
+        self.with_count = with_count
+
+    def get_page(self, params):
+        try:
+            number = max(int(params.get("page", 1)), 1)
+        except ValueError:
+            number = 1
+        offset = (number - 1) * self.per_page
+        rows = list(self.queryset[offset:offset + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        has_previous = number > 1
+
+        next_query = self._querystring(params, number + 1) if has_next else ""
+        previous_query = self._querystring(params, number - 1) if has_previous else ""
+        estimated_count = estimate_count(self.queryset) if self.with_count else None
+        count_capped = (estimated_count is not None and estimated_count > ESTIMATE_CAP
+                        and connection.vendor != "postgresql")
+
+        return CursorPage(rows, has_next, has_previous, next_query, previous_query, estimated_count, count_capped)
+
+    def _querystring(self, params, number):
+        query = params.copy()
+        for key in ("after", "before", "page"):
+            query.pop(key, None)
+        if number > 1:
+            query["page"] = str(number)
+        return query.urlencode()
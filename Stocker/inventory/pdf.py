@@ -0,0 +1,188 @@
+import re
+
+import pydyf
+
+
+# A4 portrait, in points.
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 36
+FONT_SIZE = 8.5
+ROW_HEIGHT = 14
+TITLE_SIZE = 16
+HEADING_SIZE = 11
+
+# Average Helvetica glyph width as a fraction of the font size; digits are exactly 0.556.
+CHAR_WIDTH = 0.52
+DIGIT_WIDTH = 0.556
+
+# Reserved object numbers; pages and their content streams are numbered after these.
+PAGES, CATALOG, INFO, FONT, FONT_BOLD = range(1, 6)
+
+
+
+def _pdf_text(value):
+    """Standard fonts use WinAnsi (cp1252): characters outside it print as "?"."""
+    raw = str(value).encode("cp1252", "replace")
+    return b"(" + re.sub(rb"([\\()])", rb"\\\1", raw) + b")"
+
+
+def _fit(text, width, size):
+    max_chars = int(width / (CHAR_WIDTH * size))
+    if len(text) <= max_chars:
+        return text
+    return text[:max(max_chars - 1, 0)] + "…"
+
+
+
+class TablePDFWriter:
+    """
+    Draw plain tables straight to PDF with the built-in Helvetica fonts.
+
+    Each page is written to ``output`` as soon as it is full, so memory stays
+    flat however many rows are drawn; only the page references are kept for
+    the page tree written by close(). Columns are ``(label, width_fraction,
+    align)`` with align "left" or "right".
+    """
+
+    def __init__(self, output, title, subtitle=""):
+        self.output = output
+        self.position = 0
+        self.offsets = {}
+        self.next_number = FONT_BOLD + 1
+        self.page_numbers = []
+        self.title = title
+        self.subtitle = subtitle
+        self.page = None
+
+        self._write_line(b"%PDF-1.7")
+        self._write_line(b"%\xf0\x9f\x96\xa4")
+        for number, font in ((FONT, "/Helvetica"), (FONT_BOLD, "/Helvetica-Bold")):
+            self._write_object(number, pydyf.Dictionary({
+                "Type": "/Font",
+                "Subtype": "/Type1",
+                "BaseFont": font,
+                "Encoding": "/WinAnsiEncoding",
+            }))
+
+    def _write_line(self, content):
+        self.output.write(content + b"\n")
+        self.position += len(content) + 1
+
+    def _write_object(self, number, obj):
+        obj.number = number
+        self.offsets[number] = self.position
+        self._write_line(obj.indirect)
+
+    def _text(self, x, y, text, size=FONT_SIZE, bold=False):
+        # Raw operators rather than pydyf's per-operator helpers: this runs once per cell.
+        font = b"/F2" if bold else b"/F1"
+        self.page.stream.append(
+            b"BT %s %g Tf 1 0 0 1 %.2f %.2f Tm %s Tj ET" % (font, size, x, y, _pdf_text(text))
+        )
+
+    def _new_page(self):
+        self._finish_page()
+        self.page = pydyf.Stream(compress=True)
+        self.y = PAGE_HEIGHT - MARGIN
+        if not self.page_numbers:
+            self._text(MARGIN, self.y - TITLE_SIZE, self.title, TITLE_SIZE, bold=True)
+            self.y -= TITLE_SIZE + 8
+            if self.subtitle:
+                self._text(MARGIN, self.y - FONT_SIZE, self.subtitle)
+                self.y -= FONT_SIZE + 10
+        self._text(PAGE_WIDTH - MARGIN - 40, MARGIN / 2, f"Page {len(self.page_numbers) + 1}")
+
+    def _finish_page(self):
+        if self.page is None:
+            return
+        content_number = self.next_number
+        page_number = self.next_number + 1
+        self.next_number += 2
+        self._write_object(content_number, self.page)
+        self._write_object(page_number, pydyf.Dictionary({
+            "Type": "/Page",
+            "Parent": f"{PAGES} 0 R",
+            "MediaBox": pydyf.Array([0, 0, PAGE_WIDTH, PAGE_HEIGHT]),
+            "Contents": f"{content_number} 0 R",
+            "Resources": pydyf.Dictionary({
+                "Font": pydyf.Dictionary({"F1": f"{FONT} 0 R", "F2": f"{FONT_BOLD} 0 R"}),
+            }),
+        }))
+        self.page_numbers.append(page_number)
+        self.page = None
+
+    def _header_row(self, columns, positions):
+        self.page.set_color_rgb(0.9, 0.9, 0.9)
+        self.page.rectangle(MARGIN, self.y - ROW_HEIGHT, PAGE_WIDTH - 2 * MARGIN, ROW_HEIGHT)
+        self.page.fill()
+        self.page.set_color_rgb(0, 0, 0)
+        for (label, _, align), (x, width) in zip(columns, positions):
+            self._cell(label, x, width, align, bold=True)
+        self.y -= ROW_HEIGHT
+
+    def _cell(self, value, x, width, align, bold=False):
+        text = _fit("" if value is None else str(value), width - 4, FONT_SIZE)
+        if align == "right":
+            x = x + width - 2 - len(text) * DIGIT_WIDTH * FONT_SIZE
+        else:
+            x += 2
+        self._text(x, self.y - ROW_HEIGHT + 4, text, bold=bold)
+
+    def table(self, heading, columns, rows, empty_message="No rows."):
+        """Draw ``rows`` (any iterable of tuples) under ``heading``, repeating the header row on each page."""
+        usable = PAGE_WIDTH - 2 * MARGIN
+        positions, x = [], MARGIN
+        for _, fraction, _ in columns:
+            positions.append((x, usable * fraction))
+            x += usable * fraction
+
+        if self.page is None or self.y - (HEADING_SIZE + 8 + 3 * ROW_HEIGHT) < MARGIN:
+            self._new_page()
+        self._text(MARGIN, self.y - HEADING_SIZE - 4, heading, HEADING_SIZE, bold=True)
+        self.y -= HEADING_SIZE + 10
+        self._header_row(columns, positions)
+
+        count = 0
+        for row in rows:
+            if self.y - ROW_HEIGHT < MARGIN:
+                self._new_page()
+                self._text(MARGIN, self.y - HEADING_SIZE - 4, f"{heading} (continued)", HEADING_SIZE, bold=True)
+                self.y -= HEADING_SIZE + 10
+                self._header_row(columns, positions)
+            for value, (_, _, align), (x, width) in zip(row, columns, positions):
+                self._cell(value, x, width, align)
+            self.y -= ROW_HEIGHT
+            count += 1
+
+        if not count:
+            self._cell(empty_message, MARGIN, usable, "left")
+            self.y -= ROW_HEIGHT
+        self.y -= ROW_HEIGHT
+        return count
+
+    def close(self):
+        if self.page is None and not self.page_numbers:
+            self._new_page()
+        self._finish_page()
+
+        self._write_object(PAGES, pydyf.Dictionary({
+            "Type": "/Pages",
+            "Kids": pydyf.Array(f"{n} 0 R" for n in self.page_numbers),
+            "Count": len(self.page_numbers),
+        }))
+        self._write_object(CATALOG, pydyf.Dictionary({"Type": "/Catalog", "Pages": f"{PAGES} 0 R"}))
+        self._write_object(INFO, pydyf.Dictionary({"Title": pydyf.String(self.title), "Producer": pydyf.String("Stocker")}))
+
+        xref_position = self.position
+        size = self.next_number
+        self._write_line(b"xref")
+        self._write_line(f"0 {size}".encode())
+        self._write_line(b"0000000000 65535 f ")
+        for number in range(1, size):
+            self._write_line(f"{self.offsets[number]:010} 00000 n ".encode())
+        self._write_line(b"trailer")
+        self._write_line(f"<< /Size {size} /Root {CATALOG} 0 R /Info {INFO} 0 R >>".encode())
+        self._write_line(b"startxref")
+        self._write_line(str(xref_position).encode())
+        self._write_line(b"%%EOF")
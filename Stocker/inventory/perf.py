@@ -0,0 +1,206 @@
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+
+class RequestMetrics:
+    """What one request spent its time on; filled in by the hooks below."""
+
+    __slots__ = ("queries", "db_ms", "template_ms", "cache_hits", "cache_misses", "sql", "view")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # (sql, ms) pairs; only kept while the request is being profiled.
+        self.sql = None
+        # URL name, once the URL has been resolved.
+        self.view = None
+
+
+def current_metrics():
+    return _current.get()
+
+
+def record_cache(hit):
+    """Called by the cache helpers on each lookup."""
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+
+class ViewStats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "buckets", "statuses", "queries", "db_ms",
+                 "template_ms", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.count = self.errors = self.queries = self.cache_hits = self.cache_misses = 0
+        self.total_ms = self.max_ms = self.db_ms = self.template_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.statuses = {}
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile (None for the open-ended bucket)."""
+        target, seen = pct / 100 * self.count, 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.buckets):
+            seen += count
+            if seen >= target:
+                return bound if bound is not None else self.max_ms
+        return self.max_ms
+
+
+class PerfRegistry:
+    """
+    Per URL name latency histograms and totals, kept in process memory. Each
+    worker process has its own, so with several workers a page shows one of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.started = time.time()
+
+    def observe(self, view, total_ms, metrics, status):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if total_ms <= bound), len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            stats = self._stats.get(view)
+            if stats is None:
+                stats = self._stats[view] = ViewStats()
+            stats.count += 1
+            stats.errors += status >= 500
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.total_ms += total_ms
+            stats.max_ms = max(stats.max_ms, total_ms)
+            stats.buckets[index] += 1
+            stats.queries += metrics.queries
+            stats.db_ms += metrics.db_ms
+            stats.template_ms += metrics.template_ms
+            stats.cache_hits += metrics.cache_hits
+            stats.cache_misses += metrics.cache_misses
+
+    def snapshot(self):
+        """Copies of the per-view stats, safe to read while requests keep coming in."""
+        with self._lock:
+            copies = {}
+            for view, stats in self._stats.items():
+                copy = ViewStats()
+                for field in ViewStats.__slots__:
+                    value = getattr(stats, field)
+                    setattr(copy, field, value.copy() if isinstance(value, (list, dict)) else value)
+                copies[view] = copy
+            return copies
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started = time.time()
+
+
+registry = PerfRegistry()
+
+
+
+def _server_timing(total_ms, metrics):
+    return ", ".join([
+        f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_ms:.1f};desc="templates"',
+        f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+        f'total;dur={total_ms:.1f}',
+    ])
+
+
+class PerformanceMiddleware:
+    """
+    Time each request and count its queries, DB time, template time and cache
+    hits, then record them in ``registry`` under the URL name. Staff users (and
+    everyone with DEBUG on) also get them in a Server-Timing header, which the
+    browser's network panel shows.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(self._time_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "<unresolved>"
+        registry.observe(view, total_ms, metrics, response.status_code)
+
+        user = getattr(request, "user", None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response["Server-Timing"] = _server_timing(total_ms, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None and request.resolver_match is not None:
+            metrics.view = request.resolver_match.view_name
+
+    @staticmethod
+    def _time_query(execute, sql, params, many, context):
+        metrics = _current.get()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if metrics is not None:
+                elapsed = (time.perf_counter() - start) * 1000
+                metrics.queries += 1
+                metrics.db_ms += elapsed
+                if metrics.sql is not None:
+                    metrics.sql.append((sql, elapsed))
+
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start, db_before = time.perf_counter(), metrics.db_ms
+        try:
+            return super().render(context, request)
+        finally:
+            # Querysets evaluated while rendering already count as DB time.
+            elapsed = (time.perf_counter() - start) * 1000
+            metrics.template_ms += elapsed - (metrics.db_ms - db_before)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing every top-level render for PerformanceMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
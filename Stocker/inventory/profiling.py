@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .perf import current_metrics
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+MAX_STACK_DEPTH = 200
+MAX_SQL_STATEMENTS = 2000
+
+
+
+def profiles_dir():
+    path = Path(settings.PROFILES_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def profile_path(profile_id, suffix):
+    if not PROFILE_ID_RE.match(profile_id):
+        raise ValueError(f"Invalid profile id '{profile_id}'.")
+    return profiles_dir() / f"{profile_id}{suffix}"
+
+
+def list_profiles(limit=50):
+    profiles = []
+    for path in sorted(profiles_dir().glob("*.json"), reverse=True)[:limit]:
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def prune_profiles(keep):
+    for path in sorted(profiles_dir().glob("*.json"), reverse=True)[keep:]:
+        for suffix in (".json", ".stacks.txt"):
+            path.with_name(path.name[:-len(".json")] + suffix).unlink(missing_ok=True)
+
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    for prefix in (str(settings.BASE_DIR) + os.sep, "site-packages" + os.sep):
+        index = filename.find(prefix)
+        if index != -1:
+            filename = filename[index + len(prefix):]
+            break
+    return f"{filename}:{code.co_name}"
+
+
+def _collapse(frame):
+    """Root-first "file:function;file:function" for one sampled stack."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+
+class _Target:
+    __slots__ = ("thread_id", "started", "metrics", "sampling", "stacks", "samples", "trigger")
+
+    def __init__(self, thread_id, metrics, trigger):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.metrics = metrics
+        self.sampling = False
+        self.stacks = Counter()
+        self.samples = 0
+        self.trigger = trigger
+
+
+class Sampler:
+    """
+    One daemon thread that, every ``interval`` seconds, reads the current
+    stack of each request thread being profiled (sys._current_frames) and
+    counts it. Requests registered with a slow threshold start being sampled
+    once they run past it. The thread is only started on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._targets = {}
+        self._thread = None
+
+    def register(self, trigger, slow_after=None):
+        target = _Target(threading.get_ident(), current_metrics(), trigger)
+        if slow_after is None:
+            self._start_sampling(target)
+        with self._lock:
+            self._targets[target.thread_id] = (target, slow_after)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+                self._thread.start()
+        return target
+
+    def unregister(self, target):
+        with self._lock:
+            self._targets.pop(target.thread_id, None)
+
+    @staticmethod
+    def _start_sampling(target):
+        target.sampling = True
+        if target.metrics is not None:
+            # Ask the query wrapper to keep statements from now on.
+            target.metrics.sql = []
+
+    def _run(self):
+        interval = settings.PROFILE_INTERVAL_MS / 1000
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                targets = list(self._targets.values())
+            if not targets:
+                continue
+            now = time.perf_counter()
+            frames = None
+            for target, slow_after in targets:
+                if not target.sampling:
+                    if now - target.started < slow_after:
+                        continue
+                    self._start_sampling(target)
+                if frames is None:
+                    frames = sys._current_frames()
+                frame = frames.get(target.thread_id)
+                if frame is not None:
+                    target.stacks[_collapse(frame)] += 1
+                    target.samples += 1
+
+
+sampler = Sampler()
+
+
+
+def save_profile(request, target, duration_ms, status):
+    now = timezone.now()
+    profile_id = f"{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    match = request.resolver_match
+    sql = target.metrics.sql if target.metrics is not None and target.metrics.sql is not None else []
+    meta = {
+        "id": profile_id,
+        "created": now.isoformat(),
+        "method": request.method,
+        "path": request.get_full_path()[:500],
+        "view": (match.view_name if match else None) or "<unresolved>",
+        "user": request.user.username if request.user.is_authenticated else "Anonymous",
+        "status": status,
+        "trigger": target.trigger,
+        "duration_ms": round(duration_ms, 1),
+        "interval_ms": settings.PROFILE_INTERVAL_MS,
+        "samples": target.samples,
+        "query_count": len(sql),
+        "sql": [{"sql": statement, "ms": round(ms, 2)} for statement, ms in sql[:MAX_SQL_STATEMENTS]],
+    }
+    stacks = "".join(f"{stack} {count}\n" for stack, count in target.stacks.most_common())
+    profile_path(profile_id, ".stacks.txt").write_text(stacks)
+    # The .json file is written last: list_profiles() only sees complete profiles.
+    profile_path(profile_id, ".json").write_text(json.dumps(meta))
+    prune_profiles(settings.PROFILE_KEEP)
+    return profile_id
+
+
+
+class ProfilingMiddleware:
+    """
+    Sample the call stacks of one request when staff ask for it with an
+    ``X-Profile: 1`` header or ``?_profile=1``, or of any request still
+    running after PROFILE_SLOW_MS (0 turns that off). The collapsed stacks
+    (flamegraph.pl / speedscope format) and the SQL run while sampling are
+    saved under PROFILES_DIR and listed on the staff performance page.
+
+    Requests that aren't profiled cost two attribute checks.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_ms = settings.PROFILE_SLOW_MS
+        requested = request.headers.get("X-Profile") == "1" or request.GET.get("_profile") == "1"
+        if not requested and not slow_ms:
+            return self.get_response(request)
+
+        if requested and request.user.is_staff:
+            target = sampler.register("requested")
+        elif slow_ms:
+            target = sampler.register("slow", slow_after=slow_ms / 1000)
+        else:
+            return self.get_response(request)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.unregister(target)
+            duration_ms = (time.perf_counter() - target.started) * 1000
+
+        if target.sampling:
+            try:
+                profile_id = save_profile(request, target, duration_ms, response.status_code)
+                if request.user.is_staff:
+                    response["X-Profile-Id"] = profile_id
+            except OSError as e:
+                logger.error(f"Could not save request profile for {request.path}: {str(e)}", exc_info=True)
+        return response
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .cache import get_version, INVENTORY
+from .jobs import enqueue
+from .metrics import PDF_RENDER_SECONDS
+from .models import Job
+from .pdf import TablePDFWriter
+from .utils import (
+    get_inventory_report, get_supplier_report, inventory_report_querysets,
+    LOW_STOCK_THRESHOLD, NEAR_EXPIRY_DAYS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Past this many rows the HTML/CSS layout is too slow and memory-hungry, so the
+# report is drawn with the plain table renderer instead.
+HTML_PDF_MAX_ROWS = 1000
+
+
+# PDF reports are rendered by the run_jobs worker into REPORTS_CACHE_DIR and
+# served from there. A file's name is a hash of the report kind, its filters
+# and the data version, so an unchanged report is never rendered twice and a
+# changed one gets a new file.
+REPORTS = {
+    "inventory": {
+        "filters": ("category", "status", "search"),
+        "template": "inventory/inventory_reports_pdf.html",
+        "filename": "inventory_report.pdf",
+    },
+    "supplier": {
+        "filters": ("status", "search"),
+        "template": "inventory/supplier_reports_pdf.html",
+        "filename": "supplier_report.pdf",
+    },
+}
+
+REPORT_KEY_RE = re.compile(r"^(inventory|supplier)-[0-9a-f]{32}$")
+
+
+
+def reports_dir():
+    path = Path(settings.REPORTS_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def report_path(key):
+    if not REPORT_KEY_RE.match(key):
+        raise ValueError(f"Invalid report key '{key}'.")
+    return reports_dir() / f"{key}.pdf"
+
+
+
+def data_version():
+    """
+    Stamp that changes whenever report data may have: the inventory cache
+    version, which every product, stock, supplier and category write bumps,
+    and the date (expiry buckets). No queries, so a cached report is served
+    from a cache lookup.
+    """
+    parts = [get_version(INVENTORY), timezone.localdate()]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def report_key(kind, filters):
+    raw = json.dumps([kind, filters, data_version()], sort_keys=True, default=str)
+    return f"{kind}-{hashlib.sha1(raw.encode()).hexdigest()[:32]}"
+
+
+def report_filters(kind, params):
+    return {name: params.get(name) or "" for name in REPORTS[kind]["filters"]}
+
+
+
+def report_context(kind, filters):
+    context = {
+        "low_stock_threshold": LOW_STOCK_THRESHOLD,
+        "near_expiry_days": NEAR_EXPIRY_DAYS,
+        "today": timezone.localdate(),
+        "selected_status": filters.get("status"),
+        "search_query": filters.get("search"),
+    }
+    if kind == "inventory":
+        context.update(get_inventory_report(filters["category"], filters["status"], filters["search"]))
+    else:
+        context["suppliers_data"] = get_supplier_report(filters["search"], filters["status"] or None)
+    return context
+
+
+
+def _inventory_tables(filters):
+    querysets = inventory_report_querysets(filters["category"], filters["status"], filters["search"])
+    product_columns = [("#", 0.08, "right"), ("Product Name", 0.5, "left"), ("Category", 0.27, "left")]
+    sections = [
+        (f"Low Stock (< {LOW_STOCK_THRESHOLD} units)", "low_stock_products", "quantity_in_stock",
+         ("Stock Quantity", 0.15, "right"), "No products found."),
+        ("Expired Products", "expired_products", "expiry_date", ("Expiry Date", 0.15, "left"), "No expired products."),
+        (f"Near Expiry ({NEAR_EXPIRY_DAYS} days)", "near_expiry_products", "expiry_date",
+         ("Expiry Date", 0.15, "left"), "No products near expiry."),
+    ]
+    for heading, name, last_field, last_column, empty in sections:
+        rows = querysets[name].order_by("id").values_list("name", "category__name", last_field)
+        numbered = ((i, *row) for i, row in enumerate(rows.iterator(chunk_size=2000), 1))
+        yield heading, product_columns + [last_column], numbered, empty
+
+
+def _supplier_tables(filters):
+    rows = get_supplier_report(filters["search"], filters["status"] or None).values_list(
+        "name", "total_products", "low_stock_count", "expired_count", "near_expiry_count"
+    )
+    columns = [
+        ("#", 0.06, "right"), ("Supplier", 0.34, "left"), ("Total Products", 0.15, "right"),
+        (f"Low Stock (< {LOW_STOCK_THRESHOLD})", 0.15, "right"), ("Expired", 0.12, "right"),
+        (f"Near Expiry ({NEAR_EXPIRY_DAYS}d)", 0.18, "right"),
+    ]
+    numbered = ((i, *row) for i, row in enumerate(rows.iterator(chunk_size=2000), 1))
+    yield "Suppliers", columns, numbered, "No suppliers found."
+
+
+TABLE_SECTIONS = {
+    "inventory": ("Inventory Report", _inventory_tables),
+    "supplier": ("Supplier Report", _supplier_tables),
+}
+
+
+def report_row_count(kind, filters):
+    if kind == "inventory":
+        querysets = inventory_report_querysets(filters["category"], filters["status"], filters["search"])
+        return sum(queryset.count() for queryset in querysets.values())
+    return get_supplier_report(filters["search"], filters["status"] or None).count()
+
+
+
+def write_table_pdf(kind, filters, output):
+    """Draw the report with TablePDFWriter, streaming rows from the database page by page."""
+    title, sections = TABLE_SECTIONS[kind]
+    writer = TablePDFWriter(output, title, f"Date: {timezone.localdate()}")
+    for heading, columns, rows, empty in sections(filters):
+        writer.table(heading, columns, rows, empty_message=empty)
+    writer.close()
+
+
+def write_html_pdf(kind, filters, output):
+    from weasyprint import HTML
+
+    html_string = render_to_string(REPORTS[kind]["template"], report_context(kind, filters))
+    HTML(string=html_string).write_pdf(target=output)
+
+
+
+def render_report(kind, filters, key):
+    """Job handler: render one report to its cache file."""
+    path = report_path(key)
+    if path.exists():
+        return
+
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as output:
+            if report_row_count(kind, filters) > HTML_PDF_MAX_ROWS:
+                with PDF_RENDER_SECONDS.time(kind=kind, renderer="table"):
+                    write_table_pdf(kind, filters, output)
+            else:
+                try:
+                    with PDF_RENDER_SECONDS.time(kind=kind, renderer="html"):
+                        write_html_pdf(kind, filters, output)
+                except OSError as e:
+                    # WeasyPrint needs Pango; without it the plain tables are still available.
+                    logger.warning(f"HTML PDF rendering unavailable, using table renderer: {str(e)}")
+                    output.seek(0)
+                    output.truncate()
+                    with PDF_RENDER_SECONDS.time(kind=kind, renderer="table"):
+                        write_table_pdf(kind, filters, output)
+        # Readers only ever see a complete file.
+        os.replace(tmp_path, path)
+        logger.info(f"Rendered {kind} PDF report {key} ({path.stat().st_size} bytes)")
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+
+def request_report(kind, params):
+    """Return the report's key, queueing a render unless a cached file exists."""
+    filters = report_filters(kind, params)
+    key = report_key(kind, filters)
+    if not report_path(key).exists():
+        enqueue("render_report", {"kind": kind, "filters": filters, "key": key}, dedupe_key=f"report:{key}")
+    return key
+
+
+def report_status(key):
+    """Return "ready", "pending", "failed", or "missing" when there's no file or job (e.g. pruned)."""
+    if report_path(key).exists():
+        return "ready"
+    job = Job.objects.filter(dedupe_key=f"report:{key}").order_by("-id").only("status").first()
+    if job is None or job.status == "done":
+        return "missing"
+    if job.status == "failed":
+        return "failed"
+    return "pending"
+
+
+
+def prune_report_files(max_age_seconds):
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for path in reports_dir().glob("*.pdf"):
+        if path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -0,0 +1,145 @@
+from django.db import connection, connections
+from django.db.models import BooleanField, Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+
+# Searched columns per table. Every backend matches the same rows: those where
+# one of these columns contains the search text, ignoring case, as icontains
+# would ("cetamol" finds "Paracetamol", "zinc syrup" needs those words
+# together). The indexes only make that faster and rank the results:
+# PostgreSQL uses trigram indexes on every column (migrations 0013 and 0025)
+# and ranks with the tsvector column; SQLite uses an FTS5 trigram table kept in
+# sync by triggers and ranks name matches first. Text shorter than a trigram,
+# or a database without those indexes, is matched with icontains.
+SEARCH_FIELDS = {
+    "inventory_product": ("name", "description"),
+    "inventory_supplier": ("name", "email", "phone"),
+}
+
+_fts_tables = None
+
+
+
+def _sqlite_fts_statements(table, columns):
+    """FTS5 external-content table over ``table`` plus triggers that keep it in sync."""
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"coalesce(new.{c}, '')" for c in columns)
+    old_values = ", ".join(f"coalesce(old.{c}, '')" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', "
+        f"content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        # Only re-index when a searched column changes, not on every stock update.
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+
+def ensure_sqlite_search_index(conn):
+    """
+    Create the FTS5 tables and triggers if they are missing and rebuild the
+    index when they were. SQLite migrations that remake a table drop its
+    triggers, so this also runs after every migrate.
+    """
+    global _fts_tables
+    # The trigram tokenizer needs SQLite 3.34.
+    if conn.vendor != "sqlite" or conn.Database.sqlite_version_info < (3, 34):
+        return
+
+    with conn.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        if not any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall()):
+            return
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        triggers = {row[0] for row in cursor.fetchall()}
+
+        for table, columns in SEARCH_FIELDS.items():
+            fts = f"{table}_fts"
+            if {f"{fts}_ai", f"{fts}_ad", f"{fts}_au"} <= triggers:
+                continue
+            for sql in _sqlite_fts_statements(table, columns):
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    _fts_tables = None
+
+
+def ensure_search_index_after_migrate(sender, using, **kwargs):
+    ensure_sqlite_search_index(connections[using])
+
+
+
+def _sqlite_fts_available(table):
+    global _fts_tables
+    if _fts_tables is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s", ["%_fts"])
+            _fts_tables = {row[0] for row in cursor.fetchall()}
+    return f"{table}_fts" in _fts_tables
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def fts5_phrase(text):
+    """Quote ``text`` as one FTS5 phrase, so user input can't inject FTS5 syntax."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+
+def _search(queryset, text):
+    table = queryset.model._meta.db_table
+    text = text.strip()
+    if not text:
+        return queryset
+
+    fields = SEARCH_FIELDS[table]
+    if connection.vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('english', %s)"
+        # ILIKE rather than icontains' UPPER(...) LIKE, so the trigram indexes apply.
+        matches = RawSQL(
+            " OR ".join(f"{table}.{field} ILIKE %s" for field in fields),
+            [f"%{_escape_like(text)}%"] * len(fields),
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f"GREATEST(ts_rank({table}.search_vector, {tsquery}), similarity({table}.name, %s))",
+            [text, text],
+            output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank).order_by("-search_rank", "-pk")
+
+    # A trigram phrase matches exactly the rows that contain the text, but
+    # text under three characters has no trigrams to look up.
+    if connection.vendor == "sqlite" and len(text) >= 3 and _sqlite_fts_available(table):
+        fts = f"{table}_fts"
+        hits = RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [fts5_phrase(text)])
+        matches = queryset.filter(pk__in=hits)
+    else:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f"{field}__icontains": text})
+        matches = queryset.filter(condition)
+
+    # bm25 over trigrams says little and costs a MATCH per row; name matches first.
+    rank = Case(When(name__icontains=text, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+    return matches.annotate(search_rank=rank).order_by("-search_rank", "-pk")
+
+
+
+def search_products(queryset, text):
+    """Filter ``queryset`` to products matching ``text``, best matches first."""
+    return _search(queryset, text)
+
+
+def search_suppliers(queryset, text):
+    """Filter ``queryset`` to suppliers matching ``text``, best matches first."""
+    return _search(queryset, text)
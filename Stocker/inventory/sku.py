@@ -0,0 +1,53 @@
+from django.db import connection, transaction
+from django.db.models import F
+
+
+SKU_PREFIX = "MED"
+SKU_SEQUENCE = "product"
+# PostgreSQL sequence created by migration 0012.
+POSTGRES_SKU_SEQUENCE = "inventory_product_sku_seq"
+
+
+
+def format_sku(number):
+    return f"{SKU_PREFIX}-{number:04d}"
+
+
+
+def allocate_skus(count):
+    """
+    Reserve ``count`` SKUs before insert and return them in order.
+
+    PostgreSQL draws them from a sequence; other databases bump a counter row
+    by the whole block in one UPDATE, inside the caller's transaction so a
+    rollback returns the block as well.
+    """
+    if count <= 0:
+        return []
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                [POSTGRES_SKU_SEQUENCE, count],
+            )
+            return [format_sku(row[0]) for row in cursor.fetchall()]
+
+    from .models import SkuSequence
+
+    with transaction.atomic():
+        bumped = SkuSequence.objects.filter(name=SKU_SEQUENCE).update(last_value=F("last_value") + count)
+        if not bumped:
+            SkuSequence.objects.create(name=SKU_SEQUENCE, last_value=count)
+        last = SkuSequence.objects.values_list("last_value", flat=True).get(name=SKU_SEQUENCE)
+
+    return [format_sku(n) for n in range(last - count + 1, last + 1)]
+
+
+
+def assign_skus(products):
+    """Give every product without a SKU one from a single reserved block."""
+    missing = [p for p in products if not p.sku]
+    for product, sku in zip(missing, allocate_skus(len(missing))):
+        product.sku = sku
+    return missing
@@ -0,0 +1,187 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .perf import current_metrics
+
+
+# Statements slower than SLOW_QUERY_MS are written as JSON lines to the
+# "inventory.slow_queries" logger (SLOW_QUERY_LOG, see settings.LOGGING) with
+# their normalized SQL, the view and line of our code that ran them and, the
+# first time each statement shape is seen by a process, its EXPLAIN plan.
+# `python manage.py slow_queries` summarizes the log.
+
+logger = logging.getLogger("inventory.slow_queries")
+
+MAX_EXPLAINED = 1000
+# Our instrumentation, which sits on every stack and says nothing about where a query came from.
+_SKIP_FILES = tuple(os.path.join("inventory", name) for name in ("slowlog.py", "perf.py", "profiling.py"))
+
+_explained = set()
+_local = threading.local()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+
+def normalize_sql(sql):
+    """
+    The shape of a statement: literals become ?, IN lists of any length one
+    placeholder, so the same queryset with different filter values groups together.
+    """
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def call_site():
+    """The innermost frame of our own code running the query, e.g. "inventory/views.py:120 in products_list_view"."""
+    base = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and not filename.endswith(_SKIP_FILES) and "site-packages" not in filename:
+            return f"{filename[len(base):]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """
+    The plan for ``sql`` as text: EXPLAIN on PostgreSQL, EXPLAIN QUERY PLAN on
+    SQLite. Runs on a bare backend cursor, so the statement isn't timed,
+    counted or logged again by the execute wrappers.
+    """
+    prefix = connection.ops.explain_query_prefix()
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f"{prefix} {sql}", params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if connection.vendor != "sqlite":
+        return "\n".join(str(row[0]) for row in rows)
+    # SQLite rows are (id, parent, notused, detail); indent children under their parent.
+    depth, lines = {0: -1}, []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return "\n".join(lines)
+
+
+
+def _wants_plan(sql, many, key):
+    if many or key in _explained:
+        return False
+    return sql.lstrip()[:6].upper() in ("SELECT", "WITH")
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection while SLOW_QUERY_MS > 0."""
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = (time.perf_counter() - start) * 1000
+    if elapsed < settings.SLOW_QUERY_MS or getattr(_local, "active", False):
+        return result
+
+    _local.active = True
+    try:
+        connection = context["connection"]
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        metrics = current_metrics()
+        record = {
+            "time": timezone.now().isoformat(),
+            "ms": round(elapsed, 2),
+            "fingerprint": key,
+            "sql": normalized,
+            "db": connection.alias,
+            "vendor": connection.vendor,
+            "view": metrics.view if metrics is not None else None,
+            "call_site": call_site(),
+        }
+        if _wants_plan(sql, many, key) and not connection.needs_rollback:
+            if len(_explained) >= MAX_EXPLAINED:
+                _explained.clear()
+            _explained.add(key)
+            try:
+                record["plan"] = explain(connection, sql, params)
+            except DatabaseError as e:
+                record["plan_error"] = str(e)
+        logger.warning(json.dumps(record))
+    except Exception as e:
+        # Never fail the query because it couldn't be logged.
+        logging.getLogger(__name__).error(f"Could not log slow query: {str(e)}", exc_info=True)
+    finally:
+        _local.active = False
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: wrap the new connection when slow query logging is on."""
+    if settings.SLOW_QUERY_MS > 0 and log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_query)
+
+
+
+def read_log(path):
+    """
+    Slow query records from a SLOW_QUERY_LOG file and its rotated backups
+    (path.1 is the newest), oldest first, skipping lines that aren't ours.
+    """
+    backups = [name for name in glob.glob(glob.escape(path) + ".*") if name.rsplit(".", 1)[1].isdigit()]
+    backups.sort(key=lambda name: int(name.rsplit(".", 1)[1]), reverse=True)
+    if not backups and not os.path.exists(path):
+        raise FileNotFoundError(path)
+    for name in backups + [path]:
+        try:
+            with open(name, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and "fingerprint" in record:
+                        yield record
+        except FileNotFoundError:
+            continue
+
+
+def summarize(records):
+    """Group records by statement shape, worst total time first."""
+    groups = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "views": defaultdict(int),
+                                  "call_sites": defaultdict(int), "plan": None, "last_seen": None})
+    for record in records:
+        group = groups[record["fingerprint"]]
+        group["fingerprint"] = record["fingerprint"]
+        group["sql"] = record["sql"]
+        group["count"] += 1
+        group["total_ms"] += record["ms"]
+        group["max_ms"] = max(group["max_ms"], record["ms"])
+        group["views"][record.get("view") or "<no request>"] += 1
+        if record.get("call_site"):
+            group["call_sites"][record["call_site"]] += 1
+        if record.get("plan"):
+            group["plan"] = record["plan"]
+        group["last_seen"] = record["time"]
+    return sorted(groups.values(), key=lambda group: group["total_ms"], reverse=True)
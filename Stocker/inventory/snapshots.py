@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import InventorySnapshot, Product
+from .utils import low_stock_q, expired_q, near_expiry_q
+
+
+TREND_DAYS = 90
+
+
+
+def take_snapshot():
+    """
+    Store today's per-category counts, units and stock value. Products only
+    hold their current stock, so a snapshot can only be taken for today; taking
+    it again updates today's rows in place. One grouped query over products.
+    """
+    today = timezone.localdate()
+    value = ExpressionWrapper(F("quantity_in_stock") * F("price"), output_field=DecimalField(max_digits=16, decimal_places=2))
+
+    rows = (Product.objects
+            .values("category_id", "category__name")
+            .annotate(
+                total_products=Count("id"),
+                out_of_stock=Count("id", filter=Q(quantity_in_stock=0)),
+                low_stock=Count("id", filter=low_stock_q()),
+                expired=Count("id", filter=expired_q(today)),
+                near_expiry=Count("id", filter=near_expiry_q(today)),
+                total_units=Sum("quantity_in_stock"),
+                stock_value=Sum(value),
+            )
+            .order_by())
+
+    snapshots = []
+    with transaction.atomic():
+        # update_or_create per category (a few dozen rows a day): the unique
+        # constraints turn a concurrent run (cron and run_jobs) into an update.
+        for row in rows:
+            # The uncategorized row is matched by its empty name too, so rows
+            # left behind by a category deleted today are not picked up.
+            if row["category_id"]:
+                lookup = {"category_id": row["category_id"]}
+            else:
+                lookup = {"category": None, "category_name": ""}
+            snapshot, _ = InventorySnapshot.objects.update_or_create(
+                date=today,
+                **lookup,
+                defaults={
+                    "category_name": row["category__name"] or "",
+                    "total_products": row["total_products"],
+                    "out_of_stock": row["out_of_stock"],
+                    "low_stock": row["low_stock"],
+                    "expired": row["expired"],
+                    "near_expiry": row["near_expiry"],
+                    "total_units": row["total_units"] or 0,
+                    "stock_value": row["stock_value"] or 0,
+                },
+            )
+            snapshots.append(snapshot)
+        # Categories emptied since an earlier run today.
+        InventorySnapshot.objects.filter(date=today).exclude(pk__in=[s.pk for s in snapshots]).delete()
+    return snapshots
+
+
+def has_snapshot():
+    return InventorySnapshot.objects.filter(date=timezone.localdate()).exists()
+
+
+
+def snapshot_trend(days=TREND_DAYS, category_id=None):
+    """Daily totals across categories (or for one category) from the snapshot table."""
+    snapshots = InventorySnapshot.objects.filter(date__gte=timezone.localdate() - timedelta(days=days))
+    if category_id and str(category_id).isdigit():
+        snapshots = snapshots.filter(category_id=category_id)
+    return list(
+        snapshots.values("date")
+        .annotate(
+            total_products=Sum("total_products"),
+            out_of_stock=Sum("out_of_stock"),
+            low_stock=Sum("low_stock"),
+            expired=Sum("expired"),
+            near_expiry=Sum("near_expiry"),
+            total_units=Sum("total_units"),
+            stock_value=Sum("stock_value"),
+        )
+        .order_by("date")
+    )
+
+
+def trend_chart_context(days=TREND_DAYS, category_id=None):
+    trend = snapshot_trend(days, category_id)
+    series = ("total_products", "out_of_stock", "low_stock", "expired", "near_expiry", "total_units")
+    context = {f"trend_{name}": [day[name] for day in trend] for name in series}
+    context["trend_labels"] = [str(day["date"]) for day in trend]
+    context["trend_stock_value"] = [float(day["stock_value"] or 0) for day in trend]
+    return context
@@ -0,0 +1,224 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .ledger import change_stock, StockUpdateError, lock_product
+from .models import Product, ProductTombstone, SkuSequence, StockMovement
+from .pagination import CursorPaginator
+
+
+MAX_PUSH_MOVEMENTS = 500
+MAX_PULL_PRODUCTS = 500
+NUMBER_BATCH_SIZE = 1000
+# SkuSequence row holding the last change number handed out.
+CHANGE_SEQUENCE = "sync"
+
+PULL_FIELDS = ("id", "sku", "name", "quantity_in_stock", "expiry_date", "batch_number", "updated_at", "change_seq")
+
+
+class SyncError(Exception):
+    pass
+
+
+
+def _parse_movement(entry):
+    if not isinstance(entry, dict):
+        raise SyncError("Each movement must be an object.")
+
+    key = str(entry.get("key") or "").strip()
+    if not key or len(key) > 64:
+        raise SyncError("Each movement needs a 'key' of 1-64 characters.")
+
+    movement_type = entry.get("type")
+    if movement_type not in dict(StockMovement.MOVEMENT_TYPES):
+        raise SyncError(f"Unknown movement type '{movement_type}'.")
+
+    quantity = entry.get("quantity")
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0:
+        raise SyncError("'quantity' must be a non-negative integer.")
+
+    product_id = entry.get("product_id")
+    if not entry.get("sku") and not product_id:
+        raise SyncError("Each movement needs a 'sku' or 'product_id'.")
+    if product_id is not None and (not isinstance(product_id, int) or isinstance(product_id, bool)):
+        raise SyncError("'product_id' must be an integer.")
+
+    return {
+        "key": key,
+        "type": movement_type,
+        "quantity": quantity,
+        "sku": entry.get("sku"),
+        "product_id": product_id,
+        "reason": entry.get("reason") or None,
+    }
+
+
+
+def apply_movement_batch(entries, user=None):
+    """
+    Apply movements pushed by an offline client in one transaction.
+
+    IN and OUT quantities are units received or removed, ADJUST is the counted
+    stock level. Every movement carries a client key; keys already in the
+    ledger are reported as duplicates and not applied again, so a client can
+    safely resend a batch after a dropped connection.
+    Returns one result dict per entry, in order.
+    """
+    if not isinstance(entries, list):
+        raise SyncError("'movements' must be a list.")
+    if len(entries) > MAX_PUSH_MOVEMENTS:
+        raise SyncError(f"At most {MAX_PUSH_MOVEMENTS} movements per request.")
+
+    results = [None] * len(entries)
+    parsed = []
+    for i, entry in enumerate(entries):
+        try:
+            parsed.append((i, _parse_movement(entry)))
+        except SyncError as e:
+            results[i] = {"key": entry.get("key") if isinstance(entry, dict) else None,
+                          "status": "error", "error": str(e)}
+
+    keys = [m["key"] for _, m in parsed]
+    skus = {m["sku"] for _, m in parsed if m["sku"]}
+    ids = {m["product_id"] for _, m in parsed if m["product_id"]}
+
+    with transaction.atomic():
+        products = list(Product.objects.filter(Q(sku__in=skus) | Q(pk__in=ids)).only("id", "sku", "name"))
+        by_sku = {p.sku: p for p in products if p.sku}
+        by_id = {p.pk: p for p in products}
+        # Lock in id order so two batches touching the same products can't deadlock.
+        for product_id in sorted(by_id):
+            lock_product(product_id)
+
+        applied = dict(StockMovement.objects.filter(client_key__in=keys).values_list("client_key", "id"))
+
+        for i, m in parsed:
+            if m["key"] in applied:
+                results[i] = {"key": m["key"], "status": "duplicate", "movement_id": applied[m["key"]]}
+                continue
+
+            product = by_sku.get(m["sku"]) if m["sku"] else by_id.get(m["product_id"])
+            if product is None:
+                results[i] = {"key": m["key"], "status": "error", "error": "Unknown product."}
+                continue
+
+            if m["type"] == "ADJUST":
+                change = {"new_quantity": m["quantity"]}
+            else:
+                change = {"delta": m["quantity"] if m["type"] == "IN" else -m["quantity"]}
+
+            try:
+                movement = change_stock(product, m["type"], reason=m["reason"], user=user,
+                                        client_key=m["key"], **change)
+            except StockUpdateError as e:
+                results[i] = {"key": m["key"], "status": "error", "error": str(e)}
+                continue
+            except IntegrityError:
+                # The same key was committed by a concurrent retry of this batch.
+                results[i] = {"key": m["key"], "status": "duplicate"}
+                continue
+
+            applied[m["key"]] = movement.pk
+            results[i] = {"key": m["key"], "status": "applied", "movement_id": movement.pk,
+                          "product_id": product.pk, "quantity_in_stock": movement.new_quantity}
+
+    return results
+
+
+
+def record_deleted_product(sender, instance, **kwargs):
+    """post_delete receiver: leave a tombstone for the next pulls."""
+    ProductTombstone.objects.create(id=instance.pk, sku=instance.sku)
+    number_changes_on_commit()
+
+
+
+def number_changes_on_commit():
+    """
+    Number the current transaction's changes once it commits (right away
+    outside a transaction). Every write that clears change_seq calls this;
+    it is registered once per transaction however many rows were written.
+    """
+    connection = transaction.get_connection()
+    # run_on_commit holds (savepoint ids, callback, ...) tuples.
+    if not any(callback[1] is number_changes for callback in connection.run_on_commit):
+        transaction.on_commit(number_changes)
+
+
+
+def number_changes():
+    """
+    Give every committed product change and deletion not yet in the change feed
+    the next change number, and return it (None when there was nothing).
+    Runs after each writing transaction commits (number_changes_on_commit), and
+    from the job worker to catch rows whose writer stopped before numbering.
+
+    Writers only clear change_seq, so they never wait on each other here. The
+    counter row stays locked until this transaction commits, and rows still
+    locked by an open transaction are skipped until a later call. So a number
+    only becomes visible once every lower number is, and a pull that has seen
+    number n has seen everything numbered up to n.
+    """
+    pending = [Product.objects.filter(change_seq__isnull=True),
+               ProductTombstone.objects.filter(change_seq__isnull=True)]
+    if not any(queryset.exists() for queryset in pending):
+        return None
+
+    with transaction.atomic():
+        # An UPDATE first, which also takes SQLite's write lock up front.
+        if not SkuSequence.objects.filter(name=CHANGE_SEQUENCE).update(last_value=F("last_value") + 1):
+            SkuSequence.objects.create(name=CHANGE_SEQUENCE, last_value=1)
+        number = SkuSequence.objects.values_list("last_value", flat=True).get(name=CHANGE_SEQUENCE)
+
+        for queryset in pending:
+            ids = list(queryset.select_for_update(skip_locked=True).values_list("id", flat=True))
+            for start in range(0, len(ids), NUMBER_BATCH_SIZE):
+                queryset.model.objects.filter(pk__in=ids[start:start + NUMBER_BATCH_SIZE]).update(change_seq=number)
+    return number
+
+
+
+def changes_since(cursor=None, limit=MAX_PULL_PRODUCTS):
+    """
+    Products changed and deleted after ``cursor``, in change feed order.
+    Returns ``(products, deleted, next_cursor, has_more)``; pass
+    ``next_cursor`` to the next pull. Read-only: changes are numbered by
+    their writers at commit.
+    """
+    limit = max(1, min(limit, MAX_PULL_PRODUCTS))
+    paginator = CursorPaginator(Product.objects.all(), ("change_seq", "id"), limit)
+
+    after = None
+    if cursor:
+        after = paginator.decode_cursor(cursor)
+        if after is None or after[0] is None:
+            raise SyncError("Invalid cursor. Pull again without one to start over.")
+
+    def page(queryset):
+        queryset = queryset.filter(change_seq__isnull=False)
+        if after:
+            queryset = queryset.filter(Q(change_seq__gt=after[0]) | Q(change_seq=after[0], id__gt=after[1]))
+        return list(queryset.order_by("change_seq", "id")[:limit + 1])
+
+    changes = sorted(page(Product.objects.only(*PULL_FIELDS)) + page(ProductTombstone.objects.all()),
+                     key=lambda row: (row.change_seq, row.pk))
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    next_cursor = paginator.encode_cursor(changes[-1]) if changes else cursor
+
+    products = [
+        {
+            "id": p.pk,
+            "sku": p.sku,
+            "name": p.name,
+            "quantity_in_stock": p.quantity_in_stock,
+            "expiry_date": p.expiry_date.isoformat() if p.expiry_date else None,
+            "batch_number": p.batch_number,
+            "updated_at": p.updated_at.isoformat(),
+        }
+        for p in changes if isinstance(p, Product)
+    ]
+    deleted = [
+        {"id": t.pk, "sku": t.sku, "deleted_at": t.deleted_at.isoformat()}
+        for t in changes if isinstance(t, ProductTombstone)
+    ]
+    return products, deleted, next_cursor, has_more
@@ -1,3 +1,959 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import urllib.error
+import urllib.request
+import uuid
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from .cache import INVENTORY, make_key
+from .importers import ProductImporter
+from .jobs import run_pending_jobs
+from .ledger import StockUpdateError, change_stock
+from . import counters
+from .jobs import enqueue
+from .metrics import render, start_metrics_server
+from .models import (Category, InventorySnapshot, Job, Notification, Product, ProductAlertState, StockMovement, Supplier,
+                     SupplierProduct)
+from .notifications import mark_all_read, notify_users, recount_unread, unread_count
+from .pagination import estimate_count, plan_rows
+from .profiling import profile_path
+from .reports import data_version, report_status
+from .search import search_products
+from .sku import allocate_skus, format_sku
+from .snapshots import take_snapshot
+from .sync import number_changes
+from .utils import (DASHBOARD_LOW_STOCK_ROWS, check_and_send_inventory_alerts, enqueue_inventory_alerts,
+                    get_cached_supplier_report, get_dashboard_data, get_inventory_report)
+
+
+# Rows seeded per model for the small and the large run. Every page must issue
+# the same number of queries for both: a per-row query shows up as a difference.
+SMALL = 3
+LARGE = 10 * SMALL
+
+
+
+def seed(n, user, start=0):
+    """Add ``n`` categories, suppliers and products, with supplier links, movements and notifications."""
+    today = timezone.localdate()
+    categories = [Category.objects.create(name=f"Category {i}") for i in range(start, start + n)]
+    Supplier.objects.bulk_create([Supplier(name=f"Supplier {i}") for i in range(start, start + n)])
+
+    products = []
+    for i in range(start, start + n):
+        # Alternate between in stock, low stock, expired and near expiry.
+        products.append(Product(
+            name=f"Product {i}",
+            category=categories[(i - start) % n] if i % 5 else None,
+            quantity_in_stock=(i * 37) % 250,
+            expiry_date=today + timedelta(days=(i % 4) * 20 - 10),
+            price=i % 50 + 1,
+        ))
+    products = Product.objects.bulk_create(products)
+
+    # Every product goes to the first three suppliers, so their pages grow with n.
+    first_suppliers = list(Supplier.objects.order_by("id")[:3])
+    SupplierProduct.objects.bulk_create([
+        SupplierProduct(supplier=supplier, product=product, unit_cost=1)
+        for product in products
+        for supplier in first_suppliers
+    ])
+    StockMovement.objects.bulk_create([
+        StockMovement(product=product, movement_type="IN", previous_quantity=0,
+                      new_quantity=product.quantity_in_stock, quantity_change=product.quantity_in_stock,
+                      user=user)
+        for product in products
+    ])
+    Notification.objects.bulk_create([
+        Notification(user=user, title=f"Notice {i}", message="Low stock", type="low_stock")
+        for i in range(start, start + n)
+    ])
+    # Writers number sync changes when they commit, which never happens in a TestCase.
+    number_changes()
+
+
+
+def html(title, *markers):
+    """Expected response for a page: its <title> and some text only that template renders."""
+    return 200, "text/html", (f"<title>{title}</title>", *markers)
+
+
+def json_body(*markers):
+    return 200, "application/json", markers
+
+
+def redirect(location):
+    return 302, None, location
+
+
+PROFILE_ID = "20260101-000000-00000000"
+
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Load every page with a small and a ten times larger inventory and check
+    the number of queries doesn't grow with it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("staff", password="secret", is_staff=True)
+        seed(SMALL, cls.user)
+        cls.product = Product.objects.order_by("id").first()
+        cls.category = Category.objects.order_by("id").first()
+        cls.supplier = Supplier.objects.order_by("id").first()
+        cls.supplier_product = SupplierProduct.objects.filter(supplier=cls.supplier).order_by("id").first()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        for setting in ("REPORTS_CACHE_DIR", "PROFILES_DIR"):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            self.enterContext(override_settings(**{setting: directory.name}))
+        profile_path(PROFILE_ID, ".stacks.txt").write_text("inventory/views.py:dashboard_view 3\n")
+        profile_path(PROFILE_ID, ".json").write_text(json.dumps({
+            "id": PROFILE_ID, "created": "2026-01-01T00:00:00+00:00", "method": "GET", "path": "/",
+            "view": "inventory:dashboard_view", "user": "staff", "status": 200, "trigger": "requested",
+            "duration_ms": 12.5, "samples": 3, "query_count": 0, "sql": [],
+        }))
+
+    def requests(self):
+        """(name, method, url, data, expected response) for every route in inventory/urls.py."""
+        product, category, supplier = self.product.pk, self.category.pk, self.supplier.pk
+        report_key = "inventory-" + "0" * 32
+        push = lambda: {"movements": [{"key": uuid.uuid4().hex, "product_id": product, "type": "IN", "quantity": 1}]}
+        return [
+            ("notifications_list_view", "get", reverse("inventory:notifications_list_view"), None,
+             html("Notifications", "Low stock")),
+            ("mark_all_notifications_read_view", "post", reverse("inventory:mark_all_notifications_read_view"), None,
+             redirect(reverse("inventory:notifications_list_view"))),
+            ("global_search", "get", reverse("inventory:global_search") + "?search=Product", None,
+             html("Search Results", 'Search Results for "Product"', "Product 1")),
+            ("dashboard_view", "get", reverse("inventory:dashboard_view"), None,
+             html("Dashboard", 'id="count-products"', 'id="lowStockRows"', "DASHBOARD_POLL_MS")),
+            ("dashboard_data_view", "get", reverse("inventory:dashboard_data_view"), None,
+             json_body('"counts"', '"low_stock"', '"stock_status"')),
+            ("products_list_view", "get", reverse("inventory:products_list_view"), None,
+             html("Products", "Products List", "Product ")),
+            ("export_products_csv_view", "get", reverse("inventory:export_products_csv_view"), None,
+             (200, "text/csv", ("Product 0",))),
+            ("import_products_csv_view", "get", reverse("inventory:import_products_csv_view"), None,
+             html("Import Products", 'type="file"')),
+            ("product_detail_view", "get", reverse("inventory:product_detail_view", args=[product]), None,
+             html("Product Details", "Product 0")),
+            ("add_product_view", "get", reverse("inventory:add_product_view"), None,
+             html("Add Product", "Add New Product", "csrfmiddlewaretoken")),
+            ("edit_product", "get", reverse("inventory:edit_product", args=[product]), None,
+             html("Edit Product", 'value="Product 0"')),
+            # Deleting is POST only; a GET goes back to the edit page.
+            ("delete_product_view", "get", reverse("inventory:delete_product_view", args=[product]), None,
+             redirect(reverse("inventory:edit_product", args=[product]))),
+            ("category_list", "get", reverse("inventory:category_list"), None,
+             html("Categories List", "Category 0")),
+            ("add_category", "get", reverse("inventory:add_category"), None,
+             html("Add Category", "Add New Category")),
+            ("edit_category", "get", reverse("inventory:edit_category", args=[category]), None,
+             html("Edit Category", 'value="Category 0"')),
+            ("delete_category", "get", reverse("inventory:delete_category", args=[category]), None,
+             redirect(reverse("inventory:edit_category", args=[category]))),
+            ("supplier_list_view", "get", reverse("inventory:supplier_list_view"), None,
+             html("Suppliers", "Suppliers List", "Supplier 0")),
+            ("add_supplier_view", "get", reverse("inventory:add_supplier_view"), None,
+             html("Add Supplier", "Add New Supplier")),
+            ("edit_supplier_view", "get", reverse("inventory:edit_supplier_view", args=[supplier]), None,
+             html("Edit Supplier", 'value="Supplier 0"')),
+            ("delete_supplier_view", "get", reverse("inventory:delete_supplier_view", args=[supplier]), None,
+             redirect(reverse("inventory:edit_supplier_view", args=[supplier]))),
+            ("supplier_detail_view", "get", reverse("inventory:supplier_detail_view", args=[supplier]), None,
+             html("Supplier Details", "Supplier 0", "Product 0")),
+            ("toggle_supplier_product", "get",
+             reverse("inventory:toggle_supplier_product", args=[self.supplier_product.pk]), None,
+             redirect(reverse("inventory:supplier_detail_view", args=[supplier]))),
+            ("edit_supplier_product", "get",
+             reverse("inventory:edit_supplier_product", args=[self.supplier_product.pk]), None,
+             html("Edit Supplier Product", 'name="unit_cost"')),
+            ("stock_status_view", "get", reverse("inventory:stock_status_view"), None,
+             html("Stock Status", "Product ")),
+            ("stock_update_view", "get", reverse("inventory:stock_update_view", args=[product]), None,
+             html("Update Stock", 'name="expected_quantity"')),
+            ("stock_movements_view", "get", reverse("inventory:stock_movements_view"), None,
+             html("All Stock Movements", "Product ")),
+            ("product_movements_view", "get", reverse("inventory:product_movements_view", args=[product]), None,
+             html("Product 0 — Stock Movements")),
+            ("sync_push_view", "json", reverse("inventory:sync_push_view"), push,
+             json_body('"status": "applied"')),
+            ("sync_pull_view", "get", reverse("inventory:sync_pull_view"), None,
+             json_body('"products": [{"id": ', '"deleted"', '"cursor"')),
+            ("reports_home", "get", reverse("inventory:reports_home"), None,
+             html("Reports", "Reports Dashboard")),
+            ("inventory_reports_view", "get", reverse("inventory:inventory_reports_view"), None,
+             html("Inventory Reports", "Low Stock (&lt; 100 units)")),
+            ("inventory_reports_pdf", "get", reverse("inventory:inventory_reports_pdf"), None,
+             redirect("/reports/pdf/inventory-")),
+            ("supplier_reports_view", "get", reverse("inventory:supplier_reports_view"), None,
+             html("Supplier Reports", "Supplier 0")),
+            ("supplier_reports_pdf", "get", reverse("inventory:supplier_reports_pdf"), None,
+             redirect("/reports/pdf/supplier-")),
+            ("report_status", "get", reverse("inventory:report_status", args=[report_key]), None,
+             html("PDF Report")),
+            # Not rendered yet: back to the status page.
+            ("report_download", "get", reverse("inventory:report_download", args=[report_key]), None,
+             redirect(reverse("inventory:report_status", args=[report_key]))),
+            ("perf_dashboard", "get", reverse("inventory:perf_dashboard"), None,
+             html("Performance", "Request Performance by View", PROFILE_ID)),
+            ("perf_reset", "post", reverse("inventory:perf_reset"), None,
+             redirect(reverse("inventory:perf_dashboard"))),
+            ("perf_profile_download", "get",
+             reverse("inventory:perf_profile_download", args=[PROFILE_ID, "stacks"]), None,
+             (200, "text/plain", ("inventory/views.py:dashboard_view 3",))),
+            ("metrics", "get", reverse("inventory:metrics"), None,
+             (200, "text/plain; version=0.0.4", ("# TYPE stocker_http_request_duration_seconds histogram",))),
+        ]
+
+    def send(self, method, url, data):
+        if method == "json":
+            return self.client.post(url, json.dumps(data()), content_type="application/json")
+        return getattr(self.client, method)(url, data)
+
+    def check_response(self, name, response, expected):
+        status, content_type, markers = expected
+        self.assertEqual(response.status_code, status, name)
+        if status == 302:
+            self.assertTrue(response["Location"].startswith(markers), f"{name}: {response['Location']}")
+            return
+        self.assertTrue(response["Content-Type"].startswith(content_type), f"{name}: {response['Content-Type']}")
+        body = (b"".join(response.streaming_content) if response.streaming else response.content).decode()
+        for marker in markers:
+            self.assertIn(marker, body, name)
+
+    def count_queries(self, name, method, url, data, expected):
+        # One request first so one-off writes (today's rollup row, a deduped
+        # job) don't count, then measure with a cold cache: a cached page would
+        # hide the queries behind it. Streamed bodies are read inside the
+        # capture, since their queries run while streaming.
+        self.send(method, url, data)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send(method, url, data)
+            self.check_response(name, response, expected)
+        return len(queries)
+
+    def test_every_route_is_covered(self):
+        routes = {pattern.name for pattern in get_resolver("inventory.urls").url_patterns}
+        covered = {name for name, *_ in self.requests()}
+        self.assertEqual(routes - covered, set())
+
+    def test_query_count_is_independent_of_data_size(self):
+        small = {request[0]: self.count_queries(*request) for request in self.requests()}
+        seed(LARGE - SMALL, self.user, start=SMALL)
+        large = {request[0]: self.count_queries(*request) for request in self.requests()}
+
+        for name in small:
+            with self.subTest(view=name):
+                self.assertEqual(large[name], small[name], f"{name}: {small[name]} -> {large[name]} queries")
+
+
+
+class StockUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("staff", password="secret", is_staff=True)
+        cls.other = User.objects.create_user("other", password="secret", is_staff=True)
+        cls.product = Product.objects.create(name="Saline", quantity_in_stock=10, price=1)
+
+    def post_update(self, user, quantity, expected):
+        self.client.force_login(user)
+        return self.client.post(reverse("inventory:stock_update_view", args=[self.product.pk]), {
+            "movement_type": "IN", "quantity": quantity, "reason": "count", "expected_quantity": expected,
+        })
+
+    def test_form_carries_the_quantity_it_was_rendered_with(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("inventory:stock_update_view", args=[self.product.pk]))
+        self.assertContains(response, 'name="expected_quantity" value="10"')
+
+    def test_update_from_a_current_form_is_saved_with_its_ledger_entry(self):
+        response = self.post_update(self.user, 25, expected=10)
+
+        self.assertRedirects(response, reverse("inventory:stock_status_view"))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_in_stock, 25)
+        movement = StockMovement.objects.get(product=self.product)
+        self.assertEqual((movement.previous_quantity, movement.new_quantity, movement.quantity_change), (10, 25, 15))
+
+    def test_update_from_a_stale_form_is_refused(self):
+        # Both opened the form at 10; the second save must not overwrite the first.
+        self.post_update(self.user, 25, expected=10)
+        response = self.post_update(self.other, 40, expected=10)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "changed from 10 to 25")
+        self.assertContains(response, 'name="expected_quantity" value="25"')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity_in_stock, 25)
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 1)
+
+    def test_delta_applies_to_the_stored_quantity_not_the_instance(self):
+        Product.objects.filter(pk=self.product.pk).update(quantity_in_stock=30)
+
+        movement = change_stock(self.product, "OUT", delta=-5)
+
+        self.assertEqual((movement.previous_quantity, movement.new_quantity), (30, 25))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity_in_stock, 25)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_a_failing_inline_alert_does_not_fail_the_saved_update(self):
+        with mock.patch("inventory.utils.check_and_send_inventory_alerts", side_effect=SMTPException("down")), \
+                self.assertLogs("inventory.jobs", "ERROR"):
+            response = self.post_update(self.user, 25, expected=10)
+
+        self.assertRedirects(response, reverse("inventory:stock_status_view"))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity_in_stock, 25)
+
+    def test_stock_cannot_go_below_zero(self):
+        with self.assertRaises(StockUpdateError):
+            change_stock(self.product, "OUT", delta=-11)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity_in_stock, 10)
+        self.assertFalse(StockMovement.objects.exists())
+
+
+
+class ProductSearchPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("staff", password="secret", is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def page(self, **params):
+        response = self.client.get(reverse("inventory:products_list_view"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["products"]
+
+    def test_search_results_keep_relevance_order(self):
+        strong = Product.objects.create(name="Zinc", description="Zinc sulfate, zinc tablets", price=1)
+        Product.objects.create(name="Multivitamin", price=1,
+                               description="Vitamins A, B6, B12, C, D and E with iron, magnesium and a little zinc")
+
+        # The weaker match is newer, so a created_at order would put it first.
+        self.assertEqual(self.page(search="zinc").object_list[0], strong)
+
+    def test_search_finds_text_inside_a_word(self):
+        Product.objects.create(name="Paracetamol 500mg", price=1)
+
+        self.assertEqual([p.name for p in self.page(search="cetamol")], ["Paracetamol 500mg"])
+        self.assertEqual([p.name for p in self.page(search="parac")], ["Paracetamol 500mg"])
+
+    def test_indexed_search_matches_the_same_rows_as_icontains(self):
+        Product.objects.bulk_create([
+            Product(name="Paracetamol 500mg", description="Pain relief", price=1),
+            Product(name="Zinc Syrup", description='Sugar free "kids" formula, 100% zinc', price=1),
+            Product(name="Ibuprofen", description="Zinc-free tablets", price=1),
+        ])
+        queries = ["cetamol", "zinc", "zinc syrup", "SYRUP", "in", '"kids"', "100%", "free t", "nothing"]
+
+        indexed = {q: sorted(p.name for p in search_products(Product.objects.all(), q)) for q in queries}
+        with mock.patch("inventory.search._sqlite_fts_available", return_value=False):
+            fallback = {q: sorted(p.name for p in search_products(Product.objects.all(), q)) for q in queries}
+
+        self.assertEqual(indexed, fallback)
+        self.assertEqual(indexed["zinc"], ["Ibuprofen", "Zinc Syrup"])
+        self.assertEqual(indexed["free t"], ["Ibuprofen"])
+
+    def test_search_pages_cover_every_match_once(self):
+        Product.objects.bulk_create([Product(name=f"Zinc {i}", price=1) for i in range(10)])
+
+        first = self.page(search="zinc")
+        self.assertTrue(first.has_next)
+        self.assertIn("page=2", first.next_query)
+        second = self.page(search="zinc", page=2)
+        self.assertFalse(second.has_next)
+
+        names = [p.name for p in first] + [p.name for p in second]
+        self.assertEqual(sorted(names), sorted(f"Zinc {i}" for i in range(10)))
+
+    def test_plan_rows_reads_every_explain_json_shape(self):
+        plan = {"Plan": {"Node Type": "Seq Scan", "Plan Rows": 42}}
+        for shape in (plan, [plan], json.dumps(plan), json.dumps([plan])):
+            with self.subTest(shape=type(shape).__name__):
+                self.assertEqual(plan_rows(shape), 42)
+
+    @skipUnless(connection.vendor == "postgresql", "planner estimates are PostgreSQL only")
+    def test_estimate_count_on_postgresql(self):
+        Product.objects.bulk_create([Product(name=f"Zinc {i}", price=1) for i in range(5)])
+        self.assertIsInstance(estimate_count(Product.objects.all()), int)
+
+
+
+class ReportJobModeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("staff", password="secret", is_staff=True)
+        Product.objects.create(name="Saline", quantity_in_stock=5, price=1)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        reports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(reports_dir.cleanup)
+        self.enterContext(override_settings(REPORTS_CACHE_DIR=reports_dir.name))
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_without_a_worker_the_pdf_is_rendered_in_the_request(self):
+        response = self.client.get(reverse("inventory:inventory_reports_pdf"))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/download/", response["Location"])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_with_a_worker_the_pdf_is_queued_until_it_runs(self):
+        response = self.client.get(reverse("inventory:inventory_reports_pdf"))
+        key = response["Location"].rstrip("/").rsplit("/", 1)[1]
+
+        self.assertEqual(report_status(key), "pending")
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(report_status(key), "ready")
+
+    def test_data_version_changes_with_stock_without_querying(self):
+        with self.assertNumQueries(0):
+            version = data_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            change_stock(Product.objects.get(), "IN", delta=1)
+        self.assertNotEqual(data_version(), version)
+
+
+
+class UnreadCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("staff", password="secret", is_staff=True)
+
+    def test_count_follows_notifications_without_a_shared_cache(self):
+        # With locmem, the job worker's writes never reach the web process's
+        # cache, so the count must come from the database.
+        self.assertEqual(unread_count(self.user), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_users([self.user, self.user], "Low Stock Alert", "2 products dropped to low stock.")
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_count(self.user), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_all_read(self.user)
+        self.assertEqual(unread_count(self.user), 0)
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+
+    def test_shared_cache_is_dropped_when_the_count_changes(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir.name,
+        }}))
+
+        self.assertEqual(unread_count(self.user), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.user), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_users([self.user], "Expired Products Alert", "1 products have expired.")
+        self.assertEqual(unread_count(self.user), 1)
+
+    def test_recount_after_bulk_inserts(self):
+        Notification.objects.bulk_create([Notification(user=self.user, title="Notice", message="x") for _ in range(3)])
+        recount_unread([self.user.pk])
+        self.assertEqual(unread_count(self.user), 3)
+        recount_unread([self.user.pk])
+        self.assertEqual(unread_count(self.user), 3)
+
+    def test_notifications_changed_elsewhere_keep_the_count_right(self):
+        other = User.objects.create_user("other", password="secret")
+        notify_users([self.user, self.user], "Low Stock Alert", "2 products dropped to low stock.")
+        first, second = Notification.objects.filter(user=self.user)
+
+        first.delete()
+        self.assertEqual(unread_count(self.user), 1)
+        second.user = other
+        second.save()
+        self.assertEqual((unread_count(self.user), unread_count(other)), (0, 1))
+
+        # Bulk updates send no signals; the worker's daily full recount fixes them.
+        Notification.objects.filter(user=other).update(is_read=True)
+        Notification.objects.create(user=self.user, title="Notice", message="x")
+        recount_unread()
+        self.assertEqual((unread_count(self.user), unread_count(other)), (1, 0))
+
+
+
+class CachedDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("staff", password="secret", is_staff=True)
+        Product.objects.bulk_create([
+            Product(name=f"Product {i}", quantity_in_stock=1 + i % 90, price=1)
+            for i in range(DASHBOARD_LOW_STOCK_ROWS + 10)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_values_hold_no_model_instances(self):
+        values = [get_dashboard_data(), get_cached_supplier_report()]
+        get_inventory_report(status="low")
+        report = cache.get(make_key(INVENTORY, "inventory_report", None, "low", "", timezone.localdate()))
+        self.assertEqual(len(report["low_stock_products"]), DASHBOARD_LOW_STOCK_ROWS + 10)
+        values.append(report)
+
+        def plain(value):
+            if isinstance(value, dict):
+                return all(plain(v) for v in value.values())
+            if isinstance(value, (list, tuple)):
+                return all(plain(v) for v in value)
+            return value is None or isinstance(value, (int, str, float))
+
+        self.assertTrue(all(plain(value) for value in values))
+
+    def test_dashboard_lists_the_lowest_stock_first_with_the_full_count(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("inventory:dashboard_view"))
+
+        self.assertEqual(response.context["low_stock_count"], DASHBOARD_LOW_STOCK_ROWS + 10)
+        shown = response.context["low_stock_products"]
+        self.assertEqual(len(shown), DASHBOARD_LOW_STOCK_ROWS)
+        self.assertEqual([p.quantity_in_stock for p in shown], sorted(p.quantity_in_stock for p in shown))
+        self.assertContains(response, f"(lowest {DASHBOARD_LOW_STOCK_ROWS} of {DASHBOARD_LOW_STOCK_ROWS + 10})")
+
+
+
+class MetricsServerTests(TestCase):
+    def scrape(self, server, token=None):
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}/metrics")
+        if token:
+            request.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def serve(self):
+        server = start_metrics_server(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    @override_settings(METRICS_TOKEN="")
+    def test_without_a_token_it_only_listens_on_loopback(self):
+        with self.assertRaises(ValueError):
+            start_metrics_server(0, "0.0.0.0")
+        self.assertEqual(self.serve().server_address[0], "127.0.0.1")
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_with_a_token_scrapes_must_send_it(self):
+        server = self.serve()
+        self.assertEqual(self.scrape(server), 401)
+        self.assertEqual(self.scrape(server, "wrong"), 401)
+        self.assertEqual(self.scrape(server, "s3cret"), 200)
+
+
+
+class StatCounterTests(TestCase):
+    def assertCountersMatchTables(self):
+        kept = counters.values()
+        self.assertEqual(kept, counters.recount())
+        return kept
+
+    def test_product_counters_follow_every_write_path(self):
+        saline = Product.objects.create(name="Saline", quantity_in_stock=150, price=1)
+        gauze = Product.objects.create(name="Gauze", quantity_in_stock=50, price=1)
+        Product.objects.bulk_create([Product(name="Swab", quantity_in_stock=0), Product(name="Tape", quantity_in_stock=5)])
+        change_stock(saline, "OUT", delta=-130)
+        gauze.quantity_in_stock = 0
+        gauze.save()
+        Product.objects.get(name="Tape").delete()
+        ProductImporter().run(io.BytesIO(f"sku,name,quantity\n{saline.sku},Saline,500\n,Syringe,3\n".encode()))
+
+        kept = self.assertCountersMatchTables()
+        self.assertEqual((kept["products"], kept["low_stock"], kept["out_of_stock"]), (4, 1, 2))
+
+    def test_expiry_counters_follow_the_alert_states(self):
+        product = Product.objects.create(name="Saline", quantity_in_stock=150, price=1,
+                                         expiry_date=timezone.localdate() - timedelta(days=1))
+        enqueue_inventory_alerts([product.pk])
+        self.assertEqual(counters.values()["expired"], 1)
+
+        product.delete()
+        self.assertEqual(self.assertCountersMatchTables()["expired"], 0)
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_job_counters_follow_the_queue(self):
+        enqueue("inventory_alerts")
+        self.assertEqual(counters.values()["jobs_pending"], 1)
+
+        with mock.patch("inventory.utils.check_and_send_inventory_alerts", side_effect=SMTPException("down")), \
+                self.assertLogs("inventory.jobs", "ERROR"):
+            run_pending_jobs()
+        # Failed on its first attempt and went back to pending for a retry.
+        kept = self.assertCountersMatchTables()
+        self.assertEqual((kept["jobs_pending"], kept["jobs_running"]), (1, 0))
+
+    def test_a_scrape_reads_the_counters_in_one_query(self):
+        Product.objects.create(name="Saline", quantity_in_stock=5, price=1)
+
+        with self.assertNumQueries(1):
+            body = render()
+
+        self.assertIn('stocker_products{state="low_stock"} 1', body)
+        self.assertIn('stocker_jobs{status="pending"} 0', body)
+
+
+
+class SnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Fluids")
+        cls.product = Product.objects.create(name="Saline", category=cls.category, quantity_in_stock=5, price=2)
+        Product.objects.create(name="Loose item", quantity_in_stock=1, price=1)
+
+    def test_taking_a_snapshot_twice_a_day_updates_it_in_place(self):
+        take_snapshot()
+        Product.objects.filter(pk=self.product.pk).update(quantity_in_stock=7)
+        take_snapshot()
+
+        today = InventorySnapshot.objects.filter(date=timezone.localdate())
+        self.assertEqual(today.count(), 2)
+        self.assertEqual(today.get(category=self.category).total_units, 7)
+        self.assertEqual(today.get(category=None).total_units, 1)
+
+    def test_one_row_per_category_and_day(self):
+        take_snapshot()
+        for category in (self.category, None):
+            with self.subTest(category=category), self.assertRaises(IntegrityError), transaction.atomic():
+                InventorySnapshot.objects.create(date=timezone.localdate(), category=category)
+
+    def test_deleting_categories_keeps_their_snapshots(self):
+        other = Category.objects.create(name="Dressings")
+        Product.objects.create(name="Gauze", category=other, quantity_in_stock=3, price=1)
+        take_snapshot()
+
+        self.client.force_login(User.objects.create_user("admin", password="secret", is_staff=True, is_superuser=True))
+        for category in (self.category, other):
+            response = self.client.post(reverse("inventory:delete_category", args=[category.pk]), follow=True)
+            self.assertContains(response, "Category deleted successfully.")
+
+        today = InventorySnapshot.objects.filter(date=timezone.localdate(), category=None)
+        self.assertEqual(sorted(today.values_list("category_name", flat=True)), ["", "Dressings", "Fluids"])
+        # The next snapshot counts the moved products as uncategorized and drops the old rows.
+        take_snapshot()
+        self.assertEqual(list(today.values_list("category_name", "total_products")), [("", 3)])
+
+
+
+class SyncPullTests(TransactionTestCase):
+    # Changes are numbered when their transaction commits, which TestCase never does.
+    def setUp(self):
+        self.user = User.objects.create_user("staff", password="secret", is_staff=True)
+        self.products = [Product.objects.create(name=f"Product {i}", quantity_in_stock=10, price=1) for i in range(5)]
+        self.client.force_login(self.user)
+
+    def pull(self, cursor=None, limit=None):
+        params = {key: value for key, value in (("cursor", cursor), ("limit", limit)) if value}
+        response = self.client.get(reverse("inventory:sync_pull_view"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def pull_all(self, cursor=None, limit=2):
+        products, deleted = [], []
+        while True:
+            page = self.pull(cursor, limit)
+            products += page["products"]
+            deleted += page["deleted"]
+            cursor = page["cursor"]
+            if not page["has_more"]:
+                return products, deleted, cursor
+
+    def test_pages_cover_every_product_once_and_then_nothing(self):
+        products, deleted, cursor = self.pull_all()
+
+        self.assertEqual(sorted(p["id"] for p in products), sorted(p.pk for p in self.products))
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.pull_all(cursor), ([], [], cursor))
+
+    def test_a_change_committed_late_is_not_skipped(self):
+        _, _, cursor = self.pull_all()
+        # A transaction that wrote before the last pull but committed after
+        # it: its updated_at is older than everything the client has seen.
+        with transaction.atomic():
+            change_stock(self.products[0], "ADJUST", new_quantity=3)
+            Product.objects.filter(pk=self.products[0].pk).update(updated_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(self.pull_all(cursor), ([], [], cursor))
+
+        products, _, _ = self.pull_all(cursor)
+        self.assertEqual([(p["id"], p["quantity_in_stock"]) for p in products], [(self.products[0].pk, 3)])
+
+    def test_uncommitted_changes_stay_out_of_the_feed_and_pulls_only_read(self):
+        _, _, cursor = self.pull_all()
+        Product.objects.filter(pk=self.products[0].pk).update(quantity_in_stock=3, change_seq=None)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.pull_all(cursor)[:2], ([], []))
+        self.assertTrue(all(q["sql"].lstrip().upper().startswith("SELECT") for q in queries
+                            if "django_session" not in q["sql"] and "auth_user" not in q["sql"]))
+
+        number_changes()
+        self.assertEqual([p["id"] for p in self.pull_all(cursor)[0]], [self.products[0].pk])
+
+    def test_deleted_products_are_reported(self):
+        _, _, cursor = self.pull_all()
+        product = Product.objects.get(pk=self.products[1].pk)
+        pk, sku = product.pk, product.sku
+        product.delete()
+
+        products, deleted, _ = self.pull_all(cursor)
+        self.assertEqual(products, [])
+        self.assertEqual([(d["id"], d["sku"]) for d in deleted], [(pk, sku)])
+
+    def test_stock_changes_move_a_product_to_the_end_of_the_feed(self):
+        _, _, cursor = self.pull_all()
+        change_stock(self.products[2], "IN", delta=5)
+
+        products, _, _ = self.pull_all(cursor)
+        self.assertEqual([(p["id"], p["quantity_in_stock"]) for p in products], [(self.products[2].pk, 15)])
+
+    def test_unreadable_cursor_is_refused(self):
+        response = self.client.get(reverse("inventory:sync_pull_view"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+
+@override_settings(JOBS_RUN_INLINE=True)
+class InventoryAlertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user("manager", "manager@example.com", "secret", is_staff=True)
+        cls.product = Product.objects.create(name="Saline", quantity_in_stock=150, price=1)
+        enqueue_inventory_alerts([cls.product.pk])
+
+    def set_stock(self, quantity):
+        Product.objects.filter(pk=self.product.pk).update(quantity_in_stock=quantity)
+        mail.outbox.clear()
+        enqueue_inventory_alerts([self.product.pk])
+        return [message.subject for message in mail.outbox]
+
+    def test_low_stock_is_alerted_once_per_transition(self):
+        self.assertEqual(self.set_stock(40), ["Low Stock Alert - 1 products"])
+        self.assertEqual(Notification.objects.filter(user=self.manager, type="low_stock").count(), 1)
+        # Still low: nothing new.
+        self.assertEqual(self.set_stock(30), [])
+        # Back to normal, then low again: a new alert.
+        self.assertEqual(self.set_stock(200), [])
+        self.assertEqual(self.set_stock(20), ["Low Stock Alert - 1 products"])
+
+    def test_expiry_sweep_alerts_products_that_expired_without_a_save(self):
+        Product.objects.filter(pk=self.product.pk).update(expiry_date=timezone.localdate() - timedelta(days=1))
+        mail.outbox.clear()
+
+        check_and_send_inventory_alerts(sweep_expiry=True)
+        check_and_send_inventory_alerts(sweep_expiry=True)
+
+        self.assertEqual([message.subject for message in mail.outbox], ["Expired Products Alert - 1 products"])
+        self.assertEqual(ProductAlertState.objects.get(product=self.product).expiry_status, "expired")
+
+    def test_bulk_created_products_reach_the_sweep(self):
+        Product.objects.bulk_create([
+            Product(name="Gauze", quantity_in_stock=5, price=1),
+            Product(name="Iodine", quantity_in_stock=500, price=1, expiry_date=timezone.localdate() - timedelta(days=1)),
+        ])
+        mail.outbox.clear()
+
+        check_and_send_inventory_alerts(sweep_expiry=True)
+
+        self.assertEqual(sorted(message.subject for message in mail.outbox),
+                         ["Expired Products Alert - 1 products", "Low Stock Alert - 1 products"])
+        self.assertEqual(ProductAlertState.objects.count(), 3)
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_with_a_worker_a_burst_of_changes_is_one_job(self):
+        Product.objects.filter(pk=self.product.pk).update(quantity_in_stock=40)
+        mail.outbox.clear()
+        for _ in range(3):
+            enqueue_inventory_alerts([self.product.pk])
+
+        self.assertEqual(Job.objects.filter(name="inventory_alerts", status="pending").count(), 1)
+        self.assertEqual(mail.outbox, [])
+        Job.objects.update(run_after=timezone.now())
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual([message.subject for message in mail.outbox], ["Low Stock Alert - 1 products"])
+
+
+
+class ProductImporterTests(TestCase):
+    HEADER = "sku,name,category,suppliers,quantity,expiry_date,batch_number,price\n"
+
+    def run_import(self, rows, update_existing=True):
+        return ProductImporter(update_existing=update_existing).run(io.BytesIO((self.HEADER + rows).encode()))
+
+    def test_rows_are_created_then_updated_by_sku_or_name_and_batch(self):
+        report = self.run_import(
+            ",Saline,Fluids,Acme,10,2030-01-31,B1,2.50\n"
+            ",Gauze,Dressings,\"Acme, Medline\",5,,,1\n"
+        )
+        self.assertEqual((report["created"], report["updated"], report["errors"]), (2, 0, []))
+        gauze = Product.objects.get(name="Gauze")
+        self.assertEqual(gauze.suppliers.count(), 2)
+        self.assertTrue(gauze.sku)
+
+        report = self.run_import(
+            f"{gauze.sku},Gauze,Dressings,Acme,8,,,1\n"
+            ",Saline,Fluids,Acme,12,2030-01-31,B1,2.50\n"
+            ",Saline,Fluids,Acme,3,2031-01-31,B2,2.50\n"
+        )
+        self.assertEqual((report["created"], report["updated"]), (1, 2))
+        self.assertEqual(Product.objects.get(pk=gauze.pk).quantity_in_stock, 8)
+        self.assertEqual(Product.objects.get(name="Saline", batch_number="B1").quantity_in_stock, 12)
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_quantity_changes_are_recorded_in_the_ledger(self):
+        self.run_import(",Saline,,,10,,B1,2\n")
+        product = Product.objects.get(name="Saline")
+
+        self.run_import(f"{product.sku},Saline,,,4,,B1,2\n")
+
+        movement = StockMovement.objects.get(product=product)
+        self.assertEqual((movement.movement_type, movement.previous_quantity, movement.new_quantity), ("ADJUST", 10, 4))
+        rollup = product.daily_rollups.get()
+        self.assertEqual((rollup.opening_quantity, rollup.closing_quantity, rollup.adjust_quantity), (10, 4, -6))
+
+    def test_columns_missing_from_the_file_are_left_alone(self):
+        self.run_import(",Saline,Fluids,,10,2030-01-31,B1,2.50\n")
+        product = Product.objects.get(name="Saline")
+
+        report = ProductImporter().run(io.BytesIO(f"sku,name,price\n{product.sku},Saline,3\n".encode()))
+
+        self.assertEqual(report["updated"], 1)
+        product.refresh_from_db()
+        self.assertEqual((product.quantity_in_stock, product.batch_number), (10, "B1"))
+        self.assertEqual(str(product.expiry_date), "2030-01-31")
+        self.assertEqual((product.category.name, product.price), ("Fluids", 3))
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_new_products_keep_the_sku_from_the_file(self):
+        self.run_import("ext-1,Saline,,,10,,,\n,Gauze,,,1,,,\n")
+        self.assertEqual(Product.objects.get(name="Saline").sku, "ext-1")
+        self.assertTrue(Product.objects.get(name="Gauze").sku.startswith("MED-"))
+
+        report = self.run_import("ext-1,Saline copy,,,1,,,\n", update_existing=False)
+        self.assertEqual(report["errors"], [(2, "SKU 'ext-1' already exists.")])
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_invalid_rows_are_reported_with_their_line_and_skipped(self):
+        report = self.run_import(
+            ",Saline,,,10,,,\n"
+            ",,,,1,,,\n"
+            ",Gauze,,,-1,,,\n"
+            ",Syringe,,,x,,,\n"
+            ",Swab,,,1,31/01/2030,,\n"
+        )
+
+        self.assertEqual(report["created"], 1)
+        self.assertEqual([line for line, _ in report["errors"]], [3, 4, 5, 6])
+        self.assertEqual(report["errors"][0][1], "Name is required.")
+        self.assertIn("Invalid quantity 'x'", report["errors"][2][1])
+        self.assertEqual(list(Product.objects.values_list("name", flat=True)), ["Saline"])
+
+    def test_import_page_shows_the_error_report(self):
+        self.client.force_login(User.objects.create_user("staff", password="secret", is_staff=True))
+        upload = SimpleUploadedFile("products.csv", (self.HEADER + ",,,,1,,,\n").encode(), content_type="text/csv")
+
+        response = self.client.post(reverse("inventory:import_products_csv_view"), {"file": upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "0 created, 0 updated, 1 skipped.")
+        self.assertContains(response, "Name is required.")
+
+
+
+class SkuAllocationTests(TestCase):
+    def test_bulk_create_gives_each_product_a_new_sku_with_constant_queries(self):
+        def create(n):
+            with CaptureQueriesContext(connection) as queries:
+                products = Product.objects.bulk_create([Product(name=f"Product {i}", price=1) for i in range(n)])
+            return products, len(queries)
+
+        few, few_queries = create(2)
+        many, many_queries = create(40)
+
+        skus = [p.sku for p in few + many]
+        self.assertEqual(len(set(skus)), 42)
+        self.assertEqual(skus, [format_sku(n) for n in range(1, 43)])
+        self.assertEqual(many_queries, few_queries)
+
+    def test_save_assigns_a_sku_only_to_new_products(self):
+        product = Product.objects.create(name="Saline", price=1)
+        sku = product.sku
+        product.name = "Saline 0.9%"
+        product.save()
+
+        self.assertTrue(sku.startswith("MED-"))
+        self.assertEqual(Product.objects.get(pk=product.pk).sku, sku)
+
+    @skipIf(connection.vendor == "postgresql", "PostgreSQL sequences don't roll back")
+    def test_a_rolled_back_block_is_handed_out_again(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            allocate_skus(5)
+            raise RuntimeError
+        self.assertEqual(allocate_skus(1), [format_sku(1)])
+
+
+
+class SyncPushTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("staff", password="secret", is_staff=True)
+        cls.product = Product.objects.create(name="Saline", quantity_in_stock=10, price=1)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def push(self, *movements):
+        response = self.client.post(reverse("inventory:sync_push_view"), json.dumps({"movements": list(movements)}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return [(r["key"], r["status"]) for r in response.json()["results"]]
+
+    def stock(self):
+        return Product.objects.get(pk=self.product.pk).quantity_in_stock
+
+    def test_a_resent_batch_is_applied_once(self):
+        batch = [
+            {"key": "a", "sku": self.product.sku, "type": "IN", "quantity": 5},
+            {"key": "b", "product_id": self.product.pk, "type": "OUT", "quantity": 2},
+        ]
+        self.assertEqual(self.push(*batch), [("a", "applied"), ("b", "applied")])
+        self.assertEqual(self.push(*batch), [("a", "duplicate"), ("b", "duplicate")])
+
+        self.assertEqual(self.stock(), 13)
+        self.assertEqual(StockMovement.objects.filter(client_key__in=["a", "b"]).count(), 2)
+
+    def test_bad_entries_are_reported_without_stopping_the_batch(self):
+        results = self.push(
+            {"key": "a", "product_id": self.product.pk, "type": "OUT", "quantity": 50},
+            {"key": "b", "product_id": 999999, "type": "IN", "quantity": 1},
+            {"key": "c", "product_id": self.product.pk, "type": "MOVE", "quantity": 1},
+            {"key": "d", "product_id": self.product.pk, "type": "ADJUST", "quantity": 7},
+        )
+
+        self.assertEqual(results, [("a", "error"), ("b", "error"), ("c", "error"), ("d", "applied")])
+        self.assertEqual(self.stock(), 7)
@@ -17,6 +17,7 @@ urlpatterns = [
 
     # Dashboard
     path('', views.dashboard_view, name='dashboard_view'),
+    path('api/dashboard/', views.dashboard_data_view, name='dashboard_data_view'),
 
     # Product URLs
     path("products/", views.products_list_view, name="products_list_view"),
@@ -47,6 +48,10 @@ urlpatterns = [
     path('stock_update/<int:product_id>/', views.stock_update_view, name='stock_update_view'),
     path('movements/', views.stock_movements_view, name='stock_movements_view'),
     path('products/<int:product_id>/movements/', views.product_movements_view, name='product_movements_view'),
+
+    # Sync API
+    path('api/sync/push/', views.sync_push_view, name='sync_push_view'),
+    path('api/sync/pull/', views.sync_pull_view, name='sync_pull_view'),
     
     # Reports URLs
     path("reports/", views.reports_home_view, name="reports_home"),
@@ -54,5 +59,13 @@ urlpatterns = [
     path("reports/inventory/pdf/", views.inventory_reports_pdf_view, name="inventory_reports_pdf"),
     path("reports/suppliers/", views.supplier_reports_view, name="supplier_reports_view"),
     path("reports/suppliers/pdf/", views.supplier_reports_pdf_view, name="supplier_reports_pdf"),
+    path("reports/pdf/<str:key>/", views.report_status_view, name="report_status"),
+    path("reports/pdf/<str:key>/download/", views.report_download_view, name="report_download"),
+
+    # Performance
+    path("perf/", views.perf_dashboard_view, name="perf_dashboard"),
+    path("perf/reset/", views.perf_reset_view, name="perf_reset"),
+    path("perf/profiles/<str:profile_id>/<str:kind>/", views.perf_profile_download_view, name="perf_profile_download"),
+    path("metrics/", views.metrics_view, name="metrics"),
     
 ]
@@ -1,131 +1,399 @@
+import hashlib
+import json
+import logging
+from collections import Counter
 from datetime import timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
 from django.utils import timezone
-from .models import Product, Supplier, Notification
-from django.core.mail import send_mail
+from .models import Product, Supplier, Category, ProductAlertState
+from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Aggregate, CharField, Count, Q
+from . import counters
+from .jobs import enqueue
+from .cache import cached, INVENTORY, CATALOG
+from .notifications import notify_users
+from .metrics import EMAIL_SEND_SECONDS
+from .logs import current_request_id, REQUEST_ID_HEADER
 
 
+logger = logging.getLogger(__name__)
+
 LOW_STOCK_THRESHOLD = 100
 NEAR_EXPIRY_DAYS = 30
+ALERTS_COALESCE_SECONDS = 5
+DASHBOARD_LOW_STOCK_ROWS = 50
 
 
 
-def get_stock_stats():
-    today = timezone.localdate()
+class GroupConcat(Aggregate):
+    """Comma separated values in one column: GROUP_CONCAT on SQLite, STRING_AGG on PostgreSQL."""
+    function = "GROUP_CONCAT"
+    template = "%(function)s(%(expressions)s, ', ')"
+    output_field = CharField()
 
-    out_of_stock_qs = Product.objects.filter(quantity_in_stock=0)
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function="STRING_AGG", **extra_context)
 
-    low_stock_qs = Product.objects.filter(
-        quantity_in_stock__lt=LOW_STOCK_THRESHOLD,
-        quantity_in_stock__gt=0
-    )
 
-    expired_qs = Product.objects.filter(
-        expiry_date__isnull=False,
-        expiry_date__lt=today
+
+def low_stock_q(prefix=""):
+    return Q(**{
+        f"{prefix}quantity_in_stock__lt": LOW_STOCK_THRESHOLD,
+        f"{prefix}quantity_in_stock__gt": 0,
+    })
+
+
+def expired_q(today, prefix=""):
+    return Q(**{
+        f"{prefix}expiry_date__isnull": False,
+        f"{prefix}expiry_date__lt": today,
+    })
+
+
+def near_expiry_q(today, prefix=""):
+    return Q(**{
+        f"{prefix}expiry_date__isnull": False,
+        f"{prefix}expiry_date__gte": today,
+        f"{prefix}expiry_date__lte": today + timedelta(days=NEAR_EXPIRY_DAYS),
+    })
+
+
+def status_q(status, today, prefix=""):
+    if status == "low":
+        return low_stock_q(prefix)
+    if status == "expired":
+        return expired_q(today, prefix)
+    if status == "near":
+        return near_expiry_q(today, prefix)
+    return Q()
+
+
+
+def compute_stock_stats():
+    """All stock buckets from a single conditional-aggregate query."""
+    today = timezone.localdate()
+
+    stats = Product.objects.aggregate(
+        total_products=Count("id"),
+        out_of_stock=Count("id", filter=Q(quantity_in_stock=0)),
+        low_stock=Count("id", filter=low_stock_q()),
+        expired=Count("id", filter=expired_q(today)),
+        near_expiry=Count("id", filter=near_expiry_q(today)),
     )
 
-    near_expiry_qs = Product.objects.filter(
-        expiry_date__isnull=False,
-        expiry_date__gte=today,
-        expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
+    stats["near_expiry_days"] = NEAR_EXPIRY_DAYS
+    stats["low_stock_threshold"] = LOW_STOCK_THRESHOLD
+    return stats
+
+
+
+def compute_supplier_stats():
+    """All supplier buckets from one query over the supplier -> product join."""
+    today = timezone.localdate()
+
+    stats = Supplier.objects.aggregate(
+        total_suppliers=Count("id", distinct=True),
+        total_supplied_products=Count("products", distinct=True),
+        suppliers_with_low_stock=Count("id", distinct=True, filter=low_stock_q("products__")),
+        suppliers_with_expired=Count("id", distinct=True, filter=expired_q(today, "products__")),
     )
 
-    return {
-    "total_products": Product.objects.count(),
-    "out_of_stock": out_of_stock_qs.count(),
-    "low_stock": low_stock_qs.count(),
-    "expired": expired_qs.count(),
-    "near_expiry": near_expiry_qs.count(),
-    "near_expiry_days": NEAR_EXPIRY_DAYS,
-    "low_stock_threshold": LOW_STOCK_THRESHOLD,  
-    }
+    stats["low_stock_threshold"] = LOW_STOCK_THRESHOLD
+    return stats
+
 
+def get_stock_stats():
+    # Keyed by day too: expiry buckets move at midnight without any save.
+    return cached(INVENTORY, "stock_stats", compute_stock_stats, timezone.localdate())
 
 
 def get_supplier_stats():
-    today = timezone.localdate()
-    suppliers = Supplier.objects.all()
+    return cached(INVENTORY, "supplier_stats", compute_supplier_stats, timezone.localdate())
 
-    total_suppliers = suppliers.count()
 
+def get_category_options():
+    """Categories for filter dropdowns."""
+    return cached(CATALOG, "category_options", lambda: list(Category.objects.only("id", "name")))
 
-    total_supplied_products = Product.objects.filter(suppliers__isnull=False).distinct().count()
 
-    suppliers_with_low_stock = suppliers.filter(
-        products__quantity_in_stock__lt=LOW_STOCK_THRESHOLD,
-        products__quantity_in_stock__gt=0
-    ).distinct().count()
+def get_supplier_options():
+    """Suppliers for filter dropdowns."""
+    return cached(CATALOG, "supplier_options", lambda: list(Supplier.objects.only("id", "name")))
 
-    suppliers_with_expired = suppliers.filter(
-        products__expiry_date__isnull=False,
-        products__expiry_date__lt=today
-    ).distinct().count()
 
-    return {
-        "total_suppliers": total_suppliers,
-        "total_supplied_products": total_supplied_products,
-        "suppliers_with_low_stock": suppliers_with_low_stock,
-        "suppliers_with_expired": suppliers_with_expired,
-        "low_stock_threshold": LOW_STOCK_THRESHOLD
-    }
+
+def stock_status_for(quantity):
+    if quantity == 0:
+        return "out"
+    if quantity < LOW_STOCK_THRESHOLD:
+        return "low"
+    return "ok"
+
+
+def expiry_status_for(expiry_date, today):
+    if expiry_date and expiry_date < today:
+        return "expired"
+    if expiry_date and expiry_date <= today + timedelta(days=NEAR_EXPIRY_DAYS):
+        return "near_expiry"
+    return "ok"
+
+
+
+def enqueue_inventory_alerts(product_ids):
+    """
+    Flag the given products for re-evaluation and schedule a deduplicated
+    alerts job instead of running it on the request path.
+    """
+    ProductAlertState.objects.bulk_create(
+        [ProductAlertState(product_id=pk, needs_check=True) for pk in product_ids],
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["needs_check"],
+        batch_size=1000,
+    )
+    return enqueue(
+        "inventory_alerts",
+        dedupe_key="inventory_alerts",
+        delay=ALERTS_COALESCE_SECONDS,
+    )
+
+
+def enqueue_expiry_sweep():
+    """Products can start expiring without being saved; the worker runs this periodically."""
+    return enqueue("inventory_alerts", {"sweep_expiry": True}, dedupe_key="inventory_alerts_sweep")
+
+
+
+def flag_expiry_transitions(today):
+    """Flag products whose expiry status changed just because the date moved on."""
+    return ProductAlertState.objects.filter(
+        Q(product__expiry_date__lt=today) & ~Q(expiry_status="expired")
+        | near_expiry_q(today, "product__") & Q(expiry_status="ok")
+    ).update(needs_check=True)
 
 
-   
-def check_and_send_inventory_alerts():
+
+def check_and_send_inventory_alerts(sweep_expiry=False):
+    """
+    Re-evaluate only the flagged products and alert on status transitions:
+    a product is reported once when it becomes low stock or expired, not on
+    every check while it stays that way.
+    """
     today = timezone.localdate()
 
-    managers = User.objects.filter(is_staff=True)
-    managers_emails = managers.values_list('email', flat=True)
+    if sweep_expiry:
+        flag_expiry_transitions(today)
 
-    if not managers_emails:
+    flagged_ids = list(ProductAlertState.objects.filter(needs_check=True).values_list("product_id", flat=True))
+    if not flagged_ids:
         return
 
+    # Clear the flags before reading the products, so a save that lands
+    # while we evaluate flags the product again for the next job.
+    ProductAlertState.objects.filter(product_id__in=flagged_ids).update(needs_check=False)
 
-    low_stock_products = Product.objects.filter(
-        quantity_in_stock__lt=LOW_STOCK_THRESHOLD,
-        quantity_in_stock__gt=0
-    )
-    if low_stock_products.exists():
-        subject = f"Low Stock Alert - {low_stock_products.count()} products"
+    states = ProductAlertState.objects.filter(product_id__in=flagged_ids).select_related("product")
+
+    newly_low, newly_expired, changed = [], [], []
+    counter_deltas = Counter()
+    for state in states:
+        product = state.product
+        stock_status = stock_status_for(product.quantity_in_stock)
+        expiry_status = expiry_status_for(product.expiry_date, today)
+
+        if stock_status == "low" and state.stock_status != "low":
+            newly_low.append(product)
+        if expiry_status == "expired" and state.expiry_status != "expired":
+            newly_expired.append(product)
+
+        if (stock_status, expiry_status) != (state.stock_status, state.expiry_status):
+            counter_deltas.update(counters.status_deltas(counters.EXPIRY_COUNTERS, state.expiry_status, expiry_status))
+            state.stock_status = stock_status
+            state.expiry_status = expiry_status
+            changed.append(state)
+
+    try:
+        send_inventory_alerts(newly_low, newly_expired, today)
+    except Exception:
+        # Leave the old statuses in place and re-flag, so the job retry sends these alerts again.
+        ProductAlertState.objects.filter(product_id__in=flagged_ids).update(needs_check=True)
+        raise
+
+    with transaction.atomic():
+        ProductAlertState.objects.bulk_update(changed, ["stock_status", "expiry_status"], batch_size=1000)
+        counters.add(counter_deltas)
+
+
+
+def send_alert_email(kind, subject, html_message, recipients):
+    """Send one alert email, tagged with the request id the alert was raised under."""
+    request_id = current_request_id()
+    message = EmailMultiAlternatives(subject, "", settings.DEFAULT_FROM_EMAIL, recipients,
+                                     headers={REQUEST_ID_HEADER: request_id} if request_id else None)
+    message.attach_alternative(html_message, "text/html")
+    with EMAIL_SEND_SECONDS.time(kind=kind):
+        message.send(fail_silently=False)
+    logger.info(f"Sent {kind} alert email '{subject}' to {len(recipients)} recipients")
+
+
+def send_inventory_alerts(newly_low, newly_expired, today):
+    if not newly_low and not newly_expired:
+        return
+
+    managers = list(User.objects.filter(is_staff=True))
+    managers_emails = [m.email for m in managers if m.email]
+
+    if not managers_emails:
+        return
+
+    if newly_low:
+        subject = f"Low Stock Alert - {len(newly_low)} products"
         html_message = render_to_string('emails/low_stock.html', {
-            'products': low_stock_products,
+            'products': newly_low,
             'date': today
         })
-        send_mail(subject, "", settings.DEFAULT_FROM_EMAIL, list(managers_emails),
-                  html_message=html_message, fail_silently=False)
-
- 
-        for manager in managers:
-            Notification.objects.create(
-                title="Low Stock Alert",
-                message=f"There are {low_stock_products.count()} products with low stock.",
-                type="low_stock",
-                user=manager
-            )
-
-
-    expired_products = Product.objects.filter(
-        expiry_date__isnull=False,
-        expiry_date__lt=today
-    )
-    if expired_products.exists():
-        subject = f"Expired Products Alert - {expired_products.count()} products"
+        send_alert_email("low_stock", subject, html_message, managers_emails)
+
+        notify_users(managers, "Low Stock Alert", f"{len(newly_low)} products dropped to low stock.", type="low_stock")
+
+    if newly_expired:
+        subject = f"Expired Products Alert - {len(newly_expired)} products"
         html_message = render_to_string('emails/expired_products.html', {
-            'products': expired_products,
+            'products': newly_expired,
             'date': today
         })
-        send_mail(subject, "", settings.DEFAULT_FROM_EMAIL, list(managers_emails),
-                  html_message=html_message, fail_silently=False)
-
-
-        for manager in managers:
-            Notification.objects.create(
-                title="Expired Products Alert",
-                message=f"There are {expired_products.count()} expired products.",
-                type="expired",
-                user=manager
-            )        
-        
+        send_alert_email("expired", subject, html_message, managers_emails)
+
+        notify_users(managers, "Expired Products Alert", f"{len(newly_expired)} products have expired.", type="expired")
+
+
+
+def get_supplier_report(search_query="", status=None):
+    """
+    Every supplier with its total/low/expired/near-expiry product counts,
+    annotated in a single query. ``status`` narrows the products counted
+    the same way the report filters do.
+    """
+    today = timezone.localdate()
+    base = status_q(status, today, "products__")
+
+    suppliers = Supplier.objects.all()
+    if search_query:
+        suppliers = suppliers.filter(name__icontains=search_query)
+
+    return suppliers.annotate(
+        total_products=Count("products", distinct=True, filter=base),
+        low_stock_count=Count("products", distinct=True, filter=base & low_stock_q("products__")),
+        expired_count=Count("products", distinct=True, filter=base & expired_q(today, "products__")),
+        near_expiry_count=Count("products", distinct=True, filter=base & near_expiry_q(today, "products__")),
+    ).order_by("name")
+
+
+
+def inventory_report_querysets(category_id=None, status=None, search_query=""):
+    today = timezone.localdate()
+    products = Product.objects.select_related("category").filter(status_q(status, today))
+    if category_id and str(category_id).isdigit():
+        products = products.filter(category_id=category_id)
+    if search_query:
+        products = products.filter(name__icontains=search_query)
+    return {
+        "low_stock_products": products.filter(low_stock_q()),
+        "expired_products": products.filter(expired_q(today)),
+        "near_expiry_products": products.filter(near_expiry_q(today)),
+    }
+
+
+def products_by_ids(ids):
+    """The products for a cached list of ids, in that order; ids deleted since are skipped."""
+    products = Product.objects.select_related("category").in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
+
+
+def get_inventory_report(category_id=None, status=None, search_query=""):
+    """
+    Low stock, expired and near-expiry products for the inventory report. The
+    ids are cached per filter set, and the rows are loaded in one query.
+    """
+    def compute():
+        querysets = inventory_report_querysets(category_id, status, search_query)
+        return {name: list(queryset.values_list("id", flat=True)) for name, queryset in querysets.items()}
+
+    ids = cached(INVENTORY, "inventory_report", compute,
+                 category_id, status, search_query, timezone.localdate())
+    products = Product.objects.select_related("category").in_bulk({pk for section in ids.values() for pk in section})
+    return {name: [products[pk] for pk in section if pk in products] for name, section in ids.items()}
+
+
+
+def get_cached_supplier_report(search_query="", status=None):
+    """Per-supplier counts as plain rows, so the cache holds numbers rather than model instances."""
+    def compute():
+        return list(get_supplier_report(search_query, status).values(
+            "id", "name", "total_products", "low_stock_count", "expired_count", "near_expiry_count"))
+
+    return cached(INVENTORY, "supplier_report", compute, search_query, status, timezone.localdate())
+
+
+
+def get_dashboard_data():
+    def compute():
+        category_data = list(Category.objects.annotate(total=Count("products")).values_list("name", "total"))
+        low_stock = Product.objects.filter(low_stock_q())
+        return {
+            # The most urgent ones; the count covers the rest.
+            "low_stock_ids": list(low_stock.order_by("quantity_in_stock", "id")
+                                  .values_list("id", flat=True)[:DASHBOARD_LOW_STOCK_ROWS]),
+            "low_stock_count": low_stock.count(),
+            "category_labels": [name for name, _ in category_data],
+            "category_counts": [total for _, total in category_data],
+            "categories_count": len(category_data),
+            "in_stock": Product.objects.filter(quantity_in_stock__gte=LOW_STOCK_THRESHOLD).count(),
+        }
+
+    return cached(INVENTORY, "dashboard", compute)
+
+
+
+def get_dashboard_payload():
+    """
+    Dashboard datasets as a JSON body plus a strong ETag (a hash of that body).
+    Both are cached under the inventory version, so a poll with an unchanged
+    ETag is answered without touching the products table.
+    """
+    def compute():
+        stock_stats = get_stock_stats()
+        dashboard = get_dashboard_data()
+        payload = {
+            "counts": {
+                "products": stock_stats["total_products"],
+                "categories": dashboard["categories_count"],
+                "suppliers": get_supplier_stats()["total_suppliers"],
+                "low_stock": dashboard["low_stock_count"],
+            },
+            "categories": {"labels": dashboard["category_labels"], "counts": dashboard["category_counts"]},
+            "stock_status": {
+                "labels": ["In Stock", "Low Stock", "Expired"],
+                "counts": [dashboard["in_stock"], stock_stats["low_stock"], stock_stats["expired"]],
+            },
+            "low_stock": [
+                {
+                    "id": p.pk,
+                    "sku": p.sku,
+                    "name": p.name,
+                    "category": p.category.name if p.category else None,
+                    "quantity_in_stock": p.quantity_in_stock,
+                    "restock_url": reverse("inventory:stock_update_view", args=[p.pk]),
+                }
+                for p in products_by_ids(dashboard["low_stock_ids"])
+            ],
+        }
+        body = json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True)
+        return {"body": body, "etag": hashlib.sha1(body.encode()).hexdigest()}
+
+    return cached(INVENTORY, "dashboard_payload", compute, timezone.localdate())
@@ -1,19 +1,30 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse, JsonResponse, FileResponse, Http404
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.http import require_GET, require_POST, condition
 from django.contrib import messages
 from .models import Product, Category, Supplier, SupplierProduct, StockMovement, Notification
+from .importers import ProductImporter
+from .search import search_products, search_suppliers
+from .ledger import change_stock, product_history, daily_totals, StockUpdateError, StaleStockError
+from .notifications import unread_count, mark_all_read
+from .reports import request_report, report_status, report_path, REPORTS
+from .snapshots import trend_chart_context
+from .sync import apply_movement_batch, changes_since, SyncError, MAX_PULL_PRODUCTS
 from .forms import ProductForm, CategoryForm, SupplierForm, SupplierProductForm, StockUpdateForm
-from django.db.models import Q, F, Count
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Substr
 from django.utils import timezone
-from datetime import timedelta
-from django.core.paginator import Paginator
-from .utils import get_stock_stats, LOW_STOCK_THRESHOLD, NEAR_EXPIRY_DAYS, get_supplier_stats, check_and_send_inventory_alerts
+from datetime import datetime
+from .pagination import CursorPaginator, OffsetPaginator
+from .perf import registry as perf_registry, LATENCY_BUCKETS_MS
+from .profiling import list_profiles, profile_path
+from .metrics import render as render_metrics, bearer_token_ok, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from django.conf import settings
+from .utils import get_stock_stats, LOW_STOCK_THRESHOLD, NEAR_EXPIRY_DAYS, get_supplier_stats, enqueue_inventory_alerts, GroupConcat
+from .utils import get_dashboard_data, get_dashboard_payload, get_category_options, get_supplier_options, get_inventory_report, get_cached_supplier_report, products_by_ids
 import logging
 import csv
-from django.template.loader import render_to_string
-from io import BytesIO
-import io
 import json
 
 
@@ -34,18 +45,13 @@ def global_search_view(request):
 
     if search_query:
 
-        products = Product.objects.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        ).select_related('category').prefetch_related('suppliers')
-
-
-        suppliers = Supplier.objects.filter(
-            Q(name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query)
+        products = search_products(
+            Product.objects.select_related('category').prefetch_related('suppliers'),
+            search_query
         )
 
+        suppliers = search_suppliers(Supplier.objects.all(), search_query)
+
     context = {
         "search_query": search_query,
         "products": products,
@@ -57,12 +63,14 @@ def global_search_view(request):
 
 @login_required
 def notifications_list_view(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    unread_count = notifications.filter(is_read=False).count()
+    notifications = Notification.objects.filter(user=request.user)
+
+    paginator = CursorPaginator(notifications, ("-created_at", "-id"), 20)
+    notifications = paginator.get_page(request.GET)
 
     context = {
         "notifications": notifications,
-        "unread_count": unread_count
+        "unread_count": unread_count(request.user)
     }
     return render(request, "inventory/notifications_list.html", context)
 
@@ -70,7 +78,7 @@ def notifications_list_view(request):
 
 @login_required
 def mark_all_notifications_read_view(request):
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    mark_all_read(request.user)
     messages.success(request, "All notifications marked as read.")
     return redirect("inventory:notifications_list_view")
 
@@ -80,33 +88,39 @@ def mark_all_notifications_read_view(request):
 def dashboard_view(request):
     stock_stats = get_stock_stats()
     supplier_stats = get_supplier_stats()
+    dashboard = get_dashboard_data()
 
-    low_stock_products = Product.objects.filter(
-        quantity_in_stock__lt=LOW_STOCK_THRESHOLD,
-        quantity_in_stock__gt=0
-    ).select_related("category")
-
-    category_data = Category.objects.annotate(total=Count("products"))
-    category_labels = [cat.name for cat in category_data]
-    category_counts = [cat.total for cat in category_data]
-
-    in_stock = Product.objects.filter(quantity_in_stock__gte=LOW_STOCK_THRESHOLD).count()
     low_stock = stock_stats["low_stock"]
     expired = stock_stats["expired"]
 
     context = {
         "products_count": stock_stats["total_products"],
-        "categories_count": Category.objects.count(),
+        "categories_count": dashboard["categories_count"],
         "suppliers_count": supplier_stats["total_suppliers"],
-        "low_stock_products": low_stock_products,
-        "category_labels": json.dumps(category_labels),
-        "category_counts": json.dumps(category_counts),
+        "low_stock_products": products_by_ids(dashboard["low_stock_ids"]),
+        "low_stock_count": dashboard["low_stock_count"],
+        "category_labels": json.dumps(dashboard["category_labels"]),
+        "category_counts": json.dumps(dashboard["category_counts"]),
         "stock_status_labels": json.dumps(["In Stock", "Low Stock", "Expired"]),
-        "stock_status_counts": json.dumps([in_stock, low_stock, expired]),
+        "stock_status_counts": json.dumps([dashboard["in_stock"], low_stock, expired]),
+        "dashboard_etag": get_dashboard_payload()["etag"],
     }
     return render(request, "inventory/dashboard.html", context)
 
 
+def _dashboard_etag(request):
+    return get_dashboard_payload()["etag"]
+
+
+@login_required
+@condition(etag_func=_dashboard_etag)
+def dashboard_data_view(request):
+    response = HttpResponse(get_dashboard_payload()["body"], content_type="application/json")
+    # Browsers may keep the body but must revalidate it (If-None-Match) on every poll.
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 # -------------------
 # Product Views
 # -------------------
@@ -114,20 +128,18 @@ def dashboard_view(request):
 
 @login_required
 def products_list_view(request):
+    # List cards only show a short description, so the full text column isn't loaded.
     products = (Product.objects
                 .select_related('category')
-                .prefetch_related('suppliers')
-                .order_by("-created_at"))
+                .defer('description', 'category__description')
+                .annotate(description_preview=Substr('description', 1, 160)))
 
     search_query = request.GET.get("search") or ""
     category_id = request.GET.get("category")   
     supplier_id = request.GET.get("supplier")  
 
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
 
     if category_id and category_id.isdigit():
         products = products.filter(category_id=category_id)
@@ -135,14 +147,17 @@ def products_list_view(request):
     if supplier_id and supplier_id.isdigit():
         products = products.filter(suppliers__id=supplier_id)
 
-    paginator   = Paginator(products, 8)
-    page_number = request.GET.get("page")
-    page_obj    = paginator.get_page(page_number)
+    if search_query:
+        # Keep the relevance order from search_products(); a keyset on created_at would undo it.
+        paginator = OffsetPaginator(products, 8, with_count=True, default_ordering=("-created_at", "-id"))
+    else:
+        paginator = CursorPaginator(products, ("-created_at", "-id"), 8, with_count=True)
+    page_obj  = paginator.get_page(request.GET)
 
     context = {
         "products": page_obj,
-        "categories": Category.objects.all(),
-        "suppliers": Supplier.objects.all(),
+        "categories": get_category_options(),
+        "suppliers": get_supplier_options(),
         "search_query": search_query,
         "selected_category": category_id,  
         "selected_supplier": supplier_id,  
@@ -152,20 +167,33 @@ def products_list_view(request):
 
 
 
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+    def write(self, value):
+        return value
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+
 @login_required
 def export_products_csv_view(request):
+    # Supplier names are aggregated per product in the database, so each
+    # row is complete without prefetching the whole supplier table.
+    supplier_names = (SupplierProduct.objects
+                      .filter(product=OuterRef("pk"))
+                      .values("product")
+                      .annotate(names=GroupConcat("supplier__name"))
+                      .values("names"))
 
-    products = Product.objects.select_related('category').prefetch_related('suppliers').order_by("-created_at")
+    products = Product.objects.order_by("-created_at")
 
     search_query = request.GET.get("search") or ""
     category_id = request.GET.get("category")
     supplier_id = request.GET.get("supplier")
 
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
 
     if category_id and category_id.isdigit():
         products = products.filter(category_id=category_id)
@@ -173,41 +201,46 @@ def export_products_csv_view(request):
     if supplier_id and supplier_id.isdigit():
         products = products.filter(suppliers__id=supplier_id)
 
+    rows = products.annotate(suppliers_names=Subquery(supplier_names)).values_list(
+        "sku", "name", "category__name", "suppliers_names", "quantity_in_stock",
+        "expiry_date", "batch_number", "dosage_form", "strength", "price",
+    )
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = 'attachment; filename="products.csv"'
-
-    writer = csv.writer(response)
-
-    writer.writerow([
-        "SKU",
-        "Name",
-        "Category",
-        "Suppliers",
-        "Quantity In Stock",
-        "Expiry Date",
-        "Batch Number",
-        "Dosage Form",
-        "Strength",
-        "Price"
-    ])
-
-
-    for product in products:
-        suppliers_names = ", ".join([s.name for s in product.suppliers.all()])
-        writer.writerow([
-            product.sku or "",
-            product.name,
-            product.category.name if product.category else "",
-            suppliers_names,
-            product.quantity_in_stock,
-            product.expiry_date if product.expiry_date else "",
-            product.batch_number or "",
-            product.get_dosage_form_display() if product.dosage_form else "",
-            product.strength or "",
-            product.price if product.price is not None else ""
+    dosage_forms = dict(Product.DOSAGE_FORMS)
+
+    def stream_rows():
+        writer = csv.writer(Echo())
+        yield writer.writerow([
+            "SKU",
+            "Name",
+            "Category",
+            "Suppliers",
+            "Quantity In Stock",
+            "Expiry Date",
+            "Batch Number",
+            "Dosage Form",
+            "Strength",
+            "Price"
         ])
 
+        # iterator() uses a server-side cursor on PostgreSQL and never caches rows.
+        for sku, name, category, suppliers_names, quantity, expiry_date, batch_number, dosage_form, strength, price \
+                in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield writer.writerow([
+                sku or "",
+                name,
+                category or "",
+                suppliers_names or "",
+                quantity,
+                expiry_date if expiry_date else "",
+                batch_number or "",
+                dosage_forms.get(dosage_form, dosage_form) if dosage_form else "",
+                strength or "",
+                price if price is not None else ""
+            ])
+
+    response = StreamingHttpResponse(stream_rows(), content_type="text/csv")
+    response["Content-Disposition"] = 'attachment; filename="products.csv"'
     return response
 
 
@@ -227,46 +260,23 @@ def import_products_csv_view(request):
                 return redirect("inventory:products_list_view")
 
 
-            data_set = csv_file.read().decode('UTF-8')
-            io_string = io.StringIO(data_set)
-            next(io_string)
-
-            for row in csv.reader(io_string, delimiter=',', quotechar='"'):
-                name = row[0].strip()
-                category_name = row[1].strip() if row[1] else None
-                suppliers_names = row[2].split(",") if row[2] else []
-                quantity = int(row[3]) if row[3] else 0
-                expiry_date = row[4].strip() if row[4] else None
-                batch_number = row[5].strip() if row[5] else None
-                dosage_form = row[6].strip() if row[6] else None
-                strength = row[7].strip() if row[7] else None
-                price = row[8].strip() if row[8] else None
-
-
-                category = None
-                if category_name:
-                    category, _ = Category.objects.get_or_create(name=category_name)
-
-                product = Product.objects.create(
-                    name=name,
-                    category=category,
-                    quantity_in_stock=quantity,
-                    batch_number=batch_number,
-                    dosage_form=dosage_form,
-                    strength=strength,
-                    price=price if price else None,
-                    expiry_date=expiry_date if expiry_date else None
-                )
-
+            report = ProductImporter(
+                update_existing=bool(request.POST.get("update_existing")), user=request.user
+            ).run(csv_file)
+            enqueue_inventory_alerts(report["product_ids"])
 
-                for sup_name in suppliers_names:
-                    sup_name = sup_name.strip()
-                    if sup_name:
-                        supplier, _ = Supplier.objects.get_or_create(name=sup_name)
-                        SupplierProduct.objects.create(supplier=supplier, product=product)
+            if report["errors"]:
+                messages.warning(
+                    request,
+                    f"Imported {report['created']} new and updated {report['updated']} products; "
+                    f"{len(report['errors'])} rows were skipped."
+                )
+                return render(request, "inventory/import_products.html", {"report": report})
 
-            check_and_send_inventory_alerts()
-            messages.success(request, "Products imported successfully.")
+            messages.success(
+                request,
+                f"Products imported successfully ({report['created']} new, {report['updated']} updated)."
+            )
         except Exception as e:
             messages.error(request, f"Error importing CSV: {str(e)}")
 
@@ -302,9 +312,9 @@ def add_product_view(request: HttpRequest):
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
             try:
-                form.save()
+                product = form.save()
                 messages.success(request, "Product added successfully.")
-                check_and_send_inventory_alerts()
+                enqueue_inventory_alerts([product.pk])
                 return redirect("inventory:products_list_view")  
             except Exception as e:
                 user_info = request.user.username if request.user.is_authenticated else "Anonymous"
@@ -337,7 +347,8 @@ def add_product_view(request: HttpRequest):
 @user_passes_test(lambda u: u.is_staff)
 def edit_product_view(request: HttpRequest, product_id: int):
     
-    product = get_object_or_404(Product, id=product_id)
+    # The template checks each supplier option against product.suppliers.all.
+    product = get_object_or_404(Product.objects.select_related("category").prefetch_related("suppliers"), id=product_id)
 
     if request.method == "POST":
         form = ProductForm(request.POST, request.FILES, instance=product)
@@ -345,7 +356,7 @@ def edit_product_view(request: HttpRequest, product_id: int):
             try:
                 form.save()
                 messages.success(request, "Product updated successfully.")
-                check_and_send_inventory_alerts()
+                enqueue_inventory_alerts([product.pk])
                 return redirect("inventory:products_list_view")  
             except Exception as e:
                 user_info = request.user.username if request.user.is_authenticated else "Anonymous"
@@ -390,9 +401,9 @@ def delete_product_view(request, product_id):
                 exc_info=True
             )
             messages.error(request, "Something went wrong while deleting the product.")
-            return redirect("inventory:edit_product_view", product_id=product_id)
+            return redirect("inventory:edit_product", product_id=product_id)
 
-    return redirect("inventory:edit_product_view", product_id=product_id)
+    return redirect("inventory:edit_product", product_id=product_id)
 
 
 
@@ -493,7 +504,7 @@ def delete_category(request, category_id):
             messages.error(request, "Something went wrong while deleting the category.")
             return redirect('inventory:category_list')
 
-    return render(request, 'inventory/delete_category_confirm.html', {'category': category})
+    return redirect('inventory:edit_category', category_id=category_id)
 
 
 
@@ -513,7 +524,7 @@ def supplier_list_view(request):
 @login_required
 def supplier_detail_view(request, supplier_id):
     supplier = get_object_or_404(Supplier, id=supplier_id)
-    supplier_products = supplier.supplierproduct_set.all()
+    supplier_products = supplier.supplierproduct_set.select_related('product')
 
     if request.method == 'POST':
         form = SupplierProductForm(request.POST, supplier=supplier)
@@ -618,7 +629,7 @@ def delete_supplier_view(request, supplier_id):
             messages.error(request, "Something went wrong while deleting the supplier.")
             return redirect('inventory:supplier_list_view')
 
-    return render(request, 'inventory/delete_supplier_confirm.html', {'supplier': supplier})
+    return redirect('inventory:edit_supplier_view', supplier_id=supplier_id)
 
 
 @login_required
@@ -681,7 +692,12 @@ def edit_supplier_product(request, pk):
 
 @login_required
 def stock_status_view(request):
-    products = Product.objects.all().order_by('name')
+    products = Product.objects.select_related('category').only(
+        'id', 'sku', 'name', 'quantity_in_stock', 'category__name'
+    )
+    paginator = CursorPaginator(products, ("name", "id"), 50)
+    products = paginator.get_page(request.GET)
+
     return render(request, 'inventory/stock_status.html', {
         'products': products,
         'low_stock_threshold': LOW_STOCK_THRESHOLD,
@@ -700,18 +716,11 @@ def stock_update_view(request, product_id):
                 new_quantity = form.cleaned_data['quantity']
                 reason = form.cleaned_data['reason']
 
-                previous_quantity = product.quantity_in_stock
-                quantity_change = new_quantity - previous_quantity
-
-                product.quantity_in_stock = new_quantity
-                product.save()
-
-                StockMovement.objects.create(
-                    product=product,
-                    movement_type=movement_type,
-                    previous_quantity=previous_quantity,
+                change_stock(
+                    product,
+                    movement_type,
                     new_quantity=new_quantity,
-                    quantity_change=quantity_change,
+                    expected_quantity=form.cleaned_data['expected_quantity'],
                     reason=reason,
                     user=request.user
                 )
@@ -720,11 +729,19 @@ def stock_update_view(request, product_id):
                 if product.expiry_date and today <= product.expiry_date <= today + timezone.timedelta(days=get_stock_stats()['near_expiry_days']):
                     messages.warning(request, f"⏳ {product.name} is Near Expiry on {product.expiry_date}.")
 
-                check_and_send_inventory_alerts()
+                enqueue_inventory_alerts([product.pk])
 
                 messages.success(request, "Stock quantity updated successfully.")
                 return redirect('inventory:stock_status_view')
 
+            except StaleStockError as e:
+                # Show the form again with the current quantity rather than overwrite it.
+                messages.error(request, str(e))
+                product.quantity_in_stock = e.current
+                form = StockUpdateForm()
+            except StockUpdateError as e:
+                messages.error(request, str(e))
+                return redirect('inventory:stock_status_view')
             except Exception as e:
                 user_info = request.user.username if request.user.is_authenticated else "Anonymous"
                 ip_address = request.META.get('REMOTE_ADDR', 'Unknown IP')
@@ -750,27 +767,83 @@ def stock_update_view(request, product_id):
         'low_stock_threshold': LOW_STOCK_THRESHOLD
     })
 
+
+
+
+# Sync API for handheld scanners. Sessions authenticate as usual; the push
+# endpoint expects the CSRF token in the X-CSRFToken header.
+@login_required
+@require_POST
+def sync_push_view(request):
+    try:
+        payload = json.loads(request.body or b"{}")
+        results = apply_movement_batch(payload.get("movements") if isinstance(payload, dict) else None,
+                                       user=request.user)
+    except (ValueError, SyncError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    applied = [r for r in results if r["status"] == "applied"]
+    if applied:
+        enqueue_inventory_alerts({r["product_id"] for r in applied})
+
+    ip_address = request.META.get('REMOTE_ADDR', 'Unknown IP')
+    logger.info(
+        f"Sync push by user '{request.user.username}' from IP {ip_address}: "
+        f"{len(applied)} applied, {len(results) - len(applied)} skipped"
+    )
+    return JsonResponse({"results": results})
+
+
+
+@login_required
+@require_GET
+def sync_pull_view(request):
+    try:
+        limit = int(request.GET.get("limit", MAX_PULL_PRODUCTS))
+        products, deleted, cursor, has_more = changes_since(request.GET.get("cursor"), limit)
+    except (ValueError, SyncError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"products": products, "deleted": deleted, "cursor": cursor, "has_more": has_more})
+
     
 @login_required
 def product_movements_view(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    movements = product.stock_movements.all().order_by('-created_at')  
 
-    from .utils import LOW_STOCK_THRESHOLD  
+    paginator = CursorPaginator(product.stock_movements.select_related('user'), ("-created_at", "-id"), 25)
+    movements = paginator.get_page(request.GET)
+
+    history = product_history(product)
 
     return render(request, 'inventory/product_movements.html', {
         'product': product,
         'movements': movements,
-        'low_stock_threshold': LOW_STOCK_THRESHOLD
+        'low_stock_threshold': LOW_STOCK_THRESHOLD,
+        'history_labels': json.dumps([str(day.date) for day in history]),
+        'history_closing': json.dumps([day.closing_quantity for day in history]),
+        'history_in': json.dumps([day.in_quantity for day in history]),
+        'history_out': json.dumps([day.out_quantity for day in history]),
     })
     
     
 @login_required
 def stock_movements_view(request):
-    movements = StockMovement.objects.select_related('product', 'user').order_by('-created_at')
+    movements = StockMovement.objects.select_related('product', 'user').only(
+        'id', 'movement_type', 'previous_quantity', 'new_quantity', 'quantity_change', 'reason', 'created_at',
+        'product__id', 'product__name', 'user__username'
+    )
+    paginator = CursorPaginator(movements, ("-created_at", "-id"), 50)
+    movements = paginator.get_page(request.GET)
+
+    totals = daily_totals()
 
     return render(request, 'inventory/stock_movements.html', {
-        'movements': movements
+        'movements': movements,
+        'history_labels': json.dumps([str(day["date"]) for day in totals]),
+        'history_in': json.dumps([day["in_quantity"] for day in totals]),
+        'history_out': json.dumps([day["out_quantity"] for day in totals]),
+        'history_adjust': json.dumps([day["adjust_quantity"] for day in totals]),
     })
     
 
@@ -782,7 +855,8 @@ def stock_movements_view(request):
 def reports_home_view(request):
     context = {
         "stats": get_stock_stats(),
-        "supplier_stats": get_supplier_stats()
+        "supplier_stats": get_supplier_stats(),
+        "trend": json.dumps(trend_chart_context()),
     }
     return render(request, "inventory/reports_home.html", context)
 
@@ -790,165 +864,54 @@ def reports_home_view(request):
 
 @login_required
 def inventory_reports_view(request):
-    today = timezone.localdate()
     category_id = request.GET.get("category")
     status = request.GET.get("status")
     search_query = request.GET.get("search", "")
 
-    products = Product.objects.all()
-
-    if category_id and category_id.isdigit():
-        products = products.filter(category_id=category_id)
-
-
-    if status == "low":
-        products = products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0)
-    elif status == "expired":
-        products = products.filter(expiry_date__isnull=False, expiry_date__lt=today)
-    elif status == "near":
-        products = products.filter(
-            expiry_date__isnull=False,
-            expiry_date__gte=today,
-            expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-        )
-
-    if search_query:
-        products = products.filter(name__icontains=search_query)
-
-    low_stock_products = products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0)
-    expired_products = products.filter(expiry_date__isnull=False, expiry_date__lt=today)
-    near_expiry_products = products.filter(
-        expiry_date__isnull=False,
-        expiry_date__gte=today,
-        expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-    )
-
-    categories = Category.objects.all()
-
     context = {
-        "low_stock_products": low_stock_products,
-        "expired_products": expired_products,
-        "near_expiry_products": near_expiry_products,
+        **get_inventory_report(category_id, status, search_query),
         "low_stock_threshold": LOW_STOCK_THRESHOLD,
         "near_expiry_days": NEAR_EXPIRY_DAYS,
-        "categories": categories,
+        "categories": get_category_options(),
         "selected_category": category_id,
         "selected_status": status,
-        "search_query": search_query
+        "search_query": search_query,
+        "trend": json.dumps(trend_chart_context(category_id=category_id)),
     }
     return render(request, "inventory/inventory_reports.html", context)
 
 
-@login_required
-def inventory_reports_pdf_view(request):
-    from weasyprint import HTML
-    today = timezone.localdate()
-    category_id = request.GET.get("category")
-    status = request.GET.get("status")
-    search_query = request.GET.get("search", "")
-
-    products = Product.objects.all()
-
-    if category_id and category_id.isdigit():
-        products = products.filter(category_id=category_id)
-
-    if status == "low":
-        products = products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0)
-    elif status == "expired":
-        products = products.filter(expiry_date__isnull=False, expiry_date__lt=today)
-    elif status == "near":
-        products = products.filter(
-            expiry_date__isnull=False,
-            expiry_date__gte=today,
-            expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-        )
-
-    if search_query:
-        products = products.filter(name__icontains=search_query)
-
-    context = {
-        "low_stock_products": products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0),
-        "expired_products": products.filter(expiry_date__isnull=False, expiry_date__lt=today),
-        "near_expiry_products": products.filter(
-            expiry_date__isnull=False,
-            expiry_date__gte=today,
-            expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-        ),
-        "low_stock_threshold": LOW_STOCK_THRESHOLD,
-        "near_expiry_days": NEAR_EXPIRY_DAYS,
-        "today": today
-    }
-
+def _report_pdf_response(request, kind, fallback_url):
+    user_info = request.user.username if request.user.is_authenticated else "Anonymous"
+    ip_address = request.META.get('REMOTE_ADDR', 'Unknown IP')
     try:
-        html_string = render_to_string("inventory/inventory_reports_pdf.html", context)
-        html = HTML(string=html_string)
-
-        pdf_file = BytesIO()
-        html.write_pdf(target=pdf_file)
-        pdf_file.seek(0)
-
-        user_info = request.user.username if request.user.is_authenticated else "Anonymous"
-        ip_address = request.META.get('REMOTE_ADDR', 'Unknown IP')
-        logger.info(f"Inventory PDF report generated by '{user_info}' from IP {ip_address}")
-
-        response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename=\"inventory_report.pdf\"'
-        return response
-
+        key = request_report(kind, request.GET)
     except Exception as e:
-        user_info = request.user.username if request.user.is_authenticated else "Anonymous"
-        ip_address = request.META.get('REMOTE_ADDR', 'Unknown IP')
         logger.error(
-            f"Error generating inventory PDF report by '{user_info}' from IP {ip_address}: {str(e)}",
+            f"Error queueing {kind} PDF report by '{user_info}' from IP {ip_address}: {str(e)}",
             exc_info=True
         )
         messages.error(request, "An error occurred while generating the PDF report.")
-        return redirect("inventory:inventory_reports_view")
+        return redirect(fallback_url)
+
+    logger.info(f"{kind.title()} PDF report requested by '{user_info}' from IP {ip_address}")
+    if report_status(key) == "ready":
+        return redirect("inventory:report_download", key=key)
+    return redirect("inventory:report_status", key=key)
+
+
+
+@login_required
+def inventory_reports_pdf_view(request):
+    return _report_pdf_response(request, "inventory", "inventory:inventory_reports_view")
 
 
 @login_required
 def supplier_reports_view(request):
-    today = timezone.localdate()
     search_query = request.GET.get("search", "")
     status = request.GET.get("status")
 
-    suppliers_data = []
-
-    suppliers = Supplier.objects.all().order_by("name")
-
-    if search_query:
-        suppliers = suppliers.filter(name__icontains=search_query)
-
-    for supplier in suppliers:
-        products = supplier.products.all().distinct()
-
-        if status == "low":
-            products = products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0)
-        elif status == "expired":
-            products = products.filter(expiry_date__isnull=False, expiry_date__lt=today)
-        elif status == "near":
-            products = products.filter(
-                expiry_date__isnull=False,
-                expiry_date__gte=today,
-                expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-            )
-
-        total_products = products.count()
-        low_stock_count = products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0).count()
-        expired_count = products.filter(expiry_date__isnull=False, expiry_date__lt=today).count()
-        near_expiry_count = products.filter(
-            expiry_date__isnull=False,
-            expiry_date__gte=today,
-            expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-        ).count()
-
-        suppliers_data.append({
-            "supplier": supplier,
-            "total_products": total_products,
-            "low_stock_count": low_stock_count,
-            "expired_count": expired_count,
-            "near_expiry_count": near_expiry_count,
-        })
+    suppliers_data = get_cached_supplier_report(search_query, status)
 
     context = {
         "suppliers_data": suppliers_data,
@@ -961,82 +924,112 @@ def supplier_reports_view(request):
     
 @login_required
 def supplier_reports_pdf_view(request):
-    from weasyprint import HTML
-    today = timezone.localdate()
-    search_query = request.GET.get("search", "")
-    status = request.GET.get("status")
+    return _report_pdf_response(request, "supplier", "inventory:supplier_reports_view")
 
-    suppliers_data = []
 
-    suppliers = Supplier.objects.all().order_by("name")
 
-    if search_query:
-        suppliers = suppliers.filter(name__icontains=search_query)
-
-    for supplier in suppliers:
-        products = supplier.products.all().distinct()
-
-        if status == "low":
-            products = products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0)
-        elif status == "expired":
-            products = products.filter(expiry_date__isnull=False, expiry_date__lt=today)
-        elif status == "near":
-            products = products.filter(
-                expiry_date__isnull=False,
-                expiry_date__gte=today,
-                expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-            )
+@login_required
+def report_status_view(request, key):
+    try:
+        status = report_status(key)
+    except ValueError:
+        raise Http404("Unknown report.")
+    return render(request, "inventory/report_status.html", {
+        "key": key,
+        "status": status,
+        "filename": REPORTS[key.split("-")[0]]["filename"],
+    })
 
-        total_products = products.count()
-        low_stock_count = products.filter(quantity_in_stock__lt=LOW_STOCK_THRESHOLD, quantity_in_stock__gt=0).count()
-        expired_count = products.filter(expiry_date__isnull=False, expiry_date__lt=today).count()
-        near_expiry_count = products.filter(
-            expiry_date__isnull=False,
-            expiry_date__gte=today,
-            expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS)
-        ).count()
-
-        suppliers_data.append({
-            "supplier": supplier,
-            "total_products": total_products,
-            "low_stock_count": low_stock_count,
-            "expired_count": expired_count,
-            "near_expiry_count": near_expiry_count,
-        })
 
-    context = {
-        "suppliers_data": suppliers_data,
-        "low_stock_threshold": LOW_STOCK_THRESHOLD,
-        "near_expiry_days": NEAR_EXPIRY_DAYS,
-        "selected_status": status,
-        "search_query": search_query,
-        "today": today
-    }
 
+@login_required
+def report_download_view(request, key):
     try:
-        html_string = render_to_string("inventory/supplier_reports_pdf.html", context)
-        html = HTML(string=html_string)
+        path = report_path(key)
+    except ValueError:
+        raise Http404("Unknown report.")
+    if not path.exists():
+        return redirect("inventory:report_status", key=key)
+    # FileResponse streams from disk instead of holding the PDF in memory.
+    return FileResponse(path.open("rb"), as_attachment=True,
+                        filename=REPORTS[key.split("-")[0]]["filename"], content_type="application/pdf")
 
-        pdf_file = BytesIO()
-        html.write_pdf(target=pdf_file)
-        pdf_file.seek(0)
 
-        user_info = request.user.username if request.user.is_authenticated else "Anonymous"
-        ip_address = request.META.get('REMOTE_ADDR', 'Unknown IP')
-        logger.info(f"Supplier PDF report generated by '{user_info}' from IP {ip_address}")
 
-        response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename=\"supplier_report.pdf\"'
-        return response
 
-    except Exception as e:
-        user_info = request.user.username if request.user.is_authenticated else "Anonymous"
-        ip_address = request.META.get('REMOTE_ADDR', 'Unknown IP')
-        logger.error(
-            f"Error generating supplier PDF report by '{user_info}' from IP {ip_address}: {str(e)}",
-            exc_info=True
-        )
-        messages.error(request, "An error occurred while generating the PDF report.")
-        return redirect("inventory:supplier_reports_view")
 
+# -------------------
+# Performance Views
+# -------------------
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def perf_dashboard_view(request):
+    rows = []
+    for view, stats in perf_registry.snapshot().items():
+        cache_lookups = stats.cache_hits + stats.cache_misses
+        rows.append({
+            "view": view,
+            "count": stats.count,
+            "errors": stats.errors,
+            "total_ms": stats.total_ms,
+            "total_s": stats.total_ms / 1000,
+            "avg_ms": stats.total_ms / stats.count,
+            "p50_ms": stats.percentile(50),
+            "p95_ms": stats.percentile(95),
+            "p99_ms": stats.percentile(99),
+            "max_ms": stats.max_ms,
+            "avg_queries": stats.queries / stats.count,
+            "avg_db_ms": stats.db_ms / stats.count,
+            "avg_template_ms": stats.template_ms / stats.count,
+            "cache_hit_rate": stats.cache_hits * 100 / cache_lookups if cache_lookups else None,
+            "buckets": stats.buckets,
+        })
+    # Views that cost the most time overall first.
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+
+    return render(request, "inventory/perf_dashboard.html", {
+        "rows": rows,
+        "bucket_labels": [f"≤{bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"],
+        "since": datetime.fromtimestamp(perf_registry.started, tz=timezone.get_current_timezone()),
+        "profiles": list_profiles(),
+        "profile_slow_ms": settings.PROFILE_SLOW_MS,
+    })
 
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+@require_POST
+def perf_reset_view(request):
+    perf_registry.reset()
+    messages.success(request, "Performance statistics cleared.")
+    return redirect("inventory:perf_dashboard")
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def perf_profile_download_view(request, profile_id, kind):
+    """A saved request profile: the collapsed stacks (for flamegraph.pl or speedscope) or its SQL."""
+    suffix = {"stacks": ".stacks.txt", "sql": ".json"}.get(kind)
+    try:
+        path = profile_path(profile_id, suffix) if suffix else None
+    except ValueError:
+        path = None
+    if path is None or not path.exists():
+        raise Http404("Unknown profile.")
+    if kind == "stacks":
+        return FileResponse(path.open("rb"), as_attachment=True, filename=f"profile-{profile_id}.txt",
+                            content_type="text/plain")
+    return FileResponse(path.open("rb"), as_attachment=True, filename=f"profile-{profile_id}.json",
+                        content_type="application/json")
+
+
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape endpoint: bearer METRICS_TOKEN when set, otherwise staff only."""
+    if settings.METRICS_TOKEN:
+        if not bearer_token_ok(request.headers.get("Authorization")):
+            return HttpResponse("Unauthorized", status=401, content_type="text/plain")
+    elif not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,22 @@
+#!/bin/sh
+# Production entry point (see railway.json): migrate, start the job worker,
+# then serve the site with gunicorn.
+set -e
+cd "$(dirname "$0")"
+
+python manage.py migrate --noinput
+python manage.py collectstatic --noinput
+
+# Alert emails, notifications, PDF reports and snapshots are processed by
+# run_jobs. It runs in this container because the web process serves the PDFs
+# it writes to REPORTS_CACHE_DIR; restart it if it ever exits. With a worker
+# running, requests queue jobs instead of running them inline.
+export JOBS_RUN_INLINE=False
+(
+    while true; do
+        python manage.py run_jobs || echo "run_jobs exited with status $?, restarting" >&2
+        sleep 5
+    done
+) &
+
+exec gunicorn Stocker.wsgi:application --bind "0.0.0.0:$PORT"